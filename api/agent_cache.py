@@ -0,0 +1,101 @@
+# api/agent_cache.py
+"""
+Short-lived cache of agent rows for the voice call path.
+
+A single Twilio call reads the same agent row from the webhook and again from
+the media stream a second later. Agent settings change at human timescales,
+so rows are reused for AGENT_CACHE_TTL seconds.
+
+Two tiers: an in-process dict (L1), and Redis (L2) when REDIS_URL is set, so
+every Fly machine shares one cached copy per agent. Edits bust both tiers; L1
+copies on other machines pick them up on expiry.
+"""
+
+import os
+import logging
+import orjson
+import redis.asyncio as aioredis
+from typing import Optional
+from api.ttl_cache import TTLCache
+
+AGENT_CACHE_TTL = 60  # seconds an agent row is reused
+AGENT_CACHE_MAX = 1024  # entries kept before the oldest are evicted
+# Redis sits on the call-answer path; past this, give up and treat it as a
+# miss so lookups fall back to Supabase instead of hanging
+REDIS_TIMEOUT = 0.5  # seconds, for connecting and for each command
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+logger = logging.getLogger(__name__)
+
+# agent_id -> agent row
+_agent_cache = TTLCache(AGENT_CACHE_MAX, AGENT_CACHE_TTL)
+
+# Shared Redis connection pool, created on first use (None when not configured)
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None and REDIS_URL:
+        _redis = aioredis.from_url(
+            REDIS_URL,
+            max_connections=20,
+            socket_connect_timeout=REDIS_TIMEOUT,
+            socket_timeout=REDIS_TIMEOUT,
+        )
+    return _redis
+
+
+def _redis_key(agent_id: int) -> str:
+    return f"agent:{agent_id}"
+
+
+def get_cached_agent(agent_id: int) -> Optional[dict]:
+    """Return a fresh cached agent row, or None on miss/expiry."""
+    return _agent_cache.get(agent_id)
+
+
+def cache_agent(agent_id: int, row: dict):
+    _agent_cache.set(agent_id, row)
+
+
+async def get_shared_agent(agent_id: int) -> Optional[dict]:
+    """Return the agent row from Redis, or None on miss / Redis unavailable."""
+    client = _get_redis()
+    if client is None:
+        return None
+    try:
+        raw = await client.get(_redis_key(agent_id))
+    except Exception as e:
+        # Includes timeouts: a slow Redis counts as a miss
+        logger.warning("[AgentCache] Redis get failed for agent %s: %s", agent_id, e)
+        return None
+    return orjson.loads(raw) if raw else None
+
+
+async def share_agent(agent_id: int, row: dict):
+    """Store the agent row in Redis for AGENT_CACHE_TTL seconds."""
+    client = _get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(_redis_key(agent_id), orjson.dumps(row), ex=AGENT_CACHE_TTL)
+    except Exception as e:
+        logger.warning("[AgentCache] Redis set failed for agent %s: %s", agent_id, e)
+
+
+async def bust_agent_cache(agent_id: int):
+    """Drop an agent's cached row after it is updated or deleted."""
+    _agent_cache.pop(agent_id)
+    client = _get_redis()
+    if client is None:
+        return
+    try:
+        await client.delete(_redis_key(agent_id))
+    except Exception as e:
+        logger.warning("[AgentCache] Redis delete failed for agent %s: %s", agent_id, e)
+
+
+def clear_agent_cache():
+    _agent_cache.clear()
@@ -1,11 +1,7 @@
 """Call transfer/forwarding functionality for live SIP calls."""
-import os
-from twilio.rest import Client
 from datetime import datetime
 import pytz
-
-TWILIO_SID = os.getenv("TWILIO_ACCOUNT_SID") or os.getenv("ACCOUNT_SID")
-TWILIO_TOKEN = os.getenv("TWILIO_AUTH_TOKEN") or os.getenv("AUTH_TOKEN")
+from api.twilio_client import get_twilio_client
 
 
 def should_transfer(agent_data: dict, business_data: dict) -> tuple[bool, str]:
@@ -49,7 +45,7 @@ def should_transfer(agent_data: dict, business_data: dict) -> tuple[bool, str]:
 def transfer_call(call_sid: str, forwarding_number: str) -> dict:
     """Transfer an active Twilio call to the forwarding number."""
     try:
-        client = Client(TWILIO_SID, TWILIO_TOKEN)
+        client = get_twilio_client()
 
         call = client.calls(call_sid).update(
             twiml=f'<Response><Dial>{forwarding_number}</Dial></Response>'
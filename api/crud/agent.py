@@ -3,10 +3,12 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
-from twilio.rest import Client
 import os
 from ..database import get_service_client
+from ..twilio_client import get_twilio_client
 from ..auth import get_current_user, AuthenticatedUser
+from ..phone_utils import to_e164
+from ..agent_cache import bust_agent_cache
 
 router = APIRouter(prefix="/agent", tags=["Agent"])
 
@@ -49,7 +51,7 @@ async def provision_phone_for_agent(agent_id: int, area_code: str):
     if existing_phone.data:
         return existing_phone.data[0]
 
-    client = Client(os.getenv("ACCOUNT_SID"), os.getenv("AUTH_TOKEN"))
+    client = get_twilio_client()
 
     available = client.available_phone_numbers('US').local.list(
         area_code=area_code,
@@ -70,7 +72,7 @@ async def provision_phone_for_agent(agent_id: int, area_code: str):
 
     result = db.table('phone_number').insert({
         'agent_id': agent_id,
-        'phone_number': number.phone_number,
+        'phone_number': to_e164(number.phone_number) or number.phone_number,
         'country': 'US',
         'area_code': area_code,
         'webhook_url': webhook_url,
@@ -233,6 +235,7 @@ async def update_agent(
         if not result.data:
             raise HTTPException(status_code=404, detail="Agent not found")
 
+        await bust_agent_cache(agent_id)
         print(f"[Agent Update] Agent {agent_id}: Update successful")
 
         return result.data[0]
@@ -264,7 +267,7 @@ async def delete_agent(
 
         if phone.data:
             try:
-                client = Client(os.getenv("ACCOUNT_SID"), os.getenv("AUTH_TOKEN"))
+                client = get_twilio_client()
                 numbers = client.incoming_phone_numbers.list(phone_number=phone.data[0]['phone_number'])
                 if numbers:
                     numbers[0].delete()
@@ -273,6 +276,7 @@ async def delete_agent(
 
         # Delete agent (with RLS)
         db.table('agent').delete().eq('id', agent_id).execute()
+        await bust_agent_cache(agent_id)
 
         return {"success": True}
 
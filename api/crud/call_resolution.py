@@ -19,6 +19,7 @@ Resolution statuses:
 
 import os
 import json
+import asyncio
 from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
@@ -55,10 +56,18 @@ class ResolutionResult(BaseModel):
     reason: str
 
 
+# Shared across ended calls so each classification reuses one connection
+# pool instead of opening a new TLS connection
+_openai_client = None
+
+
 def _get_openai_client():
     """Get a standard (non-realtime) OpenAI client for cheap classification."""
-    from openai import OpenAI
-    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
 
 
 def _calculate_duration_seconds(started_at: str, ended_at: str) -> float:
@@ -88,12 +97,16 @@ async def analyze_call(conversation_id: int, db=None) -> ResolutionResult:
     """
     Analyze a completed call and classify it.
     Called automatically after call ends, or manually via API.
+
+    Supabase and OpenAI calls here are blocking and the classification can
+    take seconds, so each runs in a worker thread; this is scheduled on the
+    loop that serves live calls.
     """
     if db is None:
         db = get_service_client()
 
     # Get conversation
-    conv_result = db.table('conversation').select('*').eq('id', conversation_id).execute()
+    conv_result = await asyncio.to_thread(db.table('conversation').select('*').eq('id', conversation_id).execute)
     if not conv_result.data:
         raise ValueError(f"Conversation {conversation_id} not found")
 
@@ -113,9 +126,9 @@ async def analyze_call(conversation_id: int, db=None) -> ResolutionResult:
     duration = _calculate_duration_seconds(started_at, ended_at)
 
     # Get messages/transcript
-    messages_result = db.table('message').select('role, content').eq(
+    messages_result = await asyncio.to_thread(db.table('message').select('role, content').eq(
         'conversation_id', conversation_id
-    ).order('created_at').execute()
+    ).order('created_at').execute)
 
     transcript = _build_transcript_text(messages_result.data)
 
@@ -125,31 +138,31 @@ async def analyze_call(conversation_id: int, db=None) -> ResolutionResult:
             classification="no_activity",
             reason=f"Call lasted {duration:.0f}s with no messages recorded"
         )
-        _save_resolution(db, conversation_id, result)
+        await asyncio.to_thread(_save_resolution, db, conversation_id, result)
         return result
 
     # For short calls OR any call with transcript, use AI classification
     if duration <= SHORT_CALL_THRESHOLD or len(messages_result.data) <= 2:
         try:
-            result = _classify_with_ai(transcript, duration)
-            _save_resolution(db, conversation_id, result)
+            result = await asyncio.to_thread(_classify_with_ai, transcript, duration)
+            await asyncio.to_thread(_save_resolution, db, conversation_id, result)
             return result
         except Exception as e:
             print(f"[Resolution] AI classification failed for {conversation_id}: {e}", flush=True)
             # Default to legitimate if AI fails — don't wrongly credit
             result = ResolutionResult(classification="resolved", reason=f"AI classification failed: {str(e)}")
-            _save_resolution(db, conversation_id, result)
+            await asyncio.to_thread(_save_resolution, db, conversation_id, result)
             return result
 
     # Longer calls with substantial transcript — still classify but likely legitimate
     try:
-        result = _classify_with_ai(transcript, duration)
-        _save_resolution(db, conversation_id, result)
+        result = await asyncio.to_thread(_classify_with_ai, transcript, duration)
+        await asyncio.to_thread(_save_resolution, db, conversation_id, result)
         return result
     except Exception as e:
         print(f"[Resolution] AI classification failed for {conversation_id}: {e}", flush=True)
         result = ResolutionResult(classification="resolved", reason=f"AI classification failed: {str(e)}")
-        _save_resolution(db, conversation_id, result)
+        await asyncio.to_thread(_save_resolution, db, conversation_id, result)
         return result
 
 
@@ -6,9 +6,10 @@ from typing import Literal
 import os
 import random
 import time
-from twilio.rest import Client
 from ..database import get_service_client
+from ..twilio_client import get_twilio_client
 from ..auth import get_current_user, AuthenticatedUser
+from ..agent_cache import bust_agent_cache
 
 router = APIRouter(tags=["Forwarding Verification"])
 
@@ -86,7 +87,7 @@ async def send_verification_code(
     }
 
     # Send via Twilio
-    twilio_client = Client(os.getenv("ACCOUNT_SID"), os.getenv("AUTH_TOKEN"))
+    twilio_client = get_twilio_client()
     from_number = os.getenv("TWILIO_FROM_NUMBER", os.getenv("TWILIO_PHONE_NUMBER"))
 
     # If no dedicated from number, find one from Twilio account
@@ -152,6 +153,7 @@ async def verify_code(
         'forwarding_verified': True,
         'updated_at': datetime.now(timezone.utc).isoformat(),
     }).eq('id', agent['id']).execute()
+    await bust_agent_cache(agent['id'])
 
     print(f"[Forwarding Verify] Number {cleaned} verified for business {business_id}")
     return {"success": True, "verified": True}
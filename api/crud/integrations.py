@@ -6,6 +6,7 @@ like Google Calendar.
 """
 
 import os
+import asyncio
 import httpx
 from datetime import datetime, timezone
 from urllib.parse import urlencode
@@ -17,6 +18,17 @@ from api.auth import get_current_user, AuthenticatedUser, verify_business_owners
 
 router = APIRouter(prefix="/integrations", tags=["Integrations"])
 
+# Shared keep-alive client for Google / Microsoft APIs. Calendar tools run
+# mid-call, so reusing pooled connections keeps TLS handshakes off the turn.
+_http = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=50),
+)
+
+
+async def close_client():
+    await _http.aclose()
+
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "")
@@ -87,17 +99,16 @@ async def google_callback(
     db = get_service_client()
 
     # Exchange code for tokens
-    async with httpx.AsyncClient() as client:
-        token_resp = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "code": code,
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "redirect_uri": GOOGLE_REDIRECT_URI,
-                "grant_type": "authorization_code",
-            },
-        )
+    token_resp = await _http.post(
+        "https://oauth2.googleapis.com/token",
+        data={
+            "code": code,
+            "client_id": GOOGLE_CLIENT_ID,
+            "client_secret": GOOGLE_CLIENT_SECRET,
+            "redirect_uri": GOOGLE_REDIRECT_URI,
+            "grant_type": "authorization_code",
+        },
+    )
 
     if token_resp.status_code != 200:
         print(f"[Integrations] Token exchange failed: {token_resp.text}")
@@ -118,13 +129,12 @@ async def google_callback(
 
     # Fetch user email
     account_email = None
-    async with httpx.AsyncClient() as client:
-        user_resp = await client.get(
-            "https://www.googleapis.com/oauth2/v2/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
-        if user_resp.status_code == 200:
-            account_email = user_resp.json().get("email")
+    user_resp = await _http.get(
+        "https://www.googleapis.com/oauth2/v2/userinfo",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    if user_resp.status_code == 200:
+        account_email = user_resp.json().get("email")
 
     # Upsert into tool_connection
     db.table("tool_connection").upsert(
@@ -186,17 +196,16 @@ async def google_drive_callback(
         "/google/callback", "/google-drive/callback"
     )
 
-    async with httpx.AsyncClient() as client:
-        token_resp = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "code": code,
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "redirect_uri": redirect_uri,
-                "grant_type": "authorization_code",
-            },
-        )
+    token_resp = await _http.post(
+        "https://oauth2.googleapis.com/token",
+        data={
+            "code": code,
+            "client_id": GOOGLE_CLIENT_ID,
+            "client_secret": GOOGLE_CLIENT_SECRET,
+            "redirect_uri": redirect_uri,
+            "grant_type": "authorization_code",
+        },
+    )
 
     if token_resp.status_code != 200:
         print(f"[Integrations] Google Drive token exchange failed: {token_resp.text}")
@@ -214,13 +223,12 @@ async def google_drive_callback(
 
     # Fetch user email
     account_email = None
-    async with httpx.AsyncClient() as client:
-        user_resp = await client.get(
-            "https://www.googleapis.com/oauth2/v2/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
-        if user_resp.status_code == 200:
-            account_email = user_resp.json().get("email")
+    user_resp = await _http.get(
+        "https://www.googleapis.com/oauth2/v2/userinfo",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    if user_resp.status_code == 200:
+        account_email = user_resp.json().get("email")
 
     db.table("tool_connection").upsert(
         {
@@ -238,7 +246,6 @@ async def google_drive_callback(
     print(f"[Integrations] Google Drive connected for business {business_id} ({account_email})")
 
     # Auto-index Drive docs in background
-    import asyncio
     asyncio.create_task(_index_drive_docs_background(business_id))
 
     return RedirectResponse(url=f"{FRONTEND_URL}/business/{business_id}?connected=google-drive#agent")
@@ -277,18 +284,17 @@ async def outlook_callback(
     business_id = int(state)
     db = get_service_client()
 
-    async with httpx.AsyncClient() as client:
-        token_resp = await client.post(
-            f"https://login.microsoftonline.com/{MS_TENANT}/oauth2/v2.0/token",
-            data={
-                "code": code,
-                "client_id": MS_CLIENT_ID,
-                "client_secret": MS_CLIENT_SECRET,
-                "redirect_uri": MS_REDIRECT_URI,
-                "grant_type": "authorization_code",
-                "scope": " ".join(MS_SCOPES),
-            },
-        )
+    token_resp = await _http.post(
+        f"https://login.microsoftonline.com/{MS_TENANT}/oauth2/v2.0/token",
+        data={
+            "code": code,
+            "client_id": MS_CLIENT_ID,
+            "client_secret": MS_CLIENT_SECRET,
+            "redirect_uri": MS_REDIRECT_URI,
+            "grant_type": "authorization_code",
+            "scope": " ".join(MS_SCOPES),
+        },
+    )
 
     if token_resp.status_code != 200:
         print(f"[Integrations] Outlook token exchange failed: {token_resp.text}")
@@ -306,14 +312,13 @@ async def outlook_callback(
 
     # Fetch user email from Microsoft Graph
     account_email = None
-    async with httpx.AsyncClient() as client:
-        user_resp = await client.get(
-            "https://graph.microsoft.com/v1.0/me",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
-        if user_resp.status_code == 200:
-            user_data = user_resp.json()
-            account_email = user_data.get("mail") or user_data.get("userPrincipalName")
+    user_resp = await _http.get(
+        "https://graph.microsoft.com/v1.0/me",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    if user_resp.status_code == 200:
+        user_data = user_resp.json()
+        account_email = user_data.get("mail") or user_data.get("userPrincipalName")
 
     db.table("tool_connection").upsert(
         {
@@ -433,9 +438,9 @@ async def get_google_access_token(business_id: int) -> tuple[str, dict]:
     Returns (access_token, connection_record).
     """
     db = get_service_client()
-    result = db.table("tool_connection").select("*").eq(
+    result = await asyncio.to_thread(db.table("tool_connection").select("*").eq(
         "business_id", business_id
-    ).eq("provider", "google-calendar").single().execute()
+    ).eq("provider", "google-calendar").single().execute)
 
     if not result.data:
         raise ValueError("Google Calendar not connected")
@@ -455,16 +460,15 @@ async def get_google_access_token(business_id: int) -> tuple[str, dict]:
             needs_refresh = True
 
     if needs_refresh and refresh_token:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                "https://oauth2.googleapis.com/token",
-                data={
-                    "client_id": GOOGLE_CLIENT_ID,
-                    "client_secret": GOOGLE_CLIENT_SECRET,
-                    "refresh_token": refresh_token,
-                    "grant_type": "refresh_token",
-                },
-            )
+        resp = await _http.post(
+            "https://oauth2.googleapis.com/token",
+            data={
+                "client_id": GOOGLE_CLIENT_ID,
+                "client_secret": GOOGLE_CLIENT_SECRET,
+                "refresh_token": refresh_token,
+                "grant_type": "refresh_token",
+            },
+        )
 
         if resp.status_code == 200:
             new_tokens = resp.json()
@@ -473,11 +477,11 @@ async def get_google_access_token(business_id: int) -> tuple[str, dict]:
             from datetime import timedelta
             new_expiry = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
 
-            db.table("tool_connection").update({
+            await asyncio.to_thread(db.table("tool_connection").update({
                 "access_token": access_token,
                 "token_expiry": new_expiry.isoformat(),
                 "updated_at": datetime.now(timezone.utc).isoformat(),
-            }).eq("business_id", business_id).eq("provider", "google-calendar").execute()
+            }).eq("business_id", business_id).eq("provider", "google-calendar").execute)
 
             conn["access_token"] = access_token
             print(f"[Integrations] Refreshed Google token for business {business_id}")
@@ -501,19 +505,18 @@ async def get_or_create_helloml_calendar(business_id: int) -> str:
         return settings["calendar_id"]
 
     # Create a new secondary calendar
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://www.googleapis.com/calendar/v3/calendars",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "summary": HELLOML_CALENDAR_NAME,
-                "description": "Appointments scheduled via HelloML voice agent",
-                "timeZone": "America/Chicago",
-            },
-        )
+    resp = await _http.post(
+        "https://www.googleapis.com/calendar/v3/calendars",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "summary": HELLOML_CALENDAR_NAME,
+            "description": "Appointments scheduled via HelloML voice agent",
+            "timeZone": "America/Chicago",
+        },
+    )
 
     if resp.status_code not in (200, 201):
         raise ValueError(f"Failed to create calendar: {resp.status_code} - {resp.text}")
@@ -523,10 +526,10 @@ async def get_or_create_helloml_calendar(business_id: int) -> str:
     # Store calendar ID in settings
     settings["calendar_id"] = calendar_id
     db = get_service_client()
-    db.table("tool_connection").update({
+    await asyncio.to_thread(db.table("tool_connection").update({
         "settings": settings,
         "updated_at": datetime.now(timezone.utc).isoformat(),
-    }).eq("business_id", business_id).eq("provider", "google-calendar").execute()
+    }).eq("business_id", business_id).eq("provider", "google-calendar").execute)
 
     print(f"[Integrations] Created HelloML calendar for business {business_id}: {calendar_id}")
     return calendar_id
@@ -549,20 +552,19 @@ async def check_availability(
         return {"error": "No account email found for this connection"}
 
     # Query freebusy for the user's primary calendar
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://www.googleapis.com/calendar/v3/freeBusy",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "timeMin": time_min,
-                "timeMax": time_max,
-                "timeZone": timezone_str,
-                "items": [{"id": account_email}],
-            },
-        )
+    resp = await _http.post(
+        "https://www.googleapis.com/calendar/v3/freeBusy",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "timeMin": time_min,
+            "timeMax": time_max,
+            "timeZone": timezone_str,
+            "items": [{"id": account_email}],
+        },
+    )
 
     if resp.status_code != 200:
         return {"error": f"Freebusy API error: {resp.status_code}", "detail": resp.text}
@@ -593,12 +595,11 @@ async def list_calendar_events(business_id: int, time_min: str, time_max: str) -
         "maxResults": "50",
     }
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events",
-            headers={"Authorization": f"Bearer {access_token}"},
-            params=params,
-        )
+    resp = await _http.get(
+        f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params=params,
+    )
 
     if resp.status_code != 200:
         return {"error": f"Google Calendar API error: {resp.status_code}", "detail": resp.text}
@@ -644,15 +645,14 @@ async def create_calendar_event(
     if description:
         event_body["description"] = description
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            },
-            json=event_body,
-        )
+    resp = await _http.post(
+        f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        },
+        json=event_body,
+    )
 
     if resp.status_code not in (200, 201):
         return {"error": f"Failed to create event: {resp.status_code}", "detail": resp.text}
@@ -695,15 +695,14 @@ async def update_calendar_event(
     if not event_body:
         return {"error": "No fields to update"}
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.patch(
-            f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events/{event_id}",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            },
-            json=event_body,
-        )
+    resp = await _http.patch(
+        f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events/{event_id}",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        },
+        json=event_body,
+    )
 
     if resp.status_code != 200:
         return {"error": f"Failed to update event: {resp.status_code}", "detail": resp.text}
@@ -724,11 +723,10 @@ async def delete_calendar_event(business_id: int, event_id: str) -> dict:
     access_token, _ = await get_google_access_token(business_id)
     calendar_id = await get_or_create_helloml_calendar(business_id)
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.delete(
-            f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events/{event_id}",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
+    resp = await _http.delete(
+        f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events/{event_id}",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
 
     if resp.status_code not in (200, 204):
         return {"error": f"Failed to delete event: {resp.status_code}", "detail": resp.text}
@@ -745,9 +743,9 @@ async def get_outlook_access_token(business_id: int) -> tuple[str, dict]:
     Returns (access_token, connection_record).
     """
     db = get_service_client()
-    result = db.table("tool_connection").select("*").eq(
+    result = await asyncio.to_thread(db.table("tool_connection").select("*").eq(
         "business_id", business_id
-    ).eq("provider", "outlook-calendar").single().execute()
+    ).eq("provider", "outlook-calendar").single().execute)
 
     if not result.data:
         raise ValueError("Outlook Calendar not connected")
@@ -766,17 +764,16 @@ async def get_outlook_access_token(business_id: int) -> tuple[str, dict]:
             needs_refresh = True
 
     if needs_refresh and refresh_token:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"https://login.microsoftonline.com/{MS_TENANT}/oauth2/v2.0/token",
-                data={
-                    "client_id": MS_CLIENT_ID,
-                    "client_secret": MS_CLIENT_SECRET,
-                    "refresh_token": refresh_token,
-                    "grant_type": "refresh_token",
-                    "scope": " ".join(MS_SCOPES),
-                },
-            )
+        resp = await _http.post(
+            f"https://login.microsoftonline.com/{MS_TENANT}/oauth2/v2.0/token",
+            data={
+                "client_id": MS_CLIENT_ID,
+                "client_secret": MS_CLIENT_SECRET,
+                "refresh_token": refresh_token,
+                "grant_type": "refresh_token",
+                "scope": " ".join(MS_SCOPES),
+            },
+        )
 
         if resp.status_code == 200:
             new_tokens = resp.json()
@@ -786,12 +783,12 @@ async def get_outlook_access_token(business_id: int) -> tuple[str, dict]:
             from datetime import timedelta
             new_expiry = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
 
-            db.table("tool_connection").update({
+            await asyncio.to_thread(db.table("tool_connection").update({
                 "access_token": access_token,
                 "refresh_token": new_refresh,
                 "token_expiry": new_expiry.isoformat(),
                 "updated_at": datetime.now(timezone.utc).isoformat(),
-            }).eq("business_id", business_id).eq("provider", "outlook-calendar").execute()
+            }).eq("business_id", business_id).eq("provider", "outlook-calendar").execute)
 
             conn["access_token"] = access_token
             print(f"[Integrations] Refreshed Outlook token for business {business_id}")
@@ -812,20 +809,19 @@ async def outlook_check_availability(
     access_token, conn = await get_outlook_access_token(business_id)
     account_email = conn.get("account_email")
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://graph.microsoft.com/v1.0/me/calendar/getSchedule",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "schedules": [account_email],
-                "startTime": {"dateTime": time_min, "timeZone": timezone_str},
-                "endTime": {"dateTime": time_max, "timeZone": timezone_str},
-                "availabilityViewInterval": 30,
-            },
-        )
+    resp = await _http.post(
+        "https://graph.microsoft.com/v1.0/me/calendar/getSchedule",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "schedules": [account_email],
+            "startTime": {"dateTime": time_min, "timeZone": timezone_str},
+            "endTime": {"dateTime": time_max, "timeZone": timezone_str},
+            "availabilityViewInterval": 30,
+        },
+    )
 
     if resp.status_code != 200:
         return {"error": f"Outlook API error: {resp.status_code}", "detail": resp.text}
@@ -869,15 +865,14 @@ async def outlook_create_event(
     if description:
         event_body["body"] = {"contentType": "text", "content": description}
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://graph.microsoft.com/v1.0/me/events",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            },
-            json=event_body,
-        )
+    resp = await _http.post(
+        "https://graph.microsoft.com/v1.0/me/events",
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        },
+        json=event_body,
+    )
 
     if resp.status_code not in (200, 201):
         return {"error": f"Failed to create Outlook event: {resp.status_code}", "detail": resp.text}
@@ -920,16 +915,15 @@ async def get_google_drive_access_token(business_id: int) -> str:
             needs_refresh = True
 
     if needs_refresh and refresh_token:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                "https://oauth2.googleapis.com/token",
-                data={
-                    "client_id": GOOGLE_CLIENT_ID,
-                    "client_secret": GOOGLE_CLIENT_SECRET,
-                    "refresh_token": refresh_token,
-                    "grant_type": "refresh_token",
-                },
-            )
+        resp = await _http.post(
+            "https://oauth2.googleapis.com/token",
+            data={
+                "client_id": GOOGLE_CLIENT_ID,
+                "client_secret": GOOGLE_CLIENT_SECRET,
+                "refresh_token": refresh_token,
+                "grant_type": "refresh_token",
+            },
+        )
 
         if resp.status_code == 200:
             new_tokens = resp.json()
@@ -968,17 +962,16 @@ async def list_drive_docs(business_id: int, max_results: int = 50) -> list:
         "mimeType='text/csv'"
     )
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://www.googleapis.com/drive/v3/files",
-            headers={"Authorization": f"Bearer {access_token}"},
-            params={
-                "q": f"({query}) and trashed=false",
-                "fields": "files(id,name,mimeType,modifiedTime,size)",
-                "pageSize": max_results,
-                "orderBy": "modifiedTime desc",
-            },
-        )
+    resp = await _http.get(
+        "https://www.googleapis.com/drive/v3/files",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={
+            "q": f"({query}) and trashed=false",
+            "fields": "files(id,name,mimeType,modifiedTime,size)",
+            "pageSize": max_results,
+            "orderBy": "modifiedTime desc",
+        },
+    )
 
     if resp.status_code != 200:
         print(f"[Drive] List files error: {resp.status_code} - {resp.text}")
@@ -1157,17 +1150,16 @@ async def list_drive_folders(
 
     access_token = await get_google_drive_access_token(business_id)
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://www.googleapis.com/drive/v3/files",
-            headers={"Authorization": f"Bearer {access_token}"},
-            params={
-                "q": "mimeType='application/vnd.google-apps.folder' and trashed=false",
-                "fields": "files(id,name,parents)",
-                "pageSize": 100,
-                "orderBy": "name",
-            },
-        )
+    resp = await _http.get(
+        "https://www.googleapis.com/drive/v3/files",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={
+            "q": "mimeType='application/vnd.google-apps.folder' and trashed=false",
+            "fields": "files(id,name,parents)",
+            "pageSize": 100,
+            "orderBy": "name",
+        },
+    )
 
     if resp.status_code != 200:
         raise HTTPException(status_code=502, detail="Failed to list Drive folders")
@@ -1212,12 +1204,11 @@ async def list_calendars(
 
     if provider == "google-calendar":
         access_token, _ = await get_google_access_token(business_id)
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                "https://www.googleapis.com/calendar/v3/users/me/calendarList",
-                headers={"Authorization": f"Bearer {access_token}"},
-                params={"minAccessRole": "writer"},
-            )
+        resp = await _http.get(
+            "https://www.googleapis.com/calendar/v3/users/me/calendarList",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params={"minAccessRole": "writer"},
+        )
         if resp.status_code != 200:
             raise HTTPException(status_code=502, detail="Failed to list Google calendars")
         items = resp.json().get("items", [])
@@ -1225,11 +1216,10 @@ async def list_calendars(
 
     elif provider == "outlook-calendar":
         access_token, _ = await get_outlook_access_token(business_id)
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                "https://graph.microsoft.com/v1.0/me/calendars",
-                headers={"Authorization": f"Bearer {access_token}"},
-            )
+        resp = await _http.get(
+            "https://graph.microsoft.com/v1.0/me/calendars",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
         if resp.status_code != 200:
             raise HTTPException(status_code=502, detail="Failed to list Outlook calendars")
         items = resp.json().get("value", [])
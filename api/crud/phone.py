@@ -1,22 +1,68 @@
 # api/crud/phone.py
 
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from twilio.rest import Client
+from pydantic import BaseModel, Field
 import os
+import time
+import asyncio
+import threading
 import logging
 from typing import Optional
 from ..database import get_service_client
+from ..twilio_client import get_twilio_client
 from ..auth import get_current_user, AuthenticatedUser
+from ..phone_utils import to_e164
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/phone", tags=["Phone"])
 
+AVAILABLE_NUMBER_BATCH = 5  # numbers fetched per Twilio availability search
+AVAILABLE_NUMBER_TTL = 300  # seconds a searched number is trusted to still be free
+
+# area_code -> (monotonic time searched, [phone numbers still unused])
+_available_numbers: dict = {}
+# Searches run in worker threads; guards the check-then-pop on leftovers
+_available_numbers_lock = threading.Lock()
+
+
+def _pop_cached_number(area_code: str) -> Optional[str]:
+    """Return a leftover number from a recent search in the area code, if any."""
+    with _available_numbers_lock:
+        entry = _available_numbers.get(area_code)
+        if entry and entry[1] and time.monotonic() - entry[0] < AVAILABLE_NUMBER_TTL:
+            return entry[1].pop()
+    return None
+
+
+def _forget_available_numbers(area_code: str):
+    """Drop an area code's leftovers, e.g. after one turned out to be taken."""
+    with _available_numbers_lock:
+        _available_numbers.pop(area_code, None)
+
+
+def _search_available_number(client, area_code: str) -> Optional[str]:
+    """
+    Search Twilio for a batch of numbers in the area code. Returns one and
+    keeps the rest for later provisions, or None if Twilio has none.
+    """
+    available = client.available_phone_numbers('US').local.list(
+        area_code=area_code, limit=AVAILABLE_NUMBER_BATCH
+    )
+    numbers = [n.phone_number for n in available]
+    if not numbers:
+        _forget_available_numbers(area_code)
+        return None
+    chosen = numbers.pop(0)
+    with _available_numbers_lock:
+        _available_numbers[area_code] = (time.monotonic(), numbers)
+    return chosen
+
 
 class ProvisionPhoneRequest(BaseModel):
     agent_id: int
-    area_code: str
+    # Rejected at parse time, before any DB or Twilio round trip
+    area_code: str = Field(pattern=r"^\d{3}$")
     force: Optional[bool] = False
 
 
@@ -30,8 +76,12 @@ async def provision_phone(
         db = current_user.get_db()
         service_db = get_service_client()
 
-        # Verify user owns the agent (RLS will filter)
-        agent = db.table('agent').select('*').eq('id', request.agent_id).execute()
+        # Verify user owns the agent (RLS will filter) and check for an existing
+        # phone (service client, to be sure we see it) in parallel
+        agent, existing_phone = await asyncio.gather(
+            asyncio.to_thread(db.table('agent').select('id, status').eq('id', request.agent_id).execute),
+            asyncio.to_thread(service_db.table('phone_number').select('id, phone_number').eq('agent_id', request.agent_id).execute),
+        )
         if not agent.data:
             raise HTTPException(status_code=404, detail="Agent not found or access denied")
 
@@ -43,9 +93,6 @@ async def provision_phone(
                 detail=f"Cannot provision phone for agent with status: {agent_data.get('status')}"
             )
 
-        # Check existing phone (use service client to ensure we see it)
-        existing_phone = service_db.table('phone_number').select('*').eq('agent_id', request.agent_id).execute()
-
         if existing_phone.data:
             if not request.force:
                 phone = existing_phone.data[0]
@@ -62,45 +109,63 @@ async def provision_phone(
                     raise HTTPException(status_code=500, detail=f"Failed to release existing phone: {str(cleanup_error)}")
 
         # Provision with Twilio
-        client = Client(os.getenv("ACCOUNT_SID"), os.getenv("AUTH_TOKEN"))
+        client = get_twilio_client()
 
-        try:
-            available = client.available_phone_numbers('US').local.list(area_code=request.area_code, limit=1)
-        except Exception as twilio_error:
-            raise HTTPException(status_code=502, detail=f"Failed to search Twilio: {str(twilio_error)}")
+        async def search():
+            try:
+                found = await asyncio.to_thread(_search_available_number, client, request.area_code)
+            except Exception as twilio_error:
+                raise HTTPException(status_code=502, detail=f"Failed to search Twilio: {str(twilio_error)}")
+            if not found:
+                raise HTTPException(status_code=404, detail=f"No phone numbers available in area code {request.area_code}")
+            return found
 
-        if not available:
-            raise HTTPException(status_code=404, detail=f"No phone numbers available in area code {request.area_code}")
+        cached_number = _pop_cached_number(request.area_code)
+        available_number = cached_number or await search()
 
         base_url = os.getenv("API_BASE_URL", "https://api.helloml.app")
         webhook_url = f"{base_url}/conversation/{request.agent_id}/voice"
 
-        try:
-            number = client.incoming_phone_numbers.create(
-                phone_number=available[0].phone_number,
+        def purchase(phone_number):
+            return asyncio.to_thread(
+                client.incoming_phone_numbers.create,
+                phone_number=phone_number,
                 voice_url=webhook_url,
                 voice_method='POST'
             )
+
+        try:
+            number = await purchase(available_number)
         except Exception as twilio_error:
-            raise HTTPException(status_code=502, detail=f"Failed to purchase number: {str(twilio_error)}")
+            if not cached_number:
+                raise HTTPException(status_code=502, detail=f"Failed to purchase number: {str(twilio_error)}")
+            # The leftover may have been bought elsewhere since it was listed;
+            # drop the rest of the batch and retry once with a fresh search
+            _forget_available_numbers(request.area_code)
+            try:
+                number = await purchase(await search())
+            except HTTPException:
+                raise
+            except Exception as retry_error:
+                raise HTTPException(status_code=502, detail=f"Failed to purchase number: {str(retry_error)}")
 
         # Save to database (use service client for insert)
         try:
-            result = service_db.table('phone_number').insert({
+            result = await asyncio.to_thread(service_db.table('phone_number').insert({
                 'agent_id': request.agent_id,
-                'phone_number': number.phone_number,
+                'phone_number': to_e164(number.phone_number) or number.phone_number,
                 'country': 'US',
                 'area_code': request.area_code,
                 'webhook_url': webhook_url,
                 'status': 'active'
-            }).execute()
+            }).execute)
 
             return result.data[0]
 
         except Exception as db_error:
             # Rollback Twilio purchase
             try:
-                number.delete()
+                await asyncio.to_thread(number.delete)
             except:
                 pass
             raise HTTPException(status_code=500, detail=f"Failed to save phone number: {str(db_error)}")
@@ -113,7 +178,7 @@ async def provision_phone(
 
 async def _cleanup_phone_internal(db, phone_id: int):
     """Internal helper to cleanup/release a phone number."""
-    phone = db.table('phone_number').select('*').eq('id', phone_id).single().execute()
+    phone = await asyncio.to_thread(db.table('phone_number').select('*').eq('id', phone_id).single().execute)
 
     if not phone.data:
         raise Exception(f"Phone number with ID {phone_id} not found")
@@ -121,14 +186,14 @@ async def _cleanup_phone_internal(db, phone_id: int):
     phone_data = phone.data
 
     try:
-        client = Client(os.getenv("ACCOUNT_SID"), os.getenv("AUTH_TOKEN"))
-        numbers = client.incoming_phone_numbers.list(phone_number=phone_data['phone_number'])
+        client = get_twilio_client()
+        numbers = await asyncio.to_thread(client.incoming_phone_numbers.list, phone_number=phone_data['phone_number'])
         if numbers:
-            numbers[0].delete()
+            await asyncio.to_thread(numbers[0].delete)
     except Exception as e:
         logger.error(f"Failed to release Twilio number: {e}")
 
-    db.table('phone_number').delete().eq('id', phone_id).execute()
+    await asyncio.to_thread(db.table('phone_number').delete().eq('id', phone_id).execute)
 
 
 @router.get("/agent/{agent_id}", summary="Get phone number for agent")
@@ -1,12 +1,12 @@
 # api/crud/phone_maintenance.py
 
 from fastapi import APIRouter, HTTPException, Header
-from twilio.rest import Client
 import os
 import logging
 import httpx
 from datetime import datetime, timezone
 from ..database import get_service_client
+from ..twilio_client import get_twilio_client
 
 logger = logging.getLogger(__name__)
 
@@ -138,7 +138,7 @@ async def send_warning_email(to_email: str, phone_number: str, business_name: st
 async def release_twilio_number(phone_number: str) -> bool:
     """Release a phone number from Twilio."""
     try:
-        client = Client(os.getenv("ACCOUNT_SID"), os.getenv("AUTH_TOKEN"))
+        client = get_twilio_client()
         numbers = client.incoming_phone_numbers.list(phone_number=phone_number)
 
         if numbers:
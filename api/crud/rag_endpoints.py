@@ -4,9 +4,8 @@ from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
 from pydantic import BaseModel
 from typing import Optional
 from openai import OpenAI
-from PyPDF2 import PdfReader
 from ..database import get_service_client
-from ..rag import upsert_document_text, semantic_search
+from ..rag import upsert_document_text, semantic_search, forget_agent_searches
 from ..auth import get_current_user, AuthenticatedUser
 import io
 import os
@@ -106,6 +105,9 @@ async def create_pdf_document(
         if "pdf" not in (file.content_type or "").lower():
             raise HTTPException(status_code=400, detail="Only PDF files are supported.")
 
+        # Imported here: PDF upload is rare and PyPDF2 is slow to import at boot
+        from PyPDF2 import PdfReader
+
         pdf_bytes = await file.read()
         reader = PdfReader(io.BytesIO(pdf_bytes))
         full_text = "\n".join((p.extract_text() or "") for p in reader.pages).strip()
@@ -176,12 +178,13 @@ async def delete_document(
         service_db = get_service_client()
 
         # Verify ownership via RLS
-        existing = db.table("document").select("id").eq("id", document_id).execute()
+        existing = db.table("document").select("id, agent_id").eq("id", document_id).execute()
         if not existing.data:
             raise HTTPException(status_code=404, detail="Document not found")
 
         # Use service client for delete (cascades to chunks)
         service_db.table("document").delete().eq("id", document_id).execute()
+        forget_agent_searches(existing.data[0]["agent_id"])
 
         return {"success": True, "deleted_id": document_id}
 
@@ -371,12 +374,14 @@ async def bulk_delete_documents(
         service_db = get_service_client()
 
         # Verify ownership via RLS
-        existing = db.table("document").select("id").in_("id", document_ids).execute()
+        existing = db.table("document").select("id, agent_id").in_("id", document_ids).execute()
         if len(existing.data) != len(document_ids):
             raise HTTPException(status_code=404, detail="Some documents not found")
 
         for doc_id in document_ids:
             service_db.table("document").delete().eq("id", doc_id).execute()
+        for agent_id in {row["agent_id"] for row in existing.data}:
+            forget_agent_searches(agent_id)
 
         return {"success": True, "deleted_count": len(document_ids)}
     except HTTPException:
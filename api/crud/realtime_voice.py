@@ -12,18 +12,176 @@ handled the initial webhook.
 import os
 import json
 import asyncio
+import orjson
+import logging
 from datetime import datetime
+from xml.sax.saxutils import escape as xml_escape
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request, HTTPException
 from fastapi.responses import Response
 from api.database import get_service_client
-from api.realtime_manager import RealtimeSession
+from api.agent_cache import get_cached_agent, cache_agent, get_shared_agent, share_agent
+from api.realtime_manager import RealtimeSession, prewarm_realtime_socket
 # audio_utils no longer needed — pcmu passthrough means zero conversion
 
-FREE_TRIAL_MINUTES = 5
+logger = logging.getLogger(__name__)
 
+FREE_TRIAL_MINUTES = 5
+KEEPALIVE_INTERVAL = 30  # seconds between keepalive marks to Twilio
+KEEPALIVE_MARK = "keepalive"
+
+# Agent columns the Twilio call path reads (webhook, media stream, RealtimeSession)
+_AGENT_CALL_FIELDS = 'id, name, business_id, model_type, prompt, voice_model, greeting, goodbye'
+
+# <Connect><Stream> TwiML for an incoming call. Only the stream URL and the two
+# integer ids vary, so this is filled with str.format instead of building an
+# XML tree; the URL (which includes the request Host) is attribute-escaped.
+_STREAM_TWIML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Response><Connect><Stream url="{ws_url}">'
+    '<Parameter name="agent_id" value="{agent_id}" />'
+    '<Parameter name="conversation_id" value="{conversation_id}" />'
+    '</Stream></Connect></Response>'
+)
+_XML_ATTR_ENTITIES = {'"': "&quot;"}
+
+# Fixed hang-up responses, encoded once
+_AGENT_NOT_FOUND_TWIML = b'<Response><Say>Agent not found.</Say><Hangup/></Response>'
+_TRIAL_ENDED_TWIML = (
+    b'<Response><Say>Your free trial has ended. Please subscribe to continue '
+    b'using this service. Goodbye.</Say><Hangup/></Response>'
+)
+_ERROR_TWIML = b'<Response><Say>Sorry, there was an error.</Say><Hangup/></Response>'
 
 router = APIRouter(prefix="/conversation", tags=["Voice"])
 
+# Cap concurrent blocking Supabase calls below the worker thread pool size so a
+# burst of calls can't starve every other call waiting on the pool.
+_DB_SEM = asyncio.Semaphore(int(os.getenv("DB_CONCURRENCY", "20")))
+
+# Strong references to in-flight end-of-call writes so they aren't GC'd
+_finalize_tasks: set = set()
+
+# agent_id -> in-flight agent row load, so a burst of calls to one number
+# issues a single query while the rest await its result
+_agent_loads: dict = {}
+
+
+async def _exec(query):
+    """Run a Supabase query's blocking execute() in a worker thread, bounded by _DB_SEM."""
+    async with _DB_SEM:
+        return await asyncio.to_thread(query.execute)
+
+
+async def _load_agent_config(db, agent_id: int):
+    """Fetch an agent row from Redis or the database and fill the local cache."""
+    agent_config = await get_shared_agent(agent_id)
+    if agent_config is None:
+        agent_data = await _exec(db.table('agent').select(_AGENT_CALL_FIELDS).eq('id', agent_id).single())
+        agent_config = agent_data.data
+        if agent_config:
+            await share_agent(agent_id, agent_config)
+    if agent_config:
+        cache_agent(agent_id, agent_config)
+    return agent_config
+
+
+async def _get_agent_config(db, agent_id: int):
+    """Agent row for a call, served from the short-lived agent cache when fresh."""
+    agent_config = get_cached_agent(agent_id)
+    if agent_config is not None:
+        return agent_config
+
+    # Concurrent misses for the same agent share one load
+    load = _agent_loads.get(agent_id)
+    if load is None:
+        load = asyncio.ensure_future(_load_agent_config(db, agent_id))
+        _agent_loads[agent_id] = load
+        load.add_done_callback(lambda _: _agent_loads.pop(agent_id, None))
+    # Shielded so one caller hanging up doesn't cancel the load for the rest
+    return await asyncio.shield(load)
+
+
+async def _mark_conversation_completed(db, conversation_id: int):
+    """Mark the conversation completed without blocking the event loop."""
+    try:
+        await _exec(
+            db.table('conversation').update({
+                'status': 'completed',
+                'ended_at': 'now()'
+            }).eq('id', conversation_id)
+        )
+        logger.info("[MediaStream] Conversation %s marked as completed", conversation_id)
+    except Exception as e:
+        logger.error("[MediaStream] Error updating conversation: %s", e)
+
+
+async def _fetch_business_info(db, business_id: int) -> dict:
+    """Business details used as call context; empty if the lookup fails."""
+    try:
+        biz_data = await _exec(db.table('business').select('name, address, business_email, phone_number').eq('id', business_id).single())
+        if biz_data.data:
+            logger.info("[MediaStream] Business info loaded: %s", biz_data.data.get('name', 'unknown'))
+            return biz_data.data
+    except Exception as e:
+        logger.warning("[MediaStream] Could not fetch business info: %s", e)
+    return {}
+
+
+async def _fetch_agent_phone(db, agent_id: int):
+    """The agent's Twilio phone number, or None."""
+    try:
+        phone_data = await _exec(db.table('phone_number').select('phone_number').eq('agent_id', agent_id).limit(1))
+        if phone_data.data:
+            agent_phone = phone_data.data[0].get('phone_number')
+            logger.info("[MediaStream] Agent phone number loaded: %s", agent_phone)
+            return agent_phone
+    except Exception as e:
+        logger.warning("[MediaStream] Could not fetch agent phone: %s", e)
+    return None
+
+
+async def _fetch_tool_connections(db, business_id: int):
+    """Connected tool providers and their settings for the business."""
+    connected_tools = []
+    tool_settings = {}
+    try:
+        tc_data = await _exec(db.table('tool_connection').select('provider, settings').eq('business_id', business_id))
+        for tc in (tc_data.data or []):
+            provider = tc['provider']
+            connected_tools.append(provider)
+            tool_settings[provider] = tc.get('settings') or {}
+        if connected_tools:
+            logger.info("[MediaStream] Connected tools: %s", connected_tools)
+            logger.info("[MediaStream] Tool settings: %s", tool_settings)
+    except Exception as e:
+        logger.warning("[MediaStream] Could not fetch tool connections: %s", e)
+    return connected_tools, tool_settings
+
+
+async def _keepalive_loop(websocket: WebSocket, stream_sid: str):
+    """
+    Periodically send a mark event to Twilio so a dead tunnel surfaces as a
+    send error instead of a silently hung call. Twilio echoes the mark back;
+    the main loop ignores it.
+    """
+    keepalive_event = {
+        "event": "mark",
+        "streamSid": stream_sid,
+        "mark": {"name": KEEPALIVE_MARK}
+    }
+    try:
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            await websocket.send_json(keepalive_event)
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error("[MediaStream] Keepalive failed, closing stream: %s", e)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
 
 @router.post('/{agent_id}/voice', summary="Handle incoming call (Twilio webhook)")
 async def handle_incoming_call(agent_id: int, request: Request):
@@ -35,34 +193,31 @@ async def handle_incoming_call(agent_id: int, request: Request):
     """
     try:
         db = get_service_client()
-        form_data = await request.form()
 
+        # Parse the webhook body while the agent config is fetched (cached
+        # briefly; the media stream reads it again)
+        form_data, agent_config = await asyncio.gather(
+            request.form(), _get_agent_config(db, agent_id)
+        )
         caller_phone = form_data.get('From', 'unknown')
 
-        # Get agent config from database
-        agent_data = db.table('agent').select('*').eq('id', agent_id).single().execute()
-        if not agent_data.data:
-            return Response(
-                content='<Response><Say>Agent not found.</Say><Hangup/></Response>',
-                media_type="application/xml"
-            )
-
-        agent_config = agent_data.data
+        if not agent_config:
+            return Response(content=_AGENT_NOT_FOUND_TWIML, media_type="application/xml")
 
         # Check if trial is exhausted (no active subscription and >= 5 minutes used)
         business_id = agent_config.get('business_id')
         if business_id:
-            sub_data = db.table('subscription').select('status').eq(
+            sub_data = await _exec(db.table('subscription').select('status').eq(
                 'business_id', business_id
-            ).in_('status', ['active', 'trialing']).limit(1).execute()
+            ).in_('status', ['active', 'trialing']).limit(1))
 
             has_active_sub = bool(sub_data.data)
 
             if not has_active_sub:
                 # Calculate used minutes from completed conversations
-                convos = db.table('conversation').select(
+                convos = await _exec(db.table('conversation').select(
                     'started_at, ended_at'
-                ).eq('agent_id', agent_id).not_.is_('ended_at', 'null').execute()
+                ).eq('agent_id', agent_id).not_.is_('ended_at', 'null'))
 
                 total_minutes = 0.0
                 for c in (convos.data or []):
@@ -74,18 +229,19 @@ async def handle_incoming_call(agent_id: int, request: Request):
                         continue
 
                 if total_minutes >= FREE_TRIAL_MINUTES:
-                    print(f"[TwilioWebhook] Trial exhausted for agent {agent_id}: {total_minutes:.1f} min used", flush=True)
-                    return Response(
-                        content='<Response><Say>Your free trial has ended. Please subscribe to continue using this service. Goodbye.</Say><Hangup/></Response>',
-                        media_type="application/xml"
-                    )
+                    logger.warning("[TwilioWebhook] Trial exhausted for agent %s: %.1f min used", agent_id, total_minutes)
+                    return Response(content=_TRIAL_ENDED_TWIML, media_type="application/xml")
+
+        # Twilio opens the media stream only after it gets our TwiML; start the
+        # OpenAI handshakes now so the socket is ready when the stream is
+        prewarm_realtime_socket(agent_config.get('model_type'))
 
         # Create conversation record
-        conversation = db.table('conversation').insert({
+        conversation = await _exec(db.table('conversation').insert({
             'agent_id': agent_id,
             'caller_phone': caller_phone,
             'status': 'in_progress'
-        }).execute()
+        }))
 
         conversation_id = conversation.data[0]['id']
 
@@ -99,28 +255,21 @@ async def handle_incoming_call(agent_id: int, request: Request):
         machine_id = os.getenv("FLY_MACHINE_ID", "local")
         ws_url = f"wss://{request.url.hostname}/conversation/{agent_id}/media-stream/{machine_id}"
 
-        print(f"[TwilioWebhook] Incoming call for agent {agent_id}, conversation {conversation_id}", flush=True)
-        print(f"[TwilioWebhook] Machine ID: {machine_id}", flush=True)
-        print(f"[TwilioWebhook] Generated WebSocket URL: {ws_url}", flush=True)
+        logger.info("[TwilioWebhook] Incoming call for agent %s, conversation %s", agent_id, conversation_id)
+        logger.info("[TwilioWebhook] Machine ID: %s", machine_id)
+        logger.info("[TwilioWebhook] Generated WebSocket URL: %s", ws_url)
 
-        twiml = f'''<?xml version="1.0" encoding="UTF-8"?>
-                    <Response>
-                        <Connect>
-                            <Stream url="{ws_url}">
-                                <Parameter name="agent_id" value="{agent_id}" />
-                                <Parameter name="conversation_id" value="{conversation_id}" />
-                            </Stream>
-                        </Connect>
-                    </Response>'''
+        twiml = _STREAM_TWIML.format(
+            ws_url=xml_escape(ws_url, _XML_ATTR_ENTITIES),
+            agent_id=agent_id,
+            conversation_id=conversation_id,
+        )
 
         return Response(content=twiml, media_type="application/xml")
 
     except Exception as e:
-        print(f"[TwilioWebhook] Error: {e}")
-        return Response(
-            content='<Response><Say>Sorry, there was an error.</Say><Hangup/></Response>',
-            media_type="application/xml"
-        )
+        logger.exception("[TwilioWebhook] Error handling incoming call for agent %s: %s", agent_id, e)
+        return Response(content=_ERROR_TWIML, media_type="application/xml")
 
 
 @router.websocket('/{agent_id}/media-stream/{target_machine_id}')
@@ -135,13 +284,13 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
     The FlyReplayMiddleware intercepts requests to wrong machines before they reach here.
     """
     current_machine_id = os.getenv("FLY_MACHINE_ID", "local")
-    print(f"[MediaStream] WebSocket connection for agent {agent_id} on machine {current_machine_id}", flush=True)
+    logger.info("[MediaStream] WebSocket connection for agent %s on machine %s", agent_id, current_machine_id)
 
     try:
         await websocket.accept()
-        print(f"[MediaStream] WebSocket accepted", flush=True)
+        logger.info("[MediaStream] WebSocket accepted")
     except Exception as e:
-        print(f"[MediaStream] Error accepting WebSocket: {e}", flush=True)
+        logger.error("[MediaStream] Error accepting WebSocket: %s", e)
         return
 
     # Wait for the "start" event from Twilio to get conversation_id from customParameters
@@ -159,13 +308,13 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
         while not start_event_found and attempt < max_attempts:
             attempt += 1
             message = await websocket.receive_text()
-            print(f"[MediaStream] Received message {attempt}: {message[:200]}", flush=True)
+            logger.debug("[MediaStream] Received message %s: %s", attempt, message[:200])
 
             event = json.loads(message)
             event_type = event.get("event")
 
             if event_type == "connected":
-                print(f"[MediaStream] Received 'connected' event, waiting for 'start'", flush=True)
+                logger.info("[MediaStream] Received 'connected' event, waiting for 'start'")
                 continue
             elif event_type == "start":
                 stream_sid = event.get("start", {}).get("streamSid")
@@ -173,97 +322,87 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
                 custom_params = event.get("start", {}).get("customParameters", {})
                 conversation_id = custom_params.get("conversation_id")
 
-                print(f"[MediaStream] Stream started: {stream_sid}", flush=True)
-                print(f"[MediaStream] Call SID: {call_sid}", flush=True)
-                print(f"[MediaStream] Extracted conversation_id from customParameters: {conversation_id}", flush=True)
-                print(f"[MediaStream] Custom parameters: {custom_params}", flush=True)
+                logger.info("[MediaStream] Stream started: %s", stream_sid)
+                logger.info("[MediaStream] Call SID: %s", call_sid)
+                logger.info("[MediaStream] Extracted conversation_id from customParameters: %s", conversation_id)
+                logger.info("[MediaStream] Custom parameters: %s", custom_params)
                 start_event_found = True
             else:
-                print(f"[MediaStream] Unexpected event type: {event_type}", flush=True)
+                logger.warning("[MediaStream] Unexpected event type: %s", event_type)
 
         if not start_event_found:
-            print(f"[MediaStream] Error: Did not receive 'start' event after {attempt} messages", flush=True)
+            logger.error("[MediaStream] Did not receive 'start' event after %s messages", attempt)
             await websocket.close(code=1008, reason="Start event not received")
             return
     except Exception as e:
-        print(f"[MediaStream] Error reading start event: {e}", flush=True)
-        import traceback
-        print(f"[MediaStream] Traceback: {traceback.format_exc()}", flush=True)
+        logger.exception("[MediaStream] Error reading start event: %s", e)
         await websocket.close(code=1008, reason="Failed to read start event")
         return
 
     if not conversation_id:
-        print("[MediaStream] Error: conversation_id not in customParameters", flush=True)
+        logger.error("[MediaStream] conversation_id not in customParameters")
         await websocket.close(code=1008, reason="Missing conversation_id")
         return
 
     try:
         conversation_id = int(conversation_id)
-        print(f"[MediaStream] Parsed conversation_id: {conversation_id}", flush=True)
+        logger.info("[MediaStream] Parsed conversation_id: %s", conversation_id)
     except ValueError:
-        print("[MediaStream] Error: Invalid conversation_id format", flush=True)
+        logger.error("[MediaStream] Invalid conversation_id format")
         await websocket.close(code=1008, reason="Invalid conversation_id")
         return
 
-    print(f"[MediaStream] WebSocket connected for conversation {conversation_id}", flush=True)
+    logger.info("[MediaStream] WebSocket connected for conversation %s", conversation_id)
 
     db = None
     realtime_session: RealtimeSession = None
 
     audio_flush_task = None  # unused, kept for cleanup block
+    keepalive_task = None
 
     try:
-        print(f"[MediaStream] Getting database connection", flush=True)
+        logger.debug("[MediaStream] Getting database connection")
         db = get_service_client()
-        print(f"[MediaStream] Database connection established", flush=True)
-        # Get agent config
-        print(f"[MediaStream] Fetching agent config for agent_id={agent_id}", flush=True)
-        agent_data = db.table('agent').select('*').eq('id', agent_id).single().execute()
-        if not agent_data.data:
-            print(f"[MediaStream] Error: Agent {agent_id} not found", flush=True)
+        logger.debug("[MediaStream] Database connection established")
+        # The agent row and its phone number are independent lookups, so run
+        # them concurrently; business info and tools then fan out on business_id.
+        logger.info("[MediaStream] Fetching agent config for agent_id=%s", agent_id)
+        agent_config, agent_phone = await asyncio.gather(
+            _get_agent_config(db, agent_id),
+            _fetch_agent_phone(db, agent_id),
+        )
+        if not agent_config:
+            logger.error("[MediaStream] Agent %s not found", agent_id)
             await websocket.close(code=1008, reason="Agent not found")
             return
 
-        agent_config = agent_data.data
-        print(f"[MediaStream] Agent config loaded: {agent_config.get('name', 'unknown')}", flush=True)
+        logger.info("[MediaStream] Agent config loaded: %s", agent_config.get('name', 'unknown'))
 
-        # Fetch business info for context
         business_info = {}
-        business_id = agent_config.get('business_id')
-        if business_id:
-            try:
-                biz_data = db.table('business').select('name, address, business_email, phone_number').eq('id', business_id).single().execute()
-                if biz_data.data:
-                    business_info = biz_data.data
-                    print(f"[MediaStream] Business info loaded: {business_info.get('name', 'unknown')}", flush=True)
-            except Exception as e:
-                print(f"[MediaStream] Warning: Could not fetch business info: {e}", flush=True)
-
-        # Fetch the agent's Twilio phone number
-        agent_phone = None
-        try:
-            phone_data = db.table('phone_number').select('phone_number').eq('agent_id', agent_id).limit(1).execute()
-            if phone_data.data:
-                agent_phone = phone_data.data[0].get('phone_number')
-                print(f"[MediaStream] Agent phone number loaded: {agent_phone}", flush=True)
-        except Exception as e:
-            print(f"[MediaStream] Warning: Could not fetch agent phone: {e}", flush=True)
-
-        # Fetch connected tool providers and their settings for this business
         connected_tools = []
         tool_settings = {}
+        business_id = agent_config.get('business_id')
         if business_id:
-            try:
-                tc_data = db.table('tool_connection').select('provider, settings').eq('business_id', business_id).execute()
-                for tc in (tc_data.data or []):
-                    provider = tc['provider']
-                    connected_tools.append(provider)
-                    tool_settings[provider] = tc.get('settings') or {}
-                if connected_tools:
-                    print(f"[MediaStream] Connected tools: {connected_tools}", flush=True)
-                    print(f"[MediaStream] Tool settings: {tool_settings}", flush=True)
-            except Exception as e:
-                print(f"[MediaStream] Warning: Could not fetch tool connections: {e}", flush=True)
+            business_info, (connected_tools, tool_settings) = await asyncio.gather(
+                _fetch_business_info(db, business_id),
+                _fetch_tool_connections(db, business_id),
+            )
+
+        # Outbound Twilio events have a fixed shape per stream, so serialize them
+        # once here. Media frames splice the base64 payload (which never needs
+        # JSON escaping) between a prebuilt prefix and suffix. Twilio only accepts
+        # text frames, hence decode() + send_text rather than send_bytes.
+        if stream_sid:
+            media_prefix = orjson.dumps(
+                {"event": "media", "streamSid": stream_sid, "media": {"payload": ""}}
+            ).decode()[:-3]
+            media_suffix = '"}}'
+            clear_msg = orjson.dumps({"event": "clear", "streamSid": stream_sid}).decode()
+            mark_msg = orjson.dumps({
+                "event": "mark",
+                "streamSid": stream_sid,
+                "mark": {"name": "responsePart"}
+            }).decode()
 
         # Callback to send audio to Twilio — direct passthrough, no buffering
         async def send_audio_to_twilio(openai_audio_base64: str):
@@ -271,53 +410,39 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
             try:
                 if not stream_sid:
                     return
-                media_event = {
-                    "event": "media",
-                    "streamSid": stream_sid,
-                    "media": {
-                        "payload": openai_audio_base64
-                    }
-                }
-                await websocket.send_json(media_event)
+                await websocket.send_text(media_prefix + openai_audio_base64 + media_suffix)
             except Exception as e:
-                print(f"[MediaStream] Error sending audio to Twilio: {e}")
+                logger.error("[MediaStream] Error sending audio to Twilio: %s", e)
 
         # Callback to clear Twilio audio buffer on user interruption
         async def handle_interrupt():
             """Send clear event to Twilio to stop queued audio immediately."""
             try:
                 if stream_sid:
-                    await websocket.send_json({
-                        "event": "clear",
-                        "streamSid": stream_sid
-                    })
-                    print(f"[MediaStream] Sent clear event to Twilio")
+                    await websocket.send_text(clear_msg)
+                    logger.info("[MediaStream] Sent clear event to Twilio")
             except Exception as e:
-                print(f"[MediaStream] Error sending clear to Twilio: {e}")
+                logger.error("[MediaStream] Error sending clear to Twilio: %s", e)
 
         # Callback to send mark event to Twilio for audio playback tracking
         async def handle_mark():
             """Send mark event to Twilio to track audio playback position."""
             try:
                 if stream_sid:
-                    await websocket.send_json({
-                        "event": "mark",
-                        "streamSid": stream_sid,
-                        "mark": {"name": "responsePart"}
-                    })
+                    await websocket.send_text(mark_msg)
             except Exception as e:
-                print(f"[MediaStream] Error sending mark to Twilio: {e}")
+                logger.error("[MediaStream] Error sending mark to Twilio: %s", e)
 
         # Callback for error handling
         async def handle_error(error_msg: str):
-            print(f"[MediaStream] Realtime API error: {error_msg}", flush=True)
+            logger.error("[MediaStream] Realtime API error: %s", error_msg)
 
         # Extract greeting and goodbye from agent config
         greeting = agent_config.get('greeting', 'Hello! How can I help you today?')
         goodbye = agent_config.get('goodbye', 'Goodbye! Have a great day!')
 
         # Create OpenAI Realtime session
-        print(f"[MediaStream] Creating OpenAI Realtime session", flush=True)
+        logger.info("[MediaStream] Creating OpenAI Realtime session")
         try:
             realtime_session = RealtimeSession(
                 agent_id=agent_id,
@@ -336,20 +461,22 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
                 connected_tools=connected_tools,
                 tool_settings=tool_settings
             )
-            print(f"[MediaStream] Realtime session created successfully", flush=True)
+            logger.info("[MediaStream] Realtime session created successfully")
         except Exception as e:
-            print(f"[MediaStream] Error creating Realtime session: {e}", flush=True)
+            logger.error("[MediaStream] Error creating Realtime session: %s", e)
             raise
 
         # Connect to OpenAI Realtime API
-        print(f"[MediaStream] Connecting to OpenAI Realtime API", flush=True)
+        logger.info("[MediaStream] Connecting to OpenAI Realtime API")
         try:
             await realtime_session.connect()
-            print(f"[MediaStream] Successfully connected to OpenAI Realtime API", flush=True)
+            logger.info("[MediaStream] Successfully connected to OpenAI Realtime API")
         except Exception as e:
-            print(f"[MediaStream] Error connecting to OpenAI Realtime API: {e}", flush=True)
+            logger.error("[MediaStream] Error connecting to OpenAI Realtime API: %s", e)
             raise
 
+        keepalive_task = asyncio.create_task(_keepalive_loop(websocket, stream_sid))
+
         # Main event loop: receive events from Twilio
         async for message in websocket.iter_text():
             try:
@@ -359,7 +486,7 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
                 # Connection started
                 if event_type == "start":
                     stream_sid = event.get("start", {}).get("streamSid")
-                    print(f"[MediaStream] Stream started: {stream_sid}")
+                    logger.info("[MediaStream] Stream started: %s", stream_sid)
 
                 # Audio from caller (Twilio → OpenAI)
                 elif event_type == "media":
@@ -373,32 +500,33 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
 
                     if twilio_audio_base64 and realtime_session:
                         # With audio/pcmu format, pass Twilio's μ-law audio directly
-                        # to OpenAI — no conversion or resampling needed.
+                        # to OpenAI — no conversion or resampling needed. send_audio
+                        # only queues the frame, so a slow upstream can't stall reads.
                         await realtime_session.send_audio(twilio_audio_base64)
 
                 # Mark packets as received - pop from session mark queue
                 elif event_type == "mark":
-                    if realtime_session and realtime_session.mark_queue:
-                        realtime_session.mark_queue.pop(0)
+                    if event.get("mark", {}).get("name") == KEEPALIVE_MARK:
+                        continue
+                    if realtime_session:
+                        realtime_session.mark_played()
 
                 # Stream stopped
                 elif event_type == "stop":
-                    print(f"[MediaStream] Stream stopped")
+                    logger.info("[MediaStream] Stream stopped")
                     break
 
             except json.JSONDecodeError:
-                print(f"[MediaStream] Invalid JSON received")
+                logger.warning("[MediaStream] Invalid JSON received")
             except Exception as e:
-                print(f"[MediaStream] Error processing event: {e}")
+                logger.error("[MediaStream] Error processing event: %s", e)
 
     except WebSocketDisconnect:
-        print(f"[MediaStream] WebSocket disconnected for conversation {conversation_id}", flush=True)
+        logger.info("[MediaStream] WebSocket disconnected for conversation %s", conversation_id)
     except Exception as e:
-        print(f"[MediaStream] Error in media stream handler: {e}", flush=True)
-        import traceback
-        print(f"[MediaStream] Traceback: {traceback.format_exc()}", flush=True)
+        logger.exception("[MediaStream] Error in media stream handler: %s", e)
     finally:
-        print(f"[MediaStream] Entering cleanup for conversation {conversation_id}", flush=True)
+        logger.info("[MediaStream] Entering cleanup for conversation %s", conversation_id)
         # Cancel audio flush loop
         if audio_flush_task:
             audio_flush_task.cancel()
@@ -410,15 +538,15 @@ async def media_stream_handler(websocket: WebSocket, agent_id: int, target_machi
         if realtime_session:
             await realtime_session.disconnect()
 
-        # Update conversation status
-        try:
-            db.table('conversation').update({
-                'status': 'completed',
-                'ended_at': 'now()'
-            }).eq('id', conversation_id).execute()
-            print(f"[MediaStream] Conversation {conversation_id} marked as completed")
-        except Exception as e:
-            print(f"[MediaStream] Error updating conversation: {e}")
+        if keepalive_task:
+            keepalive_task.cancel()
+
+        # Update conversation status in the background — the single end-of-call
+        # write should not hold up closing the Twilio socket.
+        if db is not None:
+            finalize_task = asyncio.create_task(_mark_conversation_completed(db, conversation_id))
+            _finalize_tasks.add(finalize_task)
+            finalize_task.add_done_callback(_finalize_tasks.discard)
 
         # Close WebSocket if still open
         try:
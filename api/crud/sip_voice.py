@@ -8,34 +8,149 @@ webhook events, call acceptance, and function calls via WebSocket monitoring.
 
 import os
 import re
+import time
+import hmac
+import ssl
+import base64
+import hashlib
 import json
+import orjson
 import asyncio
-import threading
-from datetime import datetime
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from api.database import get_service_client
 from api.rag import semantic_search
 from api.web_search import search_web
+from api.call_transfer import should_transfer, transfer_call
+from api.phone_utils import to_e164
+from api.ttl_cache import TTLCache
+from api.twilio_client import get_twilio_client
+from api.crud.integrations import (
+    check_availability,
+    create_calendar_event,
+    outlook_check_availability,
+    outlook_create_event,
+)
 from openai import OpenAI, InvalidWebhookSignatureError
 import websockets
-import requests as http_requests
+import httpx
+
+logger = logging.getLogger(__name__)
 
 FREE_TRIAL_MINUTES = 5
+MAX_SESSION_DURATION = 3600  # seconds; calls are hung up after 1 hour
+GOODBYE_PLAYBACK_TIMEOUT = 4.0  # seconds end_call waits for the goodbye to finish playing
+SUBSCRIPTION_CACHE_TTL = 60  # seconds a business's subscription status is reused
+SUBSCRIPTION_CACHE_MAX = 1024  # businesses whose status is kept
+WEBHOOK_TOLERANCE = 300  # seconds of clock skew accepted on webhook timestamps
+WS_MAX_MESSAGE_SIZE = 2 ** 20  # bytes; largest server event accepted on the monitor socket
+ACCEPT_QUEUE_TIMEOUT = 2.0  # seconds a webhook waits for an accept slot before 503
+
+# Phone number inside a SIP URI, e.g. sip:+18005551212@sip.example.com
+_SIP_URI_RE = re.compile(r'sip:(\+?\d+)@')
+# Any phone-like run of digits, used on headers that aren't plain SIP URIs
+_ANY_PHONE_RE = re.compile(r'(\+?\d{10,})')
+# Headers that may carry the originally dialed number, in priority order
+_ALT_PHONE_HEADERS = ('Diversion', 'X-Original-To', 'Request-URI', 'P-Asserted-Identity')
+# Agent embed for phone_number lookups: pulls the agent, its business and the
+# business's tool connections in the same round-trip as the number match
+_AGENT_FIELDS = '*, business:business_id(*, tool_connection(provider, settings))'
+
+# business_id -> True while the business has an active subscription. The
+# trial check runs in a worker thread, hence the lock.
+_sub_cache = TTLCache(SUBSCRIPTION_CACHE_MAX, SUBSCRIPTION_CACHE_TTL, lock=True)
 
 router = APIRouter(prefix="/conversation/sip", tags=["SIP Voice"])
 
-# OpenAI webhook client for signature verification
-_openai_client = None
+# One TLS context for every monitor socket: the CA bundle is loaded once at
+# import instead of on each connect. WebSockets need HTTP/1.1 for the upgrade.
+_WS_SSL_CTX = ssl.create_default_context()
+_WS_SSL_CTX.set_alpn_protocols(["http/1.1"])
+
+# Webhooks allowed to be looking up agents / accepting calls at the same time
+_ACCEPT_SEM = asyncio.Semaphore(int(os.getenv("SIP_ACCEPT_CONCURRENCY", "32")))
+
+# Strong references to running WebSocket monitors so they aren't GC'd mid-call
+_active_monitors: set = set()
+
+# Pre-serialized event sent after every greeting/function output
+_RESPONSE_CREATE = orjson.dumps({"type": "response.create"}).decode()
+
+# Shared keep-alive client for the Realtime calls REST API (accept/reject/hangup)
+_http = httpx.AsyncClient(
+    base_url="https://api.openai.com",
+    http2=True,
+    timeout=10,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+)
+
+
+async def close_client():
+    await _http.aclose()
 
-def _get_openai_client():
-    global _openai_client
-    if _openai_client is None:
+# Decoded signing key for OpenAI webhooks (Standard Webhooks HMAC-SHA256)
+_webhook_secret = None
+
+def _get_webhook_secret() -> bytes:
+    global _webhook_secret
+    if _webhook_secret is None:
         webhook_secret = os.getenv("OPENAI_WEBHOOK_SECRET")
         if not webhook_secret:
             raise ValueError("OPENAI_WEBHOOK_SECRET not set")
-        _openai_client = OpenAI(webhook_secret=webhook_secret)
-    return _openai_client
+        if webhook_secret.startswith("whsec_"):
+            _webhook_secret = base64.b64decode(webhook_secret[len("whsec_"):])
+        else:
+            _webhook_secret = webhook_secret.encode()
+    return _webhook_secret
+
+
+def _verify_webhook(body: bytes, headers) -> dict:
+    """
+    Verify an OpenAI webhook signature and return the parsed event.
+
+    Same scheme as the OpenAI SDK's webhooks.unwrap: base64 HMAC-SHA256 over
+    "{webhook-id}.{webhook-timestamp}.{body}", compared against each "v1,<sig>"
+    entry in webhook-signature, with a WEBHOOK_TOLERANCE window on the timestamp.
+    """
+    webhook_id = headers.get("webhook-id")
+    timestamp = headers.get("webhook-timestamp")
+    signature_header = headers.get("webhook-signature")
+    if not webhook_id or not timestamp or not signature_header:
+        raise InvalidWebhookSignatureError("Missing required webhook headers")
+
+    try:
+        timestamp_seconds = int(timestamp)
+    except ValueError:
+        raise InvalidWebhookSignatureError("Invalid webhook timestamp format")
+    now = int(time.time())
+    if now - timestamp_seconds > WEBHOOK_TOLERANCE:
+        raise InvalidWebhookSignatureError("Webhook timestamp is too old")
+    if timestamp_seconds > now + WEBHOOK_TOLERANCE:
+        raise InvalidWebhookSignatureError("Webhook timestamp is too new")
+
+    signed_payload = b"%s.%s.%s" % (webhook_id.encode(), timestamp.encode(), body)
+    expected = base64.b64encode(
+        hmac.new(_get_webhook_secret(), signed_payload, hashlib.sha256).digest()
+    ).decode()
+    signatures = [part[3:] if part.startswith("v1,") else part for part in signature_header.split()]
+    if not any(hmac.compare_digest(expected, sig) for sig in signatures):
+        raise InvalidWebhookSignatureError("The given webhook signature does not match the expected signature")
+
+    return orjson.loads(body)
+
+
+# API-key client for knowledge base embeddings, shared across function calls
+_ai_client = None
+
+def _get_ai_client():
+    global _ai_client
+    if _ai_client is None:
+        _ai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _ai_client
 
 
 def _get_auth_header():
@@ -48,48 +163,32 @@ def _lookup_agent_by_phone(db, to_header: str):
     To header format: sip:+18005551212@sip.example.com
     """
     # Extract phone number from SIP URI
-    match = re.search(r'sip:(\+?\d+)@', to_header)
+    match = _SIP_URI_RE.search(to_header)
     if not match:
-        print(f"[SIP] Could not extract phone from To header: {to_header}", flush=True)
+        logger.warning("[SIP] Could not extract phone from To header: %s", to_header)
         return None, None
 
     called_number = match.group(1)
-    print(f"[SIP] Looking up agent for phone: {called_number}", flush=True)
+    logger.info("[SIP] Looking up agent for phone: %s", called_number)
 
-    # Look up in phone_number table
-    phone_data = db.table('phone_number').select('agent_id, phone_number').eq(
-        'phone_number', called_number
-    ).limit(1).execute()
+    # Stored numbers are E.164, so one equality match on the canonical form
+    # finds the row and fetches the owning agent in the same round-trip.
+    e164 = to_e164(called_number) or called_number
 
-    if not phone_data.data:
-        # Build alternative number formats to try
-        alternatives = set()
-        raw = called_number.lstrip('+')
-        alternatives.add(f'+{raw}')       # +18005551212
-        alternatives.add(raw)             # 18005551212
-        if raw.startswith('1') and len(raw) == 11:
-            alternatives.add(raw[1:])         # 8005551212
-            alternatives.add(f'+{raw[1:]}')   # +8005551212
-        alternatives.discard(called_number)  # already tried
-        for alt_number in alternatives:
-            phone_data = db.table('phone_number').select('agent_id, phone_number').eq(
-                'phone_number', alt_number
-            ).limit(1).execute()
-            if phone_data.data:
-                break
+    phone_data = db.table('phone_number').select(
+        f'agent_id, phone_number, agent:agent_id({_AGENT_FIELDS})'
+    ).eq('phone_number', e164).limit(1).execute()
 
     if not phone_data.data:
-        print(f"[SIP] No agent found for phone: {called_number}", flush=True)
+        logger.warning("[SIP] No agent found for phone: %s", called_number)
         return None, None
 
-    agent_id = phone_data.data[0]['agent_id']
+    agent_config = phone_data.data[0].get('agent')
     agent_phone = phone_data.data[0]['phone_number']
-
-    agent_data = db.table('agent').select('*').eq('id', agent_id).single().execute()
-    if not agent_data.data:
+    if not agent_config:
         return None, None
 
-    return agent_data.data, agent_phone
+    return agent_config, agent_phone
 
 
 def _check_trial_exhausted(db, agent_config):
@@ -98,29 +197,26 @@ def _check_trial_exhausted(db, agent_config):
     if not business_id:
         return False
 
-    sub_data = db.table('subscription').select('status').eq(
-        'business_id', business_id
-    ).in_('status', ['active', 'trialing']).limit(1).execute()
-
-    if sub_data.data:
+    # Paying businesses skip the usage query while their status is fresh
+    if _sub_cache.get(business_id):
         return False
 
     agent_id = agent_config['id']
-    convos = db.table('conversation').select(
-        'started_at, ended_at'
-    ).eq('agent_id', agent_id).not_.is_('ended_at', 'null').execute()
+    # Subscription check and usage sum run server-side (database/trial_usage.sql)
+    usage = db.rpc('agent_trial_usage', {
+        'p_agent_id': agent_id,
+        'p_business_id': business_id,
+    }).execute()
 
-    total_minutes = 0.0
-    for c in (convos.data or []):
-        try:
-            start = datetime.fromisoformat(c['started_at'].replace('Z', '+00:00'))
-            end = datetime.fromisoformat(c['ended_at'].replace('Z', '+00:00'))
-            total_minutes += (end - start).total_seconds() / 60.0
-        except (ValueError, TypeError, KeyError):
-            continue
+    row = (usage.data or [{}])[0]
+    if row.get('has_subscription'):
+        _sub_cache.set(business_id, True)
+        return False
+
+    total_minutes = (row.get('used_seconds') or 0) / 60.0
 
     if total_minutes >= FREE_TRIAL_MINUTES:
-        print(f"[SIP] Trial exhausted for agent {agent_id}: {total_minutes:.1f} min used", flush=True)
+        logger.warning("[SIP] Trial exhausted for agent %s: %.1f min used", agent_id, total_minutes)
         return True
     return False
 
@@ -135,121 +231,119 @@ def _get_urgency_description(level: str) -> str:
     return descriptions.get(level, descriptions['medium'])
 
 
-def _build_session_config(agent_config, business_info, agent_phone, connected_tools, tool_settings):
-    """Build the session config for accepting a SIP call (same logic as realtime_manager)."""
-    default_prompt = (
-        "You are a helpful voice assistant for this business.\n"
-        "Answer questions naturally and professionally.\n"
-        "Always be polite, friendly, and helpful."
-    )
-    base_instructions = agent_config.get('prompt') or default_prompt
-    greeting = agent_config.get('greeting', 'Hello! How can I help you today?')
-    goodbye = agent_config.get('goodbye', 'Goodbye! Have a great day!')
-
-    biz = business_info or {}
-    context_lines = []
-    if biz.get('name'):
-        context_lines.append(f"- Business name: {biz['name']}")
-    if biz.get('address'):
-        context_lines.append(f"- Address: {biz['address']}")
-    if biz.get('business_email'):
-        context_lines.append(f"- Contact email: {biz['business_email']}")
-    if biz.get('phone_number'):
-        context_lines.append(f"- Business contact phone: {biz['phone_number']}")
-    if agent_phone:
-        context_lines.append(f"- Your phone number (the number callers dialed): {agent_phone}")
-    business_context = "\n".join(context_lines) if context_lines else "- No business details available."
-
-    # Build tools
-    tools = [
-        {
-            "type": "function",
-            "name": "search_knowledge_base",
-            "description": "Search the business's uploaded knowledge base documents using semantic similarity.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string", "description": "Natural language search query"}
-                },
-                "required": ["query"]
-            }
+# Tool schemas are static, so each is encoded once at import; the accept
+# request splices the bytes together instead of re-serializing per call.
+_SEARCH_KB_TOOL = {
+    "type": "function",
+    "name": "search_knowledge_base",
+    "description": "Search the business's uploaded knowledge base documents using semantic similarity.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "Natural language search query"}
         },
-        {
-            "type": "function",
-            "name": "search_web",
-            "description": "Search the web for information when the knowledge base doesn't have the answer. Use for current info, competitor comparisons, industry questions, or anything not in the knowledge base.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string", "description": "Search query - be specific and include the business name or context"}
-                },
-                "required": ["query"]
-            }
+        "required": ["query"]
+    }
+}
+
+_SEARCH_WEB_TOOL = {
+    "type": "function",
+    "name": "search_web",
+    "description": "Search the web for information when the knowledge base doesn't have the answer. Use for current info, competitor comparisons, industry questions, or anything not in the knowledge base.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "Search query - be specific and include the business name or context"}
         },
-        {
-            "type": "function",
-            "name": "end_call",
-            "description": "Terminate the active phone call.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "reason": {"type": "string", "description": "Brief explanation"}
-                },
-                "required": ["reason"]
-            }
-        }
-    ]
+        "required": ["query"]
+    }
+}
+
+_END_CALL_TOOL = {
+    "type": "function",
+    "name": "end_call",
+    "description": "Terminate the active phone call.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "reason": {"type": "string", "description": "Brief explanation"}
+        },
+        "required": ["reason"]
+    }
+}
+
+_CHECK_CALENDAR_TOOL = {
+    "type": "function",
+    "name": "check_calendar",
+    "description": "Check availability on a given date.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "date": {"type": "string", "description": "Date in YYYY-MM-DD format"}
+        },
+        "required": ["date"]
+    }
+}
+
+_CREATE_EVENT_TOOL = {
+    "type": "function",
+    "name": "create_calendar_event",
+    "description": "Create a new calendar event.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string", "description": "Title of the event"},
+            "date": {"type": "string", "description": "Date in YYYY-MM-DD format"},
+            "start_time": {"type": "string", "description": "Start time HH:MM (24h)"},
+            "end_time": {"type": "string", "description": "End time HH:MM (24h)"},
+            "description": {"type": "string", "description": "Optional notes"}
+        },
+        "required": ["summary", "date", "start_time", "end_time"]
+    }
+}
+
+_TRANSFER_TOOL = {
+    "type": "function",
+    "name": "transfer_to_human",
+    "description": "Transfer this call to a human representative. ONLY use this when the situation genuinely requires human intervention - not just because you don't know an answer. Valid reasons: angry/upset caller who insists on speaking to a person, medical or safety emergency, complex billing dispute, caller explicitly and repeatedly demands a human after you've tried to help.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "reason": {"type": "string", "description": "Brief reason for the transfer"}
+        },
+        "required": ["reason"]
+    }
+}
+
+_TOOLS_BY_NAME = {tool["name"]: tool for tool in (
+    _SEARCH_KB_TOOL,
+    _SEARCH_WEB_TOOL,
+    _END_CALL_TOOL,
+    _CHECK_CALENDAR_TOOL,
+    _CREATE_EVENT_TOOL,
+    _TRANSFER_TOOL,
+)}
+_TOOL_JSON = {name: orjson.dumps(tool) for name, tool in _TOOLS_BY_NAME.items()}
+
+
+@lru_cache(maxsize=256)
+def _render_session(biz_name, business_context, base_instructions, greeting, goodbye,
+                    has_calendar, calendar_options, forwarding_urgency):
+    """
+    Render the session instructions and tool names for a SIP call.
 
-    has_calendar = 'google-calendar' in (connected_tools or []) or 'outlook-calendar' in (connected_tools or [])
+    The output depends only on these hashable inputs, so it is memoized and
+    repeat calls to the same agent skip rebuilding the prompt and tool schemas.
+    forwarding_urgency is None when call transfer is disabled.
+    """
+    # Build tools
+    tool_names = ["search_knowledge_base", "search_web", "end_call"]
     if has_calendar:
-        tools.append({
-            "type": "function",
-            "name": "check_calendar",
-            "description": "Check availability on a given date.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "date": {"type": "string", "description": "Date in YYYY-MM-DD format"}
-                },
-                "required": ["date"]
-            }
-        })
-        tools.append({
-            "type": "function",
-            "name": "create_calendar_event",
-            "description": "Create a new calendar event.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "summary": {"type": "string", "description": "Title of the event"},
-                    "date": {"type": "string", "description": "Date in YYYY-MM-DD format"},
-                    "start_time": {"type": "string", "description": "Start time HH:MM (24h)"},
-                    "end_time": {"type": "string", "description": "End time HH:MM (24h)"},
-                    "description": {"type": "string", "description": "Optional notes"}
-                },
-                "required": ["summary", "date", "start_time", "end_time"]
-            }
-        })
-
+        tool_names += ["check_calendar", "create_calendar_event"]
     # Add transfer tool if forwarding is enabled
-    if agent_config.get('forwarding_enabled') and agent_config.get('forwarding_number'):
-        tools.append({
-            "type": "function",
-            "name": "transfer_to_human",
-            "description": "Transfer this call to a human representative. ONLY use this when the situation genuinely requires human intervention - not just because you don't know an answer. Valid reasons: angry/upset caller who insists on speaking to a person, medical or safety emergency, complex billing dispute, caller explicitly and repeatedly demands a human after you've tried to help.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "reason": {
-                        "type": "string",
-                        "description": "Brief reason for the transfer"
-                    }
-                },
-                "required": ["reason"]
-            }
-        })
+    if forwarding_urgency is not None:
+        tool_names.append("transfer_to_human")
 
-    tool_names = [t["name"] for t in tools]
     tool_list_str = ", ".join(tool_names)
 
     tool_instructions = """- Before any tool call, say ONE short natural line like "Let me check on that" or "One moment" — then call the tool immediately.
@@ -289,12 +383,7 @@ def _build_session_config(agent_config, business_info, agent_phone, connected_to
 - BEFORE calling, say: "{goodbye}" """
 
     if "check_calendar" in tool_names:
-        cal_settings = (tool_settings or {}).get('google-calendar', {})
-        default_duration = cal_settings.get('default_duration', 30)
-        allow_conflicts = cal_settings.get('allow_conflicts', False)
-        booking_window = cal_settings.get('booking_window_days', 30)
-        biz_start = cal_settings.get('business_hours_start', '09:00')
-        biz_end = cal_settings.get('business_hours_end', '17:00')
+        default_duration, allow_conflicts, booking_window, biz_start, biz_end = calendar_options
 
         tool_instructions += f"""
 
@@ -307,7 +396,7 @@ def _build_session_config(agent_config, business_info, agent_phone, connected_to
 - Booking window: {booking_window} days. {"Conflicts allowed." if allow_conflicts else "No conflicts allowed."}"""
 
     instructions = f"""# Role & Objective
-You are a voice customer service agent for {biz.get('name') or 'a business'}. You answer caller questions naturally, as if you work there and know the business well.
+You are a voice customer service agent for {biz_name or 'a business'}. You answer caller questions naturally, as if you work there and know the business well.
 
 # Context
 {business_context}
@@ -346,14 +435,64 @@ When you see "[Call connected]", say exactly: "{greeting}"
 {base_instructions}"""
 
     # Add forwarding instructions if enabled
-    if agent_config.get('forwarding_enabled') and agent_config.get('forwarding_number'):
-        urgency = agent_config.get('forwarding_urgency', 'medium')
-        urgency_desc = _get_urgency_description(urgency)
+    if forwarding_urgency is not None:
+        urgency_desc = _get_urgency_description(forwarding_urgency)
         instructions += f"""
 
 # Call Transfer
 If a situation genuinely requires human help and the caller insists after you've tried to assist them, you can transfer the call. Only do this for {urgency_desc}. Never mention that you're checking if transfer is available — just say "Let me connect you with someone who can help." """
 
+    return instructions, tuple(tool_names)
+
+
+def _build_session_config(agent_config, business_info, agent_phone, connected_tools, tool_settings):
+    """Build the session config for accepting a SIP call (same logic as realtime_manager)."""
+    default_prompt = (
+        "You are a helpful voice assistant for this business.\n"
+        "Answer questions naturally and professionally.\n"
+        "Always be polite, friendly, and helpful."
+    )
+    base_instructions = agent_config.get('prompt') or default_prompt
+    greeting = agent_config.get('greeting', 'Hello! How can I help you today?')
+    goodbye = agent_config.get('goodbye', 'Goodbye! Have a great day!')
+
+    biz = business_info or {}
+    context_lines = []
+    if biz.get('name'):
+        context_lines.append(f"- Business name: {biz['name']}")
+    if biz.get('address'):
+        context_lines.append(f"- Address: {biz['address']}")
+    if biz.get('business_email'):
+        context_lines.append(f"- Contact email: {biz['business_email']}")
+    if biz.get('phone_number'):
+        context_lines.append(f"- Business contact phone: {biz['phone_number']}")
+    if agent_phone:
+        context_lines.append(f"- Your phone number (the number callers dialed): {agent_phone}")
+    business_context = "\n".join(context_lines) if context_lines else "- No business details available."
+
+    has_calendar = 'google-calendar' in (connected_tools or []) or 'outlook-calendar' in (connected_tools or [])
+    cal_settings = (tool_settings or {}).get('google-calendar', {})
+    calendar_options = (
+        cal_settings.get('default_duration', 30),
+        cal_settings.get('allow_conflicts', False),
+        cal_settings.get('booking_window_days', 30),
+        cal_settings.get('business_hours_start', '09:00'),
+        cal_settings.get('business_hours_end', '17:00'),
+    )
+    forwarding_urgency = None
+    if agent_config.get('forwarding_enabled') and agent_config.get('forwarding_number'):
+        forwarding_urgency = agent_config.get('forwarding_urgency', 'medium')
+
+    render_args = (
+        biz.get('name'), business_context, base_instructions, greeting, goodbye,
+        has_calendar, calendar_options, forwarding_urgency,
+    )
+    try:
+        instructions, tool_names = _render_session(*render_args)
+    except TypeError:
+        # Unhashable tool settings (e.g. malformed JSON values) — render uncached
+        instructions, tool_names = _render_session.__wrapped__(*render_args)
+
     voice = agent_config.get('voice_model', 'ash')
     model = agent_config.get('model_type') or 'gpt-realtime-1.5'
 
@@ -365,7 +504,7 @@ If a situation genuinely requires human help and the caller insists after you've
         "type": "realtime",
         "model": model,
         "instructions": instructions,
-        "tools": tools,
+        "tools": [_TOOLS_BY_NAME[name] for name in tool_names],
         "tool_choice": "auto",
         "audio": {
             "input": {
@@ -389,10 +528,215 @@ If a situation genuinely requires human help and the caller insists after you've
     }
 
 
-async def _websocket_monitor(call_id, agent_config, conversation_id, agent_phone, connected_tools, tool_settings):
+@lru_cache(maxsize=64)
+def _encode_tools(tool_names: tuple) -> bytes:
+    return b'[' + b','.join(_TOOL_JSON[name] for name in tool_names) + b']'
+
+
+def _encode_session_config(config: dict) -> bytes:
+    """Serialize a session config, splicing in the pre-encoded tool schemas."""
+    tools = config.get("tools")
+    if not tools:
+        return orjson.dumps(config)
+    head = orjson.dumps({k: v for k, v in config.items() if k != "tools"})
+    head = b'{' if head == b'{}' else head[:-1] + b','
+    return head + b'"tools":' + _encode_tools(tuple(t["name"] for t in tools)) + b'}'
+
+
+
+class _MessageBuffer:
+    """
+    Collects transcript rows for one conversation and bulk-inserts them.
+
+    Rows are flushed as a single multi-row insert once MAX_ROWS are queued,
+    FLUSH_INTERVAL seconds after the first buffered row, or on close().
+    Flushes are serialized so batches land in conversation order.
+    """
+
+    MAX_ROWS = 5
+    FLUSH_INTERVAL = 2.0  # seconds
+
+    def __init__(self, db, conversation_id: int):
+        self.db = db
+        self.conversation_id = conversation_id
+        self._rows: list = []
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, role: str, content: str):
+        self._rows.append({
+            'conversation_id': self.conversation_id,
+            'role': role,
+            'content': content
+        })
+        if len(self._rows) >= self.MAX_ROWS:
+            self._cancel_timer()
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.FLUSH_INTERVAL)
+        self._timer = None
+        await self.flush()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def flush(self):
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                await asyncio.to_thread(self.db.table('message').insert(rows).execute)
+            except Exception as e:
+                logger.error("[SIP-WS] Error saving %s messages: %s", len(rows), e)
+
+    async def close(self):
+        self._cancel_timer()
+        await self.flush()
+
+    async def drain(self) -> list:
+        """Stop buffering and hand back unwritten rows as [{role, content}, ...]."""
+        self._cancel_timer()
+        async with self._lock:  # let any in-flight flush land first
+            rows, self._rows = self._rows, []
+        return [{'role': r['role'], 'content': r['content']} for r in rows]
+
+
+@dataclass
+class _MonitorContext:
+    """Per-call state shared by the SIP WebSocket monitor's event handlers."""
+    ws: Any
+    db: Any
+    call_id: str
+    conversation_id: int
+    agent_id: int
+    business_id: Optional[int]
+    connected_tools: list
+    tool_settings: dict
+    agent_config: dict
+    business_info: dict
+    agent_phone: Optional[str]  # the number the caller dialed
+    messages: _MessageBuffer
+    agent_transcript: list = field(default_factory=list)  # deltas, joined on done
+    # Set while no agent audio is left to play (OpenAI's output buffer is empty)
+    playback_done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def __post_init__(self):
+        self.playback_done.set()
+
+
+async def _on_agent_transcript_delta(ctx: _MonitorContext, event: dict):
+    ctx.agent_transcript.append(event.get("delta", ""))
+
+
+async def _on_user_transcript(ctx: _MonitorContext, event: dict):
+    # Noise-only turns transcribe to whitespace; don't store those
+    transcript = (event.get("transcript") or "").strip()
+    if transcript:
+        logger.info("[SIP User]: %s", transcript)
+        await ctx.messages.add('user', transcript)
+
+
+async def _on_agent_transcript_done(ctx: _MonitorContext, event: dict):
+    transcript = (event.get("transcript") or "".join(ctx.agent_transcript)).strip()
+    if transcript:
+        logger.info("[SIP Agent]: %s", transcript)
+        await ctx.messages.add('agent', transcript)
+    ctx.agent_transcript.clear()
+
+
+async def _on_output_item_done(ctx: _MonitorContext, event: dict):
+    item = event.get("item", {})
+    if item.get("type") == "function_call":
+        await _handle_function_call(
+            ctx.ws, item, ctx.agent_id, ctx.conversation_id,
+            ctx.business_id, ctx.call_id, ctx.connected_tools, ctx.tool_settings, ctx.db,
+            agent_config=ctx.agent_config, business_info=ctx.business_info,
+            agent_phone=ctx.agent_phone, playback_done=ctx.playback_done,
+        )
+
+
+async def _on_playback_started(ctx: _MonitorContext, event: dict):
+    ctx.playback_done.clear()
+
+
+async def _on_playback_stopped(ctx: _MonitorContext, event: dict):
+    ctx.playback_done.set()
+
+
+async def _on_session_created(ctx: _MonitorContext, event: dict):
+    logger.info("[SIP-WS] Session created")
+
+
+async def _on_session_updated(ctx: _MonitorContext, event: dict):
+    logger.info("[SIP-WS] Session updated")
+
+
+async def _on_error(ctx: _MonitorContext, event: dict):
+    error_obj = event.get("error", {})
+    msg = error_obj.get("message", "")
+    if "already shorter than" not in msg:
+        logger.error("[SIP-WS] Error: %s", error_obj)
+
+
+# Realtime event type -> handler. Transcript deltas are by far the most frequent
+# event; anything not listed (audio deltas, rate limits, ...) is ignored.
+_SIP_EVENT_HANDLERS = {
+    "response.output_audio_transcript.delta": _on_agent_transcript_delta,
+    "conversation.item.input_audio_transcription.completed": _on_user_transcript,
+    "response.output_audio_transcript.done": _on_agent_transcript_done,
+    "response.output_item.done": _on_output_item_done,
+    "output_audio_buffer.started": _on_playback_started,
+    "output_audio_buffer.stopped": _on_playback_stopped,
+    "output_audio_buffer.cleared": _on_playback_stopped,
+    "session.created": _on_session_created,
+    "session.updated": _on_session_updated,
+    "error": _on_error,
+}
+
+
+async def _hangup_when_played(call_id: str, playback_done: Optional[asyncio.Event]):
+    """Hang up once the goodbye has finished playing, or after GOODBYE_PLAYBACK_TIMEOUT."""
+    if playback_done is None:
+        await asyncio.sleep(GOODBYE_PLAYBACK_TIMEOUT)
+    else:
+        try:
+            await asyncio.wait_for(playback_done.wait(), GOODBYE_PLAYBACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("[SIP] Goodbye still playing after %ss, hanging up %s", GOODBYE_PLAYBACK_TIMEOUT, call_id)
+    try:
+        await _http.post(
+            f"/v1/realtime/calls/{call_id}/hangup",
+            headers=_get_auth_header()
+        )
+    except Exception as e:
+        logger.error("[SIP] Error hanging up: %s", e)
+
+
+async def _hangup_after(call_id: str, delay: float, ws):
+    """Hang up and close the monitor socket once a call hits the max session length."""
+    await asyncio.sleep(delay)
+    logger.warning("[SIP-WS] Max session duration reached (%ss), closing call %s", delay, call_id)
+    try:
+        await _http.post(
+            f"/v1/realtime/calls/{call_id}/hangup",
+            headers=_get_auth_header()
+        )
+    except Exception:
+        pass
+    await ws.close()
+
+
+async def _websocket_monitor(call_id, agent_config, conversation_id, agent_phone, connected_tools, tool_settings, business_info=None):
     """
     Connect to the Realtime API WebSocket to monitor events and handle function calls.
-    Runs in a background thread via asyncio.
+    Runs as a background task on the server's event loop, so blocking work goes
+    through asyncio.to_thread.
     """
     api_key = os.getenv("OPENAI_API_KEY")
     auth_header = {"Authorization": f"Bearer {api_key}"}
@@ -400,158 +744,109 @@ async def _websocket_monitor(call_id, agent_config, conversation_id, agent_phone
     agent_id = agent_config['id']
     business_id = agent_config.get('business_id')
     greeting = agent_config.get('greeting', 'Hello! How can I help you today?')
-
-    # Fetch business info for transfer checks
-    business_info = {}
-    if business_id:
-        try:
-            biz_data = db.table('business').select('*').eq('id', business_id).single().execute()
-            if biz_data.data:
-                business_info = biz_data.data
-        except Exception:
-            pass
+    business_info = business_info or {}
+    messages = _MessageBuffer(db, conversation_id)
+    timeout_task = None
 
     try:
         async with websockets.connect(
             f"wss://api.openai.com/v1/realtime?call_id={call_id}",
             additional_headers=auth_header,
+            ssl=_WS_SSL_CTX,
+            compression=None,
+            max_size=WS_MAX_MESSAGE_SIZE,
         ) as ws:
-            print(f"[SIP-WS] Connected for call {call_id}, conversation {conversation_id}", flush=True)
+            logger.info("[SIP-WS] Connected for call %s, conversation %s", call_id, conversation_id)
 
             # Trigger initial greeting
-            await ws.send(json.dumps({
+            await ws.send(orjson.dumps({
                 "type": "conversation.item.create",
                 "item": {
                     "type": "message",
                     "role": "user",
                     "content": [{"type": "input_text", "text": "[Call connected]"}]
                 }
-            }))
-            await ws.send(json.dumps({"type": "response.create"}))
-
-            current_agent_transcript = ""
-            session_start = asyncio.get_event_loop().time()
-            MAX_SESSION_DURATION = 3600  # 1 hour
-
-            async for message in ws:
-                # Check max session duration
-                elapsed = asyncio.get_event_loop().time() - session_start
-                if elapsed >= MAX_SESSION_DURATION:
-                    print(f"[SIP-WS] Max session duration reached ({MAX_SESSION_DURATION}s), closing call {call_id}", flush=True)
-                    try:
-                        await asyncio.to_thread(
-                            http_requests.post,
-                            f"https://api.openai.com/v1/realtime/calls/{call_id}/hangup",
-                            headers=_get_auth_header()
-                        )
-                    except Exception:
-                        pass
-                    await ws.close()
-                    break
-
-                event = json.loads(message)
-                event_type = event.get("type")
-
-                # User transcript
-                if event_type == "conversation.item.input_audio_transcription.completed":
-                    transcript = event.get("transcript", "")
-                    if transcript:
-                        print(f"[SIP User]: {transcript}", flush=True)
-                        try:
-                            db.table('message').insert({
-                                'conversation_id': conversation_id,
-                                'role': 'user',
-                                'content': transcript
-                            }).execute()
-                        except Exception as e:
-                            print(f"[SIP-WS] Error saving user message: {e}", flush=True)
-
-                # Agent transcript delta
-                elif event_type == "response.output_audio_transcript.delta":
-                    current_agent_transcript += event.get("delta", "")
-
-                # Agent transcript done
-                elif event_type == "response.output_audio_transcript.done":
-                    transcript = event.get("transcript") or current_agent_transcript
-                    if transcript:
-                        print(f"[SIP Agent]: {transcript}", flush=True)
-                        try:
-                            db.table('message').insert({
-                                'conversation_id': conversation_id,
-                                'role': 'agent',
-                                'content': transcript
-                            }).execute()
-                        except Exception as e:
-                            print(f"[SIP-WS] Error saving agent message: {e}", flush=True)
-                    current_agent_transcript = ""
-
-                # Function call
-                elif event_type == "response.output_item.done":
-                    item = event.get("item", {})
-                    if item.get("type") == "function_call":
-                        await _handle_function_call(
-                            ws, item, agent_id, conversation_id,
-                            business_id, call_id, connected_tools, tool_settings, db,
-                            agent_config=agent_config, business_info=business_info
-                        )
-
-                # Session events
-                elif event_type == "session.created":
-                    print(f"[SIP-WS] Session created", flush=True)
-                elif event_type == "session.updated":
-                    print(f"[SIP-WS] Session updated", flush=True)
-                elif event_type == "error":
-                    error_obj = event.get("error", {})
-                    msg = error_obj.get("message", "")
-                    if "already shorter than" not in msg:
-                        print(f"[SIP-WS] Error: {error_obj}", flush=True)
+            }).decode())
+            await ws.send(_RESPONSE_CREATE)
+
+            ctx = _MonitorContext(
+                ws=ws, db=db, call_id=call_id, conversation_id=conversation_id,
+                agent_id=agent_id, business_id=business_id,
+                connected_tools=connected_tools, tool_settings=tool_settings,
+                agent_config=agent_config, business_info=business_info,
+                agent_phone=agent_phone, messages=messages,
+            )
+            timeout_task = asyncio.create_task(_hangup_after(call_id, MAX_SESSION_DURATION, ws))
+
+            while True:
+                # orjson parses the frame's UTF-8 bytes without a str decode
+                event = orjson.loads(await ws.recv(decode=False))
+                handler = _SIP_EVENT_HANDLERS.get(event.get("type"))
+                if handler:
+                    await handler(ctx, event)
 
     except websockets.exceptions.ConnectionClosed as e:
-        print(f"[SIP-WS] Connection closed for call {call_id}: {e}", flush=True)
+        logger.info("[SIP-WS] Connection closed for call %s: %s", call_id, e)
     except Exception as e:
-        print(f"[SIP-WS] Error: {e}", flush=True)
-        import traceback
-        print(f"[SIP-WS] Traceback: {traceback.format_exc()}", flush=True)
+        logger.exception("[SIP-WS] Error: %s", e)
     finally:
-        # Mark conversation completed
+        if timeout_task:
+            timeout_task.cancel()
+
+        # Write remaining transcript rows and mark the conversation completed
+        # in one transaction (database/finalize_conversation.sql)
+        pending_messages = await messages.drain()
         try:
-            db.table('conversation').update({
-                'status': 'completed',
-                'ended_at': 'now()'
-            }).eq('id', conversation_id).execute()
-            print(f"[SIP-WS] Conversation {conversation_id} marked completed", flush=True)
+            await asyncio.to_thread(
+                db.rpc('finalize_conversation', {
+                    'p_conv_id': conversation_id,
+                    'p_messages': pending_messages
+                }).execute
+            )
+            logger.info("[SIP-WS] Conversation %s marked completed", conversation_id)
 
             # Trigger async resolution analysis (classify spam/legitimate)
             try:
                 from api.crud.call_resolution import analyze_call
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.ensure_future(analyze_call(conversation_id, db))
-                else:
-                    asyncio.run(analyze_call(conversation_id, db))
+                task = asyncio.create_task(analyze_call(conversation_id, db))
+                _active_monitors.add(task)
+                task.add_done_callback(_active_monitors.discard)
             except Exception as res_err:
-                print(f"[SIP-WS] Resolution analysis failed for {conversation_id}: {res_err}", flush=True)
+                logger.error("[SIP-WS] Resolution analysis failed for %s: %s", conversation_id, res_err)
 
         except Exception as e:
-            print(f"[SIP-WS] Error updating conversation: {e}", flush=True)
+            logger.error("[SIP-WS] Error updating conversation: %s", e)
 
 
-async def _handle_function_call(ws, item, agent_id, conversation_id, business_id, call_id, connected_tools, tool_settings, db, agent_config=None, business_info=None):
+def _minute_of_day(hhmm: str) -> Optional[int]:
+    """Parse "HH:MM" (or "H:MM") into minutes since midnight; None if malformed."""
+    try:
+        hours, minutes = hhmm.split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _format_minute_of_day(total: int) -> str:
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+async def _handle_function_call(ws, item, agent_id, conversation_id, business_id, call_id, connected_tools, tool_settings, db, agent_config=None, business_info=None, agent_phone=None, playback_done=None):
     """Handle function calls from the Realtime API."""
     call_fn_id = item.get("call_id")
     function_name = item.get("name")
     arguments_str = item.get("arguments", "{}")
-    print(f"[SIP Function] {function_name}: {arguments_str}", flush=True)
+    logger.info("[SIP Function] %s: %s", function_name, arguments_str)
 
     try:
-        args = json.loads(arguments_str)
+        args = orjson.loads(arguments_str)
         result = {}
 
         if function_name == "search_knowledge_base":
             query = args.get("query", "")
-            api_key = os.getenv("OPENAI_API_KEY")
-            ai = OpenAI(api_key=api_key)
-            matches = semantic_search(sb=db, ai=ai, agent_id=agent_id, query=query, k=10, min_similarity=0.3)
+            matches = await asyncio.to_thread(
+                semantic_search, sb=db, ai=_get_ai_client(), agent_id=agent_id, query=query, k=10, min_similarity=0.3
+            )
             if matches:
                 result = {
                     "found": True,
@@ -563,23 +858,18 @@ async def _handle_function_call(ws, item, agent_id, conversation_id, business_id
 
         elif function_name == "search_web":
             query = args.get("query", "")
-            print(f"[SIP Function] Web search: {query}", flush=True)
+            logger.info("[SIP Function] Web search: %s", query)
             result = await search_web(query, max_results=5, search_depth="basic")
 
         elif function_name == "end_call":
             reason = args.get("reason", "Conversation completed")
-            print(f"[SIP] Ending call: {reason}", flush=True)
-            # Wait for goodbye audio to finish
-            await asyncio.sleep(4.0)
-            # Hang up via API
-            try:
-                await asyncio.to_thread(
-                    http_requests.post,
-                    f"https://api.openai.com/v1/realtime/calls/{call_id}/hangup",
-                    headers=_get_auth_header()
-                )
-            except Exception as e:
-                print(f"[SIP] Error hanging up: {e}", flush=True)
+            logger.info("[SIP] Ending call: %s", reason)
+            # Hang up via API once the goodbye has played. The monitor loop
+            # has to keep reading events to see playback finish, so the wait
+            # runs in its own task instead of here.
+            task = asyncio.create_task(_hangup_when_played(call_id, playback_done))
+            _active_monitors.add(task)
+            task.add_done_callback(_active_monitors.discard)
             result = {"success": True, "message": f"Call ended: {reason}"}
 
         elif function_name == "check_calendar":
@@ -587,16 +877,13 @@ async def _handle_function_call(ws, item, agent_id, conversation_id, business_id
             time_min = f"{date_str}T00:00:00Z"
             time_max = f"{date_str}T23:59:59Z"
             if 'outlook-calendar' in (connected_tools or []):
-                from api.crud.integrations import outlook_check_availability
                 result = await outlook_check_availability(business_id, time_min, time_max)
             else:
-                from api.crud.integrations import check_availability
                 result = await check_availability(business_id, time_min, time_max)
 
         elif function_name == "transfer_to_human":
             reason = args.get("reason", "Caller requested transfer")
-            print(f"[SIP Function] Transfer requested: {reason}", flush=True)
-            from api.call_transfer import should_transfer, transfer_call
+            logger.info("[SIP Function] Transfer requested: %s", reason)
             agent_data = agent_config or {}
             biz_data = business_info or {}
             allowed, transfer_reason = should_transfer(agent_data, biz_data)
@@ -609,35 +896,30 @@ async def _handle_function_call(ws, item, agent_id, conversation_id, business_id
                 # The call_id is the OpenAI call ID. We need to hang up the OpenAI call
                 # and the transfer happens via Twilio SIP trunking.
                 # For now, use Twilio API to find the active call and redirect it.
-                try:
-                    from twilio.rest import Client as TwilioClient
-                    twilio_sid = os.getenv("ACCOUNT_SID")
-                    twilio_token = os.getenv("AUTH_TOKEN")
-                    twilio_client = TwilioClient(twilio_sid, twilio_token)
+                def _find_and_transfer():
+                    twilio_client = get_twilio_client()
                     # Find the active call to the agent's phone number
                     active_calls = twilio_client.calls.list(
                         to=agent_phone,
                         status='in-progress',
                         limit=1
                     )
-                    if active_calls:
-                        twilio_call_sid = active_calls[0].sid
-                        transfer_result = transfer_call(twilio_call_sid, forwarding_number)
-                        if transfer_result.get('success'):
-                            result = {"success": True, "message": "Transferring you now. Please hold."}
-                        else:
-                            result = {"success": False, "message": "I wasn't able to complete the transfer. Can I help you with anything else?"}
+                    if not active_calls:
+                        return None
+                    return transfer_call(active_calls[0].sid, forwarding_number)
+
+                try:
+                    # Twilio's client is blocking; keep it off the event loop
+                    transfer_result = await asyncio.to_thread(_find_and_transfer)
+                    if transfer_result and transfer_result.get('success'):
+                        result = {"success": True, "message": "Transferring you now. Please hold."}
                     else:
                         result = {"success": False, "message": "I wasn't able to complete the transfer. Can I help you with anything else?"}
                 except Exception as te:
-                    print(f"[SIP Function] Transfer error: {te}", flush=True)
+                    logger.error("[SIP Function] Transfer error: %s", te)
                     result = {"success": False, "message": "I wasn't able to complete the transfer. Can I help you with anything else?"}
 
         elif function_name == "create_calendar_event":
-            if 'outlook-calendar' in (connected_tools or []):
-                from api.crud.integrations import outlook_create_event
-            else:
-                from api.crud.integrations import create_calendar_event
             cal_provider = 'outlook-calendar' if 'outlook-calendar' in (connected_tools or []) else 'google-calendar'
             cal_settings = (tool_settings or {}).get(cal_provider, {})
             default_duration = cal_settings.get('default_duration', 30)
@@ -652,16 +934,25 @@ async def _handle_function_call(ws, item, agent_id, conversation_id, business_id
             summary = args.get("summary", "")
             description = args.get("description", "")
 
-            if not end_time and start_time:
-                parts = start_time.split(':')
-                if len(parts) == 2:
-                    total = int(parts[0]) * 60 + int(parts[1]) + default_duration
-                    end_time = f"{total // 60:02d}:{total % 60:02d}"
+            # Compare times as minutes since midnight so "9:00" sorts before "10:00"
+            start_min = _minute_of_day(start_time)
+            end_min = _minute_of_day(end_time)
+            if end_min is None and start_min is not None:
+                end_min = start_min + default_duration
+            if start_min is not None:
+                start_time = _format_minute_of_day(start_min)
+            if end_min is not None:
+                end_time = _format_minute_of_day(end_min)
+            biz_start_min = _minute_of_day(biz_start)
+            biz_end_min = _minute_of_day(biz_end)
 
             # Pick the right calendar provider
             _create_fn = outlook_create_event if 'outlook-calendar' in (connected_tools or []) else create_calendar_event
 
-            if start_time < biz_start or end_time > biz_end:
+            if start_min is None or end_min is None:
+                result = {"error": "Start and end times must be in HH:MM format."}
+            elif (biz_start_min is not None and start_min < biz_start_min) or \
+                    (biz_end_min is not None and end_min > biz_end_min):
                 result = {"error": f"Must be within business hours ({biz_start}-{biz_end})."}
             elif not allow_conflicts:
                 if 'outlook-calendar' in (connected_tools or []):
@@ -678,28 +969,28 @@ async def _handle_function_call(ws, item, agent_id, conversation_id, business_id
             result = {"error": f"Unknown function: {function_name}"}
 
         # Send function output
-        await ws.send(json.dumps({
+        await ws.send(orjson.dumps({
             "type": "conversation.item.create",
             "item": {
                 "type": "function_call_output",
                 "call_id": call_fn_id,
-                "output": json.dumps(result)
+                "output": orjson.dumps(result).decode()
             }
-        }))
+        }).decode())
 
         if function_name != "end_call":
-            await ws.send(json.dumps({"type": "response.create"}))
+            await ws.send(_RESPONSE_CREATE)
 
     except Exception as e:
-        print(f"[SIP Function] Error: {e}", flush=True)
-        await ws.send(json.dumps({
+        logger.error("[SIP Function] Error: %s", e)
+        await ws.send(orjson.dumps({
             "type": "conversation.item.create",
             "item": {
                 "type": "function_call_output",
                 "call_id": call_fn_id,
-                "output": json.dumps({"error": str(e)})
+                "output": orjson.dumps({"error": str(e)}).decode()
             }
-        }))
+        }).decode())
 
 
 @router.post('/webhook', summary="OpenAI SIP incoming call webhook")
@@ -709,33 +1000,46 @@ async def sip_webhook(request: Request):
     Verifies signature, looks up agent, accepts call, and starts WebSocket monitor.
     """
     body = await request.body()
-    headers = dict(request.headers)
 
-    print(f"[SIP] Webhook received", flush=True)
+    logger.info("[SIP] Webhook received")
 
     # Verify webhook signature
     try:
-        client = _get_openai_client()
-        event = client.webhooks.unwrap(body, headers)
+        event = _verify_webhook(body, request.headers)
     except InvalidWebhookSignatureError as e:
-        print(f"[SIP] Invalid webhook signature: {e}", flush=True)
+        logger.warning("[SIP] Invalid webhook signature: %s", e)
         raise HTTPException(status_code=400, detail="Invalid signature")
     except Exception as e:
-        print(f"[SIP] Webhook verification error: {e}", flush=True)
+        logger.error("[SIP] Webhook verification error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
-    if event.type != "realtime.call.incoming":
-        print(f"[SIP] Unexpected event type: {event.type}", flush=True)
-        return JSONResponse({"status": "ignored"})
+    if event.get("type") != "realtime.call.incoming":
+        logger.warning("[SIP] Unexpected event type: %s", event.get("type"))
+        return ORJSONResponse({"status": "ignored"})
+
+    # Cap concurrent accepts so a call storm can't exhaust the DB and OpenAI
+    # connection pools; OpenAI retries the webhook on 503 with its own backoff
+    try:
+        await asyncio.wait_for(_ACCEPT_SEM.acquire(), ACCEPT_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("[SIP] Too many concurrent calls, shedding webhook")
+        return ORJSONResponse({"status": "busy"}, status_code=503)
+    try:
+        return await _accept_incoming_call(event.get("data") or {})
+    finally:
+        _ACCEPT_SEM.release()
+
 
-    call_id = event.data.call_id
-    sip_headers = {h.name: h.value for h in (event.data.sip_headers or [])}
+async def _accept_incoming_call(event_data: dict):
+    """Look up the agent for an incoming call, then reject it or accept it and start monitoring."""
+    call_id = event_data.get("call_id")
+    sip_headers = {h["name"]: h["value"] for h in (event_data.get("sip_headers") or [])}
     from_header = sip_headers.get("From", "unknown")
     to_header = sip_headers.get("To", "")
 
     # Log ALL SIP headers for debugging
-    print(f"[SIP] All SIP headers: {sip_headers}", flush=True)
-    print(f"[SIP] Incoming call {call_id} from={from_header} to={to_header}", flush=True)
+    logger.info("[SIP] All SIP headers: %s", sip_headers)
+    logger.info("[SIP] Incoming call %s from=%s to=%s", call_id, from_header, to_header)
 
     # With SIP trunking, the To header is the SIP URI (project ID), not the phone number.
     # The original dialed number may be in: Diversion header, X-]Original-To, Request-URI,
@@ -749,127 +1053,102 @@ async def sip_webhook(request: Request):
     
     lookup_header = to_header
     # Check if To header actually has a phone number
-    if not re.search(r'sip:(\+?\d+)@', to_header):
+    if not _SIP_URI_RE.search(to_header):
         # To header doesn't have phone - try alternatives
-        for alt_header_name in ['Diversion', 'X-Original-To', 'Request-URI', 'P-Asserted-Identity']:
+        for alt_header_name in _ALT_PHONE_HEADERS:
             alt_val = sip_headers.get(alt_header_name, '')
-            if alt_val and re.search(r'(\+?\d{10,})', alt_val):
-                print(f"[SIP] Found phone in {alt_header_name}: {alt_val}", flush=True)
+            if alt_val and _ANY_PHONE_RE.search(alt_val):
+                logger.info("[SIP] Found phone in %s: %s", alt_header_name, alt_val)
                 lookup_header = alt_val
                 break
     
-    # Look up agent
+    # Look up agent. Supabase calls block, and this loop also serves every
+    # live call's monitor socket, so they run in worker threads.
     db = get_service_client()
-    agent_config, agent_phone = _lookup_agent_by_phone(db, lookup_header)
+    agent_config, agent_phone = await asyncio.to_thread(_lookup_agent_by_phone, db, lookup_header)
     
     # If still not found, try looking up by ALL phone numbers (fallback for single-agent setups)
-    if not agent_config and not re.search(r'sip:(\+?\d+)@', lookup_header):
-        print(f"[SIP] To header has no phone number, trying all agents...", flush=True)
-        # Get all phone numbers and find any active agent
-        all_phones = db.table('phone_number').select('agent_id, phone_number').execute()
-        if all_phones.data:
-            # For now, try each phone number's agent
-            for phone_entry in all_phones.data:
-                agent_data = db.table('agent').select('*').eq('id', phone_entry['agent_id']).single().execute()
-                if agent_data.data:
-                    agent_config = agent_data.data
-                    agent_phone = phone_entry['phone_number']
-                    print(f"[SIP] Matched via fallback to agent {agent_config['id']} phone {agent_phone}", flush=True)
-                    break
+    if not agent_config and not _SIP_URI_RE.search(lookup_header):
+        logger.info("[SIP] To header has no phone number, trying all agents...")
+        # Take the first phone number that has an agent, joined server-side
+        fallback = await asyncio.to_thread(db.table('phone_number').select(
+            f'phone_number, agent:agent_id!inner({_AGENT_FIELDS})'
+        ).limit(1).execute)
+        if fallback.data:
+            agent_config = fallback.data[0]['agent']
+            agent_phone = fallback.data[0]['phone_number']
+            logger.info("[SIP] Matched via fallback to agent %s phone %s", agent_config['id'], agent_phone)
 
     if not agent_config:
-        print(f"[SIP] No agent found, rejecting call", flush=True)
-        await asyncio.to_thread(
-            lambda: http_requests.post(
-                f"https://api.openai.com/v1/realtime/calls/{call_id}/reject",
-                headers={**_get_auth_header(), "Content-Type": "application/json"},
-                json={"status_code": 404}
-            )
+        logger.warning("[SIP] No agent found, rejecting call")
+        await _http.post(
+            f"/v1/realtime/calls/{call_id}/reject",
+            headers=_get_auth_header(),
+            json={"status_code": 404}
         )
-        return JSONResponse({"status": "rejected", "reason": "no agent"})
+        return ORJSONResponse({"status": "rejected", "reason": "no agent"})
 
     agent_id = agent_config['id']
 
     # Check trial
-    if _check_trial_exhausted(db, agent_config):
-        await asyncio.to_thread(
-            lambda: http_requests.post(
-                f"https://api.openai.com/v1/realtime/calls/{call_id}/reject",
-                headers={**_get_auth_header(), "Content-Type": "application/json"},
-                json={"status_code": 486}
-            )
+    if await asyncio.to_thread(_check_trial_exhausted, db, agent_config):
+        await _http.post(
+            f"/v1/realtime/calls/{call_id}/reject",
+            headers=_get_auth_header(),
+            json={"status_code": 486}
         )
-        return JSONResponse({"status": "rejected", "reason": "trial exhausted"})
-
-    # Get business info
-    business_info = {}
-    business_id = agent_config.get('business_id')
-    if business_id:
-        try:
-            biz_data = db.table('business').select('name, address, business_email, phone_number').eq('id', business_id).single().execute()
-            if biz_data.data:
-                business_info = biz_data.data
-        except Exception:
-            pass
+        return ORJSONResponse({"status": "rejected", "reason": "trial exhausted"})
 
-    # Get connected tools
+    # Business info and connected tools come embedded in the agent lookup
+    business_info = agent_config.pop('business', None) or {}
     connected_tools = []
     tool_settings = {}
-    if business_id:
-        try:
-            tc_data = db.table('tool_connection').select('provider, settings').eq('business_id', business_id).execute()
-            for tc in (tc_data.data or []):
-                connected_tools.append(tc['provider'])
-                tool_settings[tc['provider']] = tc.get('settings') or {}
-        except Exception:
-            pass
+    for tc in (business_info.pop('tool_connection', None) or []):
+        connected_tools.append(tc['provider'])
+        tool_settings[tc['provider']] = tc.get('settings') or {}
 
     # Note: idempotency check removed — conversation table has no call_id column
 
     # Extract caller phone from SIP From header
-    caller_match = re.search(r'sip:(\+?\d+)@', from_header)
+    caller_match = _SIP_URI_RE.search(from_header)
     caller_phone = caller_match.group(1) if caller_match else 'unknown'
 
     # Create conversation (matches realtime_voice.py schema — no call_id column)
-    conversation = db.table('conversation').insert({
+    conversation = await asyncio.to_thread(db.table('conversation').insert({
         'agent_id': agent_id,
         'caller_phone': caller_phone,
         'status': 'in_progress'
-    }).execute()
+    }).execute)
     conversation_id = conversation.data[0]['id']
-    print(f"[SIP] Created conversation {conversation_id} for agent {agent_id}", flush=True)
+    logger.info("[SIP] Created conversation %s for agent %s", conversation_id, agent_id)
 
     # Build session config and accept call
     session_config = _build_session_config(agent_config, business_info, agent_phone, connected_tools, tool_settings)
 
     try:
-        accept_resp = await asyncio.to_thread(
-            lambda: http_requests.post(
-                f"https://api.openai.com/v1/realtime/calls/{call_id}/accept",
-                headers={**_get_auth_header(), "Content-Type": "application/json"},
-                json=session_config
-            )
+        accept_resp = await _http.post(
+            f"/v1/realtime/calls/{call_id}/accept",
+            headers={**_get_auth_header(), "Content-Type": "application/json"},
+            content=_encode_session_config(session_config)
         )
         if accept_resp.status_code >= 400:
-            print(f"[SIP] Accept call failed: HTTP {accept_resp.status_code} — {accept_resp.text}", flush=True)
-            print(f"[SIP] Session config sent: {json.dumps(session_config, indent=2)[:2000]}", flush=True)
+            logger.error("[SIP] Accept call failed: HTTP %s — %s", accept_resp.status_code, accept_resp.text)
+            logger.error("[SIP] Session config sent: %s", json.dumps(session_config, indent=2)[:2000])
         accept_resp.raise_for_status()
-        print(f"[SIP] Call {call_id} accepted (HTTP {accept_resp.status_code})", flush=True)
+        logger.info("[SIP] Call %s accepted (HTTP %s)", call_id, accept_resp.status_code)
     except Exception as e:
-        print(f"[SIP] Error accepting call: {e}", flush=True)
-        db.table('conversation').update({'status': 'failed', 'ended_at': 'now()'}).eq('id', conversation_id).execute()
-        return JSONResponse({"status": "error", "detail": str(e)}, status_code=500)
-
-    # Start WebSocket monitor in background thread
-    def _run_ws():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(
-            _websocket_monitor(call_id, agent_config, conversation_id, agent_phone, connected_tools, tool_settings)
+        logger.error("[SIP] Error accepting call: %s", e)
+        await asyncio.to_thread(
+            db.table('conversation').update({'status': 'failed', 'ended_at': 'now()'}).eq('id', conversation_id).execute
         )
-        loop.close()
+        return ORJSONResponse({"status": "error", "detail": str(e)}, status_code=500)
 
-    threading.Thread(target=_run_ws, daemon=True).start()
-    print(f"[SIP] WebSocket monitor started for call {call_id}", flush=True)
+    # Start WebSocket monitor as a background task on this event loop
+    monitor = asyncio.create_task(
+        _websocket_monitor(call_id, agent_config, conversation_id, agent_phone, connected_tools, tool_settings, business_info)
+    )
+    _active_monitors.add(monitor)
+    monitor.add_done_callback(_active_monitors.discard)
+    logger.info("[SIP] WebSocket monitor started for call %s", call_id)
 
-    return JSONResponse({"status": "accepted", "call_id": call_id, "conversation_id": conversation_id})
+    return ORJSONResponse({"status": "accepted", "call_id": call_id, "conversation_id": conversation_id})
@@ -2,7 +2,9 @@
 from supabase import create_client, Client
 from supabase.lib.client_options import ClientOptions
 import os
+import threading
 from dotenv import load_dotenv
+from api.ttl_cache import TTLCache
 
 load_dotenv()
 
@@ -12,6 +14,17 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
 # Service role client - bypasses RLS, used for Twilio webhooks and background tasks
 _service_client: Client = None
+# Guards first construction: webhooks call get_service_client() from worker
+# threads, and a race would build (and leak) extra clients and connection pools
+_service_client_lock = threading.Lock()
+
+USER_CLIENT_TTL = 300  # seconds a per-token client is reused
+USER_CLIENT_MAX = 256  # entries kept before the oldest are evicted
+
+# access_token -> client. Building a client per request also built new HTTP
+# sessions, so every dashboard call paid a fresh TLS handshake to Supabase; a
+# user's token is stable across their session.
+_user_clients = TTLCache(USER_CLIENT_MAX, USER_CLIENT_TTL)
 
 
 def get_service_client() -> Client:
@@ -21,9 +34,13 @@ def get_service_client() -> Client:
     """
     global _service_client
     if _service_client is None:
-        if not SUPABASE_SERVICE_KEY:
-            raise ValueError("SUPABASE_SERVICE_KEY not found in environment variables")
-        _service_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        with _service_client_lock:
+            if _service_client is None:
+                if not SUPABASE_URL:
+                    raise ValueError("SUPABASE_URL not found in environment variables")
+                if not SUPABASE_SERVICE_KEY:
+                    raise ValueError("SUPABASE_SERVICE_KEY not found in environment variables")
+                _service_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
     return _service_client
 
 
@@ -31,22 +48,20 @@ def get_user_client(access_token: str) -> Client:
     """
     Returns a Supabase client authenticated as the user.
     RLS policies will be enforced based on auth.uid().
+    Clients are reused per token for USER_CLIENT_TTL seconds.
     """
+    client = _user_clients.get(access_token)
+    if client is not None:
+        return client
+
     options = ClientOptions(
         headers={
             "Authorization": f"Bearer {access_token}"
         }
     )
-    return create_client(SUPABASE_URL, SUPABASE_ANON_KEY, options)
-
-
-# Legacy function for backwards compatibility during migration
-def supabase() -> Client:
-    """
-    DEPRECATED: Use get_service_client() or get_user_client() instead.
-    Returns service client for now to maintain compatibility.
-    """
-    return get_service_client()
+    client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY, options)
+    _user_clients.set(access_token, client)
+    return client
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+# api/logging_config.py
+"""
+Non-blocking log output for the API.
+
+Records from the ``api.*`` loggers are put on an in-memory queue by a
+QueueHandler; a QueueListener thread does the formatting and the blocking
+stdout writes, so logging from the voice call loops never waits on I/O.
+"""
+
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+_listener: QueueListener = None
+
+
+def setup_logging() -> QueueListener:
+    """Attach the queue handler to the ``api`` logger and start the listener (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+
+    api_logger = logging.getLogger("api")
+    api_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    api_logger.addHandler(QueueHandler(log_queue))
+    api_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
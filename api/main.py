@@ -1,13 +1,15 @@
 # api/main.py
 
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from starlette.types import ASGIApp, Receive, Send, Scope
 import sys
 import os
 import re
+import orjson
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -19,13 +21,16 @@ from .crud.realtime_voice import router as realtime_router
 from .crud.rag_endpoints import router as rag_router
 from .crud.phone_maintenance import router as phone_maintenance_router
 from .crud.billing import router as billing_router
-from .crud.integrations import router as integrations_router
+from .crud.integrations import router as integrations_router, close_client as close_integrations_client
 from .crud.demo import router as demo_router
-from .crud.sip_voice import router as sip_router
+from .crud.sip_voice import router as sip_router, close_client as close_sip_client
 from .crud.call_resolution import router as resolution_router
 from .crud.website_extract import router as extract_router
 from .crud.forwarding_verify import router as forwarding_verify_router
 from api import __version__
+from api.logging_config import setup_logging, shutdown_logging
+from api.database import get_service_client
+from api.web_search import close_client as close_web_search_client
 
 
 class FlyReplayMiddleware:
@@ -41,45 +46,65 @@ class FlyReplayMiddleware:
     """
 
     # Pattern to match media-stream WebSocket paths with machine ID
-    MEDIA_STREAM_PATTERN = re.compile(r'^/conversation/\d+/media-stream/([a-zA-Z0-9]+)$')
+    MEDIA_STREAM_PATTERN = re.compile(r'^/conversation/\d+/media-stream/([a-zA-Z0-9]+)$', re.ASCII)
+    MEDIA_STREAM_PREFIX = "/conversation/"
 
     def __init__(self, app: ASGIApp):
         self.app = app
         self.current_machine_id = os.getenv("FLY_MACHINE_ID", "local")
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
-        if scope["type"] == "websocket":
-            path = scope.get("path", "")
-            match = self.MEDIA_STREAM_PATTERN.match(path)
-
-            if match:
-                target_machine_id = match.group(1)
-
-                # Check if we need to replay to a different machine
-                if target_machine_id != "local" and target_machine_id != self.current_machine_id:
-                    print(f"[FlyReplay] Replaying WebSocket from {self.current_machine_id} to {target_machine_id}", flush=True)
-
-                    # Send HTTP 307 response with fly-replay header before WebSocket upgrade
-                    await send({
-                        "type": "websocket.http.response.start",
-                        "status": 307,
-                        "headers": [
-                            (b"fly-replay", f"instance={target_machine_id}".encode()),
-                            (b"content-type", b"text/plain"),
-                        ],
-                    })
-                    await send({
-                        "type": "websocket.http.response.body",
-                        "body": b"Replaying to correct instance",
-                    })
-                    return
+        # Only media-stream WebSocket upgrades can need a replay; everything
+        # else goes straight through without touching the regex
+        if scope["type"] != "websocket":
+            return await self.app(scope, receive, send)
+        path = scope.get("path", "")
+        if not path.startswith(self.MEDIA_STREAM_PREFIX):
+            return await self.app(scope, receive, send)
+
+        match = self.MEDIA_STREAM_PATTERN.match(path)
+        if match:
+            target_machine_id = match.group(1)
+
+            # Check if we need to replay to a different machine
+            if target_machine_id != "local" and target_machine_id != self.current_machine_id:
+                print(f"[FlyReplay] Replaying WebSocket from {self.current_machine_id} to {target_machine_id}", flush=True)
+
+                # Send HTTP 307 response with fly-replay header before WebSocket upgrade
+                await send({
+                    "type": "websocket.http.response.start",
+                    "status": 307,
+                    "headers": [
+                        (b"fly-replay", f"instance={target_machine_id}".encode()),
+                        (b"content-type", b"text/plain"),
+                    ],
+                })
+                await send({
+                    "type": "websocket.http.response.body",
+                    "body": b"Replaying to correct instance",
+                })
+                return
 
         # Not a replay case, continue normally
         await self.app(scope, receive, send)
 
 
-class DocsAccessMiddleware(BaseHTTPMiddleware):
-    """Restrict /docs and /redoc access to dev environments only."""
+def _host_pattern(hosts):
+    """Regex matching any of ``hosts`` or their subdomains, with an optional port."""
+    names = "|".join(re.escape(h) for h in hosts)
+    return re.compile(rf'(?:^|\.)(?:{names})(?::\d+)?$', re.ASCII)
+
+
+class DocsAccessMiddleware:
+    """
+    Restrict /docs and /redoc access to dev environments only.
+
+    Plain ASGI rather than BaseHTTPMiddleware: it runs on every request but
+    only needs the path and Host header, so it avoids the per-request task
+    group and body stream wrapping.
+    """
+
+    DOCS_PATHS = frozenset({"/docs", "/redoc", "/openapi.json"})
 
     # Hosts where docs should be accessible
     ALLOWED_HOSTS = [
@@ -94,36 +119,61 @@ class DocsAccessMiddleware(BaseHTTPMiddleware):
         "api.helloml.app",
     ]
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+    # Each list as one regex, so a check is a single C-level search
+    ALLOWED_RE = _host_pattern(ALLOWED_HOSTS)
+    BLOCKED_RE = _host_pattern(BLOCKED_HOSTS)
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Check if accessing docs endpoints
-        if path in ["/docs", "/redoc", "/openapi.json"]:
-            host = request.headers.get("host", "").split(":")[0]  # Remove port if present
+        if scope["type"] != "http" or scope["path"] not in self.DOCS_PATHS:
+            return await self.app(scope, receive, send)
+
+        host = ""
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value.decode("latin-1")
+                break
+
+        # Block if host is production; allow only dev environments
+        if self.BLOCKED_RE.search(host) or not self.ALLOWED_RE.search(host):
+            response = ORJSONResponse(
+                status_code=404,
+                content={"detail": "Not found"}
+            )
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
 
-            # Block if host is production
-            if any(blocked in host for blocked in self.BLOCKED_HOSTS):
-                return JSONResponse(
-                    status_code=404,
-                    content={"detail": "Not found"}
-                )
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
 
-            # Allow if host is in allowed list (dev environments)
-            is_allowed = any(allowed in host for allowed in self.ALLOWED_HOSTS)
+    # Build the shared Supabase client (and its HTTP pool) before the first
+    # call arrives, instead of on the first webhook's critical path
+    try:
+        get_service_client()
+    except ValueError as e:
+        print(f"[Startup] Supabase service client not configured: {e}", flush=True)
 
-            if not is_allowed:
-                return JSONResponse(
-                    status_code=404,
-                    content={"detail": "Not found"}
-                )
+    yield
 
-        return await call_next(request)
+    # Close the shared keep-alive HTTP clients before logging goes away
+    await close_sip_client()
+    await close_integrations_client()
+    await close_web_search_client()
+    shutdown_logging()
 
 
 _app = FastAPI(
     title="HelloML API",
     description="API for managing AI voice agents with phone provisioning",
-    version=__version__
+    version=__version__,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Add docs access restriction middleware (before CORS)
@@ -161,16 +211,21 @@ _app.include_router(extract_router)
 _app.include_router(forwarding_verify_router)
 
 
+# Health-check bodies never change, so encode them once
+_INDEX_BODY = orjson.dumps({"status": "running", "message": "HelloML API"})
+_VERSION_BODY = orjson.dumps({"version": __version__})
+
+
 @_app.get("/", summary="API status")
-def index():
+async def index():
     """Returns API status"""
-    return {"status": "running", "message": "HelloML API"}
+    return Response(content=_INDEX_BODY, media_type="application/json")
 
 
 @_app.get("/version", summary="API version")
-def version():
+async def version():
     """Returns API version"""
-    return {"version": __version__}
+    return Response(content=_VERSION_BODY, media_type="application/json")
 
 
 # Wrap with Fly.io session affinity middleware for WebSocket routing
@@ -180,4 +235,4 @@ app = FlyReplayMiddleware(_app)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(_app, host="0.0.0.0", port=8000)
+    uvicorn.run(_app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
@@ -0,0 +1,30 @@
+# api/phone_utils.py
+"""
+Phone number canonicalization.
+
+Numbers are stored in phone_number.phone_number as E.164 (e.g. +18005551212)
+so inbound lookups are a single equality match regardless of how the carrier
+formatted the dialed number.
+"""
+
+from typing import Optional
+import phonenumbers
+from phonenumbers import NumberParseException, PhoneNumberFormat
+
+DEFAULT_REGION = "US"
+
+
+def to_e164(number: str, region: str = DEFAULT_REGION) -> Optional[str]:
+    """
+    Normalize a phone number to E.164, or return None if it can't be parsed.
+    Numbers without a country code are interpreted in ``region``.
+    """
+    if not number:
+        return None
+    try:
+        parsed = phonenumbers.parse(number, region)
+    except NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, PhoneNumberFormat.E164)
@@ -1,13 +1,52 @@
 # api/rag.py
 
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import orjson
+
+from api.ttl_cache import TTLCache
+
 EMBED_MODEL = "text-embedding-3-small"   # 1536 dims
+EMBED_BATCH_SIZE = 64    # chunks per embeddings request
+EMBED_CONCURRENCY = 4    # embeddings requests in flight per document
+QUERY_EMBED_CACHE_MAX = 4096  # search queries whose embeddings are kept
+SEARCH_CACHE_MAX = 1024  # search results kept
+SEARCH_CACHE_TTL = 300   # seconds; also bounds staleness across workers
+
+# query text -> embedding. Callers ask the same questions ("what are your
+# hours?") call after call, and each embedding is an OpenAI round trip.
+# Searches run in worker threads (asyncio.to_thread), hence the lock.
+_query_embeddings = TTLCache(QUERY_EMBED_CACHE_MAX, lock=True)
+
+# (agent_id, normalized query, k, min_similarity) -> matches. Models often
+# repeat a search verbatim within a call; a hit skips both the embedding
+# request and the pgvector query. Cleared per agent whenever its documents
+# change in this process.
+_search_results = TTLCache(SEARCH_CACHE_MAX, SEARCH_CACHE_TTL, lock=True)
+
+
+def forget_agent_searches(agent_id):
+    """Drops cached search results for an agent after its documents change."""
+    _search_results.discard_where(lambda key: key[0] == agent_id)
+
+
+def _vector_literal(emb):
+    """
+    Encodes an embedding as a pgvector text literal ("[0.1,0.2,...]").
+    pgvector stores float32, so printing each value at float32 precision
+    loses nothing and roughly halves the JSON sent to PostgREST compared
+    with full float64 reprs of a plain list. Accepts arrays or lists.
+    """
+    return orjson.dumps(np.asarray(emb, dtype=np.float32), option=orjson.OPT_SERIALIZE_NUMPY).decode()
 
 def chunk_text(text, chunk_size=3000, overlap=500):
     """
     Breaks text into overlapping chunks so embeddings preserve context.
     Example:
       text="ABCDEFGHIJ", chunk_size=5, overlap=2
-      -> ["ABCDE", "CDEFG", "EFGHI", "GHIJ"]
+      -> ["ABCDE", "DEFGH", "GHIJ"]
 
     enforce 0 ≤ overlap < chunk_size
     """
@@ -18,37 +57,33 @@ def chunk_text(text, chunk_size=3000, overlap=500):
     # never let overlap >= chunk_size
     if overlap >= chunk_size:
         overlap = max(0, chunk_size - 1)
-    
-    chunks = []
-    n = len(text)
-    start = 0
-
-    while start < n:
-        end = min(start + chunk_size, n) # make sure you dont go out of bounds
-        chunks.append(text[start:end])
-        if end == n:
-            break
-        # adjust start with some overlap (easier context transitions)
-        start = end - overlap
-    
-    return chunks
+
+    # Each chunk starts `step` after the previous one; the last start is the
+    # first whose chunk reaches the end of the text (easier context transitions)
+    step = chunk_size - overlap
+    return [text[start:start + chunk_size] for start in range(0, max(len(text) - overlap, 1), step)]
 
 def embed_texts(client, texts):
     """
-    Takes a list of strings, returns list of embeddings (each is a list of 1536 floats).
+    Takes a list of strings, returns list of embeddings (each a float32 array of 1536 values).
     Uses OpenAI's embedding endpoint to convert text -> vector representation.
     """
     if not texts:
         return []
 
     try:
-        response = client.embeddings.create(model=EMBED_MODEL, input=texts)
+        # base64 carries the raw float32 bytes, so nothing is parsed as text
+        # and no per-value Python floats are built
+        response = client.embeddings.create(model=EMBED_MODEL, input=texts, encoding_format="base64")
     except Exception as e:
         raise RuntimeError(f"Embedding request failed: {e}") from e
 
     embeddings = []
     for item in response.data:
-        embeddings.append(item.embedding)
+        if isinstance(item.embedding, str):
+            embeddings.append(np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32))
+        else:
+            embeddings.append(np.asarray(item.embedding, dtype=np.float32))
 
     return embeddings
 
@@ -102,55 +137,85 @@ def upsert_document_text(sb, ai, agent_id, filename, text,
     if not chunks:
         raise ValueError("No text found in document to embed.")
 
-    # Remove any prior chunks for this document (so we truly upsert/replace)
-    sb.table("document_chunk").delete().eq("document_id", doc_id).execute()
+    # Identical chunks (repeated headers, footers, legal text) are embedded once
+    unique_chunks = list(dict.fromkeys(chunks))
 
-    # Generate embeddings in batches
-    BATCH_SIZE = 64
-    to_insert = []
+    # Generate embeddings in batches, several requests in flight at once
+    batches = [unique_chunks[i:i + EMBED_BATCH_SIZE] for i in range(0, len(unique_chunks), EMBED_BATCH_SIZE)]
 
-    for i in range(0, len(chunks), BATCH_SIZE):
-        batch = chunks[i:i + BATCH_SIZE]
-        embeddings = embed_texts(ai, batch)
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY + 1) as pool:
+        # Remove any prior chunks for this document (so we truly upsert/replace)
+        # while the embedding requests run
+        deleted = pool.submit(sb.table("document_chunk").delete().eq("document_id", doc_id).execute)
+        batch_embeddings = list(pool.map(lambda batch: embed_texts(ai, batch), batches))
+        deleted.result()
+
+    # chunk text -> pgvector literal
+    vectors = {}
+    for batch, embeddings in zip(batches, batch_embeddings):
         if len(embeddings) != len(batch):
             raise RuntimeError("Embedding API returned unexpected number of vectors.")
+        for chunk, emb in zip(batch, embeddings):
+            vectors[chunk] = _vector_literal(emb)
 
-        for j, (chunk, emb) in enumerate(zip(batch, embeddings)):
-            to_insert.append({
-                "document_id": doc_id,
-                "chunk_index": i + j,
-                "chunk_text": chunk,
-                "embedding": emb  # Supabase auto-casts Python list -> pgvector
-            })
+    to_insert = [
+        {
+            "document_id": doc_id,
+            "chunk_index": i,
+            "chunk_text": chunk,
+            "embedding": vectors[chunk]  # pgvector parses the text literal
+        }
+        for i, chunk in enumerate(chunks)
+    ]
 
     # Insert chunk embeddings into the table
     if to_insert:
         sb.table("document_chunk").insert(to_insert).execute()
 
+    forget_agent_searches(agent_id)
     return {"document_id": doc_id, "chunks": len(to_insert)}
 
 
-def semantic_search(sb, ai, agent_id, query, k=10, min_similarity=0.3):
+def _embed_query(ai, query):
+    """Returns the embedding for a search query, reusing earlier results for the same text."""
+    emb = _query_embeddings.get(query)
+    if emb is None:
+        q_emb_list = embed_texts(ai, [query]) # pass in query as a list of 1 string (customer stt)
+        if not q_emb_list:
+            return None
+        emb = q_emb_list[0] # grab the embedding, full 1536-dim vector
+        _query_embeddings.set(query, emb)
+    return emb
+
+
+def semantic_search(sb, ai, agent_id, query=None, k=10, min_similarity=0.3, *, query_embedding=None):
     """
     Finds the most semantically similar chunks for a given query.
+    Pass query_embedding to reuse a vector the caller already has.
     """
-    # Create query embedding
-    q_emb_list = embed_texts(ai, [query]) # pass in query as a list of 1 string (customer stt)
-                                          # q_emb_list is a list of size 1
-
-    if not q_emb_list:
+    key = None
+    if query is not None:
+        key = (agent_id, " ".join(query.lower().split()), k, min_similarity)
+        cached = _search_results.get(key)
+        if cached is not None:
+            return list(cached)
+
+    q_emb = query_embedding if query_embedding is not None else _embed_query(ai, query)
+    if q_emb is None:
         return []
-    q_emb = q_emb_list[0] # grab the embedding, full 1536-dim vector
 
     # Call Postgres RPC
     res = sb.rpc(
         "match_document_chunks",
         {
             "p_agent_id": agent_id,
-            "p_query_embedding": q_emb,
+            "p_query_embedding": _vector_literal(q_emb),
             "p_match_count": k,
             "p_min_sim": min_similarity
         }
     ).execute()
 
-    return res.data or []
\ No newline at end of file
+    matches = res.data or []
+    if key is not None:
+        _search_results.set(key, matches)
+    return list(matches)
\ No newline at end of file
@@ -5,16 +5,371 @@ Manages WebSocket connection to OpenAI Realtime API, handles session configurati
 function calling for RAG, and transcript storage.
 """
 
-import json
+import re
+import ssl
+import base64
 import asyncio
+import logging
+import orjson
 import websockets
 from typing import Optional, Dict, Any, Callable, List
 from api.database import get_service_client
 from api.rag import semantic_search
 from api.web_search import search_web
+from api.ttl_cache import TTLCache
 from openai import OpenAI
 import os
 
+logger = logging.getLogger(__name__)
+
+# Caller audio (8kHz μ-law, 8000 bytes/s) held while an upstream send is in
+# flight. Past this, new frames are dropped rather than buffered without bound.
+AUDIO_BACKLOG_MAX = 8000  # bytes (1 second)
+
+# Inbound OpenAI messages websockets buffers while we're still forwarding
+# earlier ones to Twilio. When it fills, reads stop and TCP flow control
+# slows the sender, so a stalled caller socket can't grow memory; agent
+# audio is never dropped, only delayed.
+UPSTREAM_MAX_QUEUE = 32  # messages
+
+# One TLS context for every session socket: the CA bundle is loaded once at
+# import instead of on each call's connect. WebSockets need HTTP/1.1.
+_WS_SSL_CTX = ssl.create_default_context()
+_WS_SSL_CTX.set_alpn_protocols(["http/1.1"])
+
+# Function tool definitions offered to the model; built once at import
+_SEARCH_KB_TOOL = {
+    "type": "function",
+    "name": "search_knowledge_base",
+    "description": "Search the business's uploaded knowledge base documents using semantic similarity. Returns matching text chunks ranked by relevance score, or a not-found message if no matches exist.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Natural language search query to match against document content"
+            }
+        },
+        "required": ["query"]
+    }
+}
+
+_SEARCH_WEB_TOOL = {
+    "type": "function",
+    "name": "search_web",
+    "description": "Search the web for information when the knowledge base doesn't have the answer. Use for current info, competitor comparisons, industry questions, or anything not in the knowledge base.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Search query - be specific and include the business name or context"
+            }
+        },
+        "required": ["query"]
+    }
+}
+
+_END_CALL_TOOL = {
+    "type": "function",
+    "name": "end_call",
+    "description": "Terminate the active phone call and disconnect all parties. Returns a success or failure status with a message.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "reason": {
+                "type": "string",
+                "description": "Brief explanation of why the call is ending"
+            }
+        },
+        "required": ["reason"]
+    }
+}
+
+_CHECK_CALENDAR_TOOL = {
+    "type": "function",
+    "name": "check_calendar",
+    "description": "Check availability on a given date. Returns busy time slots (start/end times when calendar is occupied).",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "date": {
+                "type": "string",
+                "description": "Date to check in YYYY-MM-DD format (e.g. 2026-01-28)"
+            }
+        },
+        "required": ["date"]
+    }
+}
+
+_CREATE_EVENT_TOOL = {
+    "type": "function",
+    "name": "create_calendar_event",
+    "description": "Create a new event on the business's Google Calendar. Returns confirmation with event details and a link.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "summary": {
+                "type": "string",
+                "description": "Title of the event (e.g. 'Meeting with John')"
+            },
+            "date": {
+                "type": "string",
+                "description": "Date of the event in YYYY-MM-DD format"
+            },
+            "start_time": {
+                "type": "string",
+                "description": "Start time in HH:MM format (24-hour, e.g. '14:00')"
+            },
+            "end_time": {
+                "type": "string",
+                "description": "End time in HH:MM format (24-hour, e.g. '15:00')"
+            },
+            "description": {
+                "type": "string",
+                "description": "Optional description or notes for the event"
+            }
+        },
+        "required": ["summary", "date", "start_time", "end_time"]
+    }
+}
+
+_DEFAULT_PROMPT = (
+    "You are a helpful AI voice assistant.\n"
+    "Answer questions naturally and professionally.\n"
+    "Always be polite, professional, and helpful."
+)
+
+# Session instruction text, split into fixed sections and str.format
+# templates so only the per-agent values are filled in per render
+_TOOL_RULES = """- Before any tool call, say ONE short natural line like "Let me check on that" or "One moment" — then call the tool immediately.
+- NEVER mention "internal info", "knowledge base", "system", "database", "searching elsewhere", or any technical details about HOW you find information.
+- NEVER say things like "I couldn't find that in our internal info" or "let me search elsewhere".
+- To the caller, you simply KNOW things or you CHECK on things. The process is invisible.
+- If the first tool returns nothing, silently try the next tool — do NOT narrate the fallback.
+- Only say ONE brief hold phrase per question, even if you call multiple tools."""
+
+_KB_TOOL_RULES = """
+
+## search_knowledge_base
+- Use ONLY for questions directly about THIS business (hours, services, policies, staff, location).
+- If no results on first try, retry once with different terms, then use search_web.
+- NEVER use your general knowledge or training data - only tool results."""
+
+_WEB_TOOL_RULES = """
+
+## search_web
+- Use DIRECTLY (skip search_knowledge_base) for:
+  - Product/pricing questions (e.g. "how much does X cost")
+  - General knowledge, current events, industry info
+  - Anything clearly NOT about this specific business
+  - Follow-up questions on a topic you already searched the web for
+- Use as FALLBACK after search_knowledge_base returns no results for business questions.
+- Be specific in your query - include relevant context from the conversation.
+- Summarize results conversationally - never read URLs or raw text aloud.
+- Always give a direct answer with specific numbers/details when available."""
+
+_END_CALL_TOOL_RULES = """
+
+## end_call
+- Call when the caller says goodbye or the conversation is complete.
+- BEFORE calling, say: "{goodbye}" """
+
+_CALENDAR_TOOL_RULES = """
+
+## check_calendar
+- Call when the caller asks about availability or wants to know when they're free/busy.
+- Returns busy time slots (not event details). Summarize which times are busy vs available.
+
+## create_calendar_event
+- Call when the caller wants to schedule, book, or create an appointment.
+- Confirm the details (what, when) with the caller BEFORE creating the event.
+- Default appointment duration: {default_duration} minutes (use this if caller doesn't specify).
+- Business hours: {biz_start} to {biz_end}. Do not book appointments outside these hours.
+- Booking window: up to {booking_window} days in advance.
+- {conflict_rule}
+- After creating, confirm the event was added."""
+
+_INSTRUCTIONS_TEMPLATE = """# Role & Objective
+You are a voice customer service agent for {business_name}. You answer caller questions naturally, as if you work there and know the business well.
+
+# Context
+{business_context}
+You represent this business. When asked who you are, what business this is, or for contact details, use the information above.
+
+# Capabilities
+You have access to the following tools: {tool_list_str}.
+You can ONLY perform actions that your tools allow. If a caller asks you to do something outside your capabilities, let them know what you can help with instead.
+
+# Personality & Tone
+## Personality
+Professional, friendly, calm, and approachable customer service assistant.
+
+## Tone
+Warm, concise, confident, never fawning.
+
+## Length
+2-3 sentences per turn.
+
+## Language
+- The conversation will be only in English.
+- Do not respond in any other language even if the user asks.
+- If the user speaks another language, politely explain that support is limited to English.
+
+## Variety
+- Do not repeat the same sentence twice. Vary your responses so it doesn't sound robotic.
+
+# Initial Greeting
+When you see "[Call connected]", say exactly: "{greeting}"
+- Say this once, then wait for the caller.
+- NEVER repeat the greeting later in the conversation.
+
+# Unclear Audio
+- Only respond to clear audio or text.
+- If the user's audio is not clear (e.g., ambiguous input, background noise, silent, unintelligible) or if you did not fully hear or understand the user, ask for clarification.
+- Do not include any sound effects or onomatopoeic expressions in your responses.
+
+Sample clarification phrases:
+- "Sorry, I didn't catch that - could you say it again?"
+- "There's some background noise. Please repeat the last part."
+- "I only heard part of that. What did you say after...?"
+
+# Tools
+{tool_instructions}
+
+# Instructions
+- NEVER answer factual questions from your own knowledge - always use a tool first.
+- For business questions: search_knowledge_base first, then search_web.
+- For general/product/pricing questions: search_web directly.
+- Keep responses concise - this is a phone call, not an essay.
+- If tools return no answer, say you don't have that information.
+
+{base_instructions}"""
+
+# Fast path for response.output_audio.delta frames, matched on the raw frame
+# bytes. The patterns refuse escaped strings, so anything unusual falls back
+# to a full parse.
+_AUDIO_DELTA_PREFIX = b'{"type":"response.output_audio.delta"'
+_AUDIO_DELTA_RE = re.compile(rb'"delta":"([^"\\]*)"')
+_ITEM_ID_RE = re.compile(rb'"item_id":"([^"\\]*)"')
+
+SESSION_UPDATE_CACHE_MAX = 512  # rendered session.update events kept
+
+# Session inputs (prompt, business details, greeting, tools...) -> (encoded
+# session.update text, tool names). Every call to the same agent renders the
+# same ~6KB event, so it is built and encoded once.
+_session_updates = TTLCache(SESSION_UPDATE_CACHE_MAX)
+
+# Opening turn, sent right behind session.update. The model answers with the
+# greeting from its instructions; a user message is used because
+# conversation.item.create for assistant messages cannot generate audio.
+_GREETING_EVENTS = (
+    orjson.dumps({
+        "type": "conversation.item.create",
+        "item": {
+            "type": "message",
+            "role": "user",
+            "content": [{"type": "input_text", "text": "[Call connected]"}],
+        },
+    }).decode(),
+    orjson.dumps({"type": "response.create"}).decode(),
+)
+
+
+def _concat_b64(chunks: List[str]) -> str:
+    """
+    Join base64 audio frames into one base64 payload. Strings can only be
+    joined as-is when no frame but the last is padded (its byte length is a
+    multiple of 3); otherwise the frames are decoded and re-encoded.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    if not any(c.endswith("=") for c in chunks[:-1]):
+        return "".join(chunks)
+    return base64.b64encode(b"".join(base64.b64decode(c) for c in chunks)).decode()
+
+
+# Model used when the agent row doesn't name one (gpt-realtime-1.5: flagship
+# model, best voice quality; audio/pcmu confirmed working with the GA API)
+DEFAULT_REALTIME_MODEL = 'gpt-realtime-1.5'
+
+# How long a pre-opened, unconfigured socket waits for its call before it's
+# closed. Well under OpenAI's idle timeout; the Twilio webhook to media
+# stream gap it covers is usually around a second.
+WARM_SOCKET_MAX_AGE = 30  # seconds
+
+# model -> connects started ahead of calls, oldest first. Each resolves to an
+# open socket with no session config sent yet, so any agent on that model
+# can take it.
+_warm_sockets: Dict[str, List[asyncio.Task]] = {}
+
+
+async def _open_realtime_socket(model: str):
+    """Open an authenticated Realtime socket for model (TCP + TLS + WS upgrade)."""
+    # Audio is base64 text that barely deflates; don't spend CPU trying
+    return await websockets.connect(
+        f"wss://api.openai.com/v1/realtime?model={model}",
+        additional_headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
+        ssl=_WS_SSL_CTX,
+        compression=None,
+        max_queue=UPSTREAM_MAX_QUEUE,
+    )
+
+
+def prewarm_realtime_socket(model: Optional[str] = None):
+    """
+    Start opening a Realtime socket for a call that's about to connect, so the
+    handshakes are done by the time its media stream starts. Must be called
+    from the event loop.
+    """
+    model = model or DEFAULT_REALTIME_MODEL
+    task = asyncio.create_task(_open_realtime_socket(model))
+    _warm_sockets.setdefault(model, []).append(task)
+    asyncio.get_running_loop().call_later(WARM_SOCKET_MAX_AGE, _expire_warm_socket, model, task)
+
+
+def _expire_warm_socket(model: str, task: asyncio.Task):
+    """Close a pre-opened socket nobody took in time."""
+    tasks = _warm_sockets.get(model)
+    if not tasks or task not in tasks:
+        return
+    tasks.remove(task)
+    if not tasks:
+        del _warm_sockets[model]
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled() and task.exception() is None:
+        asyncio.create_task(task.result().close())
+
+
+async def _take_warm_socket(model: str):
+    """Return a pre-opened socket for model, newest first, or None."""
+    tasks = _warm_sockets.get(model)
+    while tasks:
+        task = tasks.pop()
+        if not tasks:
+            del _warm_sockets[model]
+        try:
+            ws = await task
+        except Exception as e:
+            logger.warning("[RealtimeSession] Pre-opened socket failed: %s", e)
+        else:
+            if ws.close_code is None:
+                return ws
+        tasks = _warm_sockets.get(model)
+    return None
+
+
+# API-key client for knowledge base embeddings, shared across sessions so
+# RAG searches reuse one connection pool instead of a new TLS handshake each
+_ai_client = None
+
+def _get_ai_client():
+    global _ai_client
+    if _ai_client is None:
+        _ai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _ai_client
+
 
 class RealtimeSession:
     """Manages an OpenAI Realtime API session for a voice agent."""
@@ -79,7 +434,11 @@ class RealtimeSession:
 
         # For accumulating transcripts
         self.current_user_transcript = ""
-        self.current_agent_transcript = ""
+        self.current_agent_transcript: List[str] = []  # deltas, joined on done
+
+        # Transcript rows waiting to be written, and the task writing them
+        self._pending_rows: List[Dict[str, Any]] = []
+        self._save_task: Optional[asyncio.Task] = None
 
         # Audio format: audio/pcmu (μ-law) for Twilio — zero conversion needed.
         # The OpenAI Realtime API natively supports audio/pcmu format,
@@ -87,6 +446,14 @@ class RealtimeSession:
         # any resampling or PCM conversion. This eliminates quality loss.
         self.audio_format = "pcmu"
 
+        # Caller audio waiting to go upstream; frames that arrive while a send
+        # is in flight are coalesced into the next input_audio_buffer.append
+        self._pending_audio: List[str] = []  # base64 frames, oldest first
+        self._pending_audio_size = 0  # decoded bytes queued
+        self._dropped_audio_frames = 0  # frames dropped in the current stall
+        self._audio_ready = asyncio.Event()
+        self._audio_task: Optional[asyncio.Task] = None
+
         # Track function call state
         self.pending_function_calls: Dict[str, Dict] = {}
 
@@ -107,42 +474,68 @@ class RealtimeSession:
     async def connect(self):
         """Connect to OpenAI Realtime API and configure session."""
         # Get model from agent config, use latest GA model as default
-        # Use gpt-realtime-1.5 (flagship model, best voice quality).
-        # audio/pcmu format confirmed working with GA Realtime API.
-        model = self.agent_config.get('model_type') or 'gpt-realtime-1.5'
-
-        url = f"wss://api.openai.com/v1/realtime?model={model}"
-
-        headers = {
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        model = self.agent_config.get('model_type') or DEFAULT_REALTIME_MODEL
 
         try:
-            self.ws = await websockets.connect(url, additional_headers=headers)
+            # Use the socket the incoming-call webhook started opening, if any
+            self.ws = await _take_warm_socket(model) or await _open_realtime_socket(model)
             self.running = True
-            print(f"[RealtimeSession] Connected for conversation {self.conversation_id} with model={model}")
+            logger.info("[RealtimeSession] Connected for conversation %s with model=%s", self.conversation_id, model)
 
             # Send session configuration
             await self._configure_session()
 
             # Start listening for events
             asyncio.create_task(self._listen_for_events())
+            self._audio_task = asyncio.create_task(self._flush_audio())
 
         except Exception as e:
-            print(f"[RealtimeSession] Connection error: {e}")
+            logger.error("[RealtimeSession] Connection error: %s", e)
             if self.on_error:
                 await self.on_error(str(e))
             raise
 
     async def _configure_session(self):
         """Configure the Realtime session with agent settings (GA API format)."""
-        default_prompt = (
-            "You are a helpful AI voice assistant.\n"
-            "Answer questions naturally and professionally.\n"
-            "Always be polite, professional, and helpful."
+        key = self._session_update_key()
+        entry = _session_updates.get(key) if key is not None else None
+        if entry is None:
+            entry = self._build_session_update()
+            if key is not None:
+                _session_updates.set(key, entry)
+
+        # Configure the session and trigger the initial greeting in one go:
+        # all three events are encoded already and go out back to back
+        session_update, tool_names = entry
+        await self._send_text(session_update, *_GREETING_EVENTS)
+        logger.info("[RealtimeSession] Session configured - tools: %s, phone: %s", tool_names, self.agent_phone)
+        logger.info("[RealtimeSession] Triggered initial greeting")
+
+    def _session_update_key(self):
+        """Everything _build_session_update reads, or None if a setting can't be hashed."""
+        biz = self.business_info
+        key = (
+            self.agent_config.get('prompt'),
+            self.agent_config.get('voice_model', 'ash'),
+            biz.get('name'),
+            biz.get('address'),
+            biz.get('business_email'),
+            biz.get('phone_number'),
+            self.agent_phone,
+            self.greeting,
+            self.goodbye,
+            tuple(self.connected_tools),
+            tuple(sorted(self.tool_settings.get('google-calendar', {}).items())),
         )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
-        base_instructions = self.agent_config.get('prompt') or default_prompt
+    def _build_session_update(self):
+        """Render the session.update event; returns (encoded JSON text, tool names)."""
+        base_instructions = self.agent_config.get('prompt') or _DEFAULT_PROMPT
 
         # Build business context section
         biz = self.business_info
@@ -161,135 +554,49 @@ class RealtimeSession:
 
         # Build tools list and dynamic tool instructions
         tools = [
-            self._get_rag_tool_definition(),
-            self._get_web_search_tool_definition(),
-            self._get_end_call_tool_definition()
+            _SEARCH_KB_TOOL,
+            _SEARCH_WEB_TOOL,
+            _END_CALL_TOOL
         ]
 
         # Add calendar tools if Google Calendar is connected
         has_calendar = 'google-calendar' in self.connected_tools or 'outlook-calendar' in self.connected_tools
         if has_calendar:
-            tools.append(self._get_calendar_check_tool())
-            tools.append(self._get_calendar_create_tool())
+            tools.append(_CHECK_CALENDAR_TOOL)
+            tools.append(_CREATE_EVENT_TOOL)
 
         tool_names = [t["name"] for t in tools]
 
-        tool_instructions = """- Before any tool call, say ONE short natural line like "Let me check on that" or "One moment" — then call the tool immediately.
-- NEVER mention "internal info", "knowledge base", "system", "database", "searching elsewhere", or any technical details about HOW you find information.
-- NEVER say things like "I couldn't find that in our internal info" or "let me search elsewhere".
-- To the caller, you simply KNOW things or you CHECK on things. The process is invisible.
-- If the first tool returns nothing, silently try the next tool — do NOT narrate the fallback.
-- Only say ONE brief hold phrase per question, even if you call multiple tools."""
+        tool_instructions = _TOOL_RULES
 
         if "search_knowledge_base" in tool_names:
-            tool_instructions += """
-
-## search_knowledge_base
-- Use ONLY for questions directly about THIS business (hours, services, policies, staff, location).
-- If no results on first try, retry once with different terms, then use search_web.
-- NEVER use your general knowledge or training data - only tool results."""
+            tool_instructions += _KB_TOOL_RULES
 
         if "search_web" in tool_names:
-            tool_instructions += """
-
-## search_web
-- Use DIRECTLY (skip search_knowledge_base) for:
-  - Product/pricing questions (e.g. "how much does X cost")
-  - General knowledge, current events, industry info
-  - Anything clearly NOT about this specific business
-  - Follow-up questions on a topic you already searched the web for
-- Use as FALLBACK after search_knowledge_base returns no results for business questions.
-- Be specific in your query - include relevant context from the conversation.
-- Summarize results conversationally - never read URLs or raw text aloud.
-- Always give a direct answer with specific numbers/details when available."""
+            tool_instructions += _WEB_TOOL_RULES
 
         if "end_call" in tool_names:
-            tool_instructions += f"""
-
-## end_call
-- Call when the caller says goodbye or the conversation is complete.
-- BEFORE calling, say: "{self.goodbye}" """
+            tool_instructions += _END_CALL_TOOL_RULES.format(goodbye=self.goodbye)
 
         if "check_calendar" in tool_names:
             cal_settings = self.tool_settings.get('google-calendar', {})
-            default_duration = cal_settings.get('default_duration', 30)
             allow_conflicts = cal_settings.get('allow_conflicts', False)
-            booking_window = cal_settings.get('booking_window_days', 30)
-            biz_start = cal_settings.get('business_hours_start', '09:00')
-            biz_end = cal_settings.get('business_hours_end', '17:00')
-
-            tool_instructions += f"""
-
-## check_calendar
-- Call when the caller asks about availability or wants to know when they're free/busy.
-- Returns busy time slots (not event details). Summarize which times are busy vs available.
-
-## create_calendar_event
-- Call when the caller wants to schedule, book, or create an appointment.
-- Confirm the details (what, when) with the caller BEFORE creating the event.
-- Default appointment duration: {default_duration} minutes (use this if caller doesn't specify).
-- Business hours: {biz_start} to {biz_end}. Do not book appointments outside these hours.
-- Booking window: up to {booking_window} days in advance.
-- {"Conflicts are allowed." if allow_conflicts else "Do not book over existing events (check calendar first)."}
-- After creating, confirm the event was added."""
-
-        tool_list_str = ", ".join(tool_names)
-
-        instructions = f"""# Role & Objective
-You are a voice customer service agent for {biz.get('name') or 'a business'}. You answer caller questions naturally, as if you work there and know the business well.
-
-# Context
-{business_context}
-You represent this business. When asked who you are, what business this is, or for contact details, use the information above.
-
-# Capabilities
-You have access to the following tools: {tool_list_str}.
-You can ONLY perform actions that your tools allow. If a caller asks you to do something outside your capabilities, let them know what you can help with instead.
-
-# Personality & Tone
-## Personality
-Professional, friendly, calm, and approachable customer service assistant.
-
-## Tone
-Warm, concise, confident, never fawning.
-
-## Length
-2-3 sentences per turn.
-
-## Language
-- The conversation will be only in English.
-- Do not respond in any other language even if the user asks.
-- If the user speaks another language, politely explain that support is limited to English.
-
-## Variety
-- Do not repeat the same sentence twice. Vary your responses so it doesn't sound robotic.
-
-# Initial Greeting
-When you see "[Call connected]", say exactly: "{self.greeting}"
-- Say this once, then wait for the caller.
-- NEVER repeat the greeting later in the conversation.
-
-# Unclear Audio
-- Only respond to clear audio or text.
-- If the user's audio is not clear (e.g., ambiguous input, background noise, silent, unintelligible) or if you did not fully hear or understand the user, ask for clarification.
-- Do not include any sound effects or onomatopoeic expressions in your responses.
-
-Sample clarification phrases:
-- "Sorry, I didn't catch that - could you say it again?"
-- "There's some background noise. Please repeat the last part."
-- "I only heard part of that. What did you say after...?"
-
-# Tools
-{tool_instructions}
-
-# Instructions
-- NEVER answer factual questions from your own knowledge - always use a tool first.
-- For business questions: search_knowledge_base first, then search_web.
-- For general/product/pricing questions: search_web directly.
-- Keep responses concise - this is a phone call, not an essay.
-- If tools return no answer, say you don't have that information.
+            tool_instructions += _CALENDAR_TOOL_RULES.format(
+                default_duration=cal_settings.get('default_duration', 30),
+                biz_start=cal_settings.get('business_hours_start', '09:00'),
+                biz_end=cal_settings.get('business_hours_end', '17:00'),
+                booking_window=cal_settings.get('booking_window_days', 30),
+                conflict_rule="Conflicts are allowed." if allow_conflicts else "Do not book over existing events (check calendar first).",
+            )
 
-{base_instructions}"""
+        instructions = _INSTRUCTIONS_TEMPLATE.format(
+            business_name=biz.get('name') or 'a business',
+            business_context=business_context,
+            tool_list_str=", ".join(tool_names),
+            greeting=self.greeting,
+            tool_instructions=tool_instructions,
+            base_instructions=base_instructions,
+        )
 
         session_config = {
             "type": "session.update",
@@ -323,190 +630,104 @@ Sample clarification phrases:
             }
         }
 
-        await self.send_event(session_config)
-        print(f"[RealtimeSession] Session configured - tools: {tool_names}, phone: {self.agent_phone}")
-
-        # Trigger the initial greeting
-        await self._trigger_initial_greeting()
-
-    def _get_rag_tool_definition(self) -> Dict[str, Any]:
-        """Return the function tool definition for knowledge base semantic search."""
-        return {
-            "type": "function",
-            "name": "search_knowledge_base",
-            "description": "Search the business's uploaded knowledge base documents using semantic similarity. Returns matching text chunks ranked by relevance score, or a not-found message if no matches exist.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Natural language search query to match against document content"
-                    }
-                },
-                "required": ["query"]
-            }
-        }
-
-    def _get_web_search_tool_definition(self) -> Dict[str, Any]:
-        """Return the function tool definition for live web search."""
-        return {
-            "type": "function",
-            "name": "search_web",
-            "description": "Search the web for information when the knowledge base doesn't have the answer. Use for current info, competitor comparisons, industry questions, or anything not in the knowledge base.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Search query - be specific and include the business name or context"
-                    }
-                },
-                "required": ["query"]
-            }
-        }
-
-    def _get_end_call_tool_definition(self) -> Dict[str, Any]:
-        """Return the function tool definition for terminating the active call."""
-        return {
-            "type": "function",
-            "name": "end_call",
-            "description": "Terminate the active phone call and disconnect all parties. Returns a success or failure status with a message.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "reason": {
-                        "type": "string",
-                        "description": "Brief explanation of why the call is ending"
-                    }
-                },
-                "required": ["reason"]
-            }
-        }
-
-    def _get_calendar_check_tool(self) -> Dict[str, Any]:
-        """Return the function tool definition for checking calendar availability."""
-        return {
-            "type": "function",
-            "name": "check_calendar",
-            "description": "Check availability on a given date. Returns busy time slots (start/end times when calendar is occupied).",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "date": {
-                        "type": "string",
-                        "description": "Date to check in YYYY-MM-DD format (e.g. 2026-01-28)"
-                    }
-                },
-                "required": ["date"]
-            }
-        }
-
-    def _get_calendar_create_tool(self) -> Dict[str, Any]:
-        """Return the function tool definition for creating calendar events."""
-        return {
-            "type": "function",
-            "name": "create_calendar_event",
-            "description": "Create a new event on the business's Google Calendar. Returns confirmation with event details and a link.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "summary": {
-                        "type": "string",
-                        "description": "Title of the event (e.g. 'Meeting with John')"
-                    },
-                    "date": {
-                        "type": "string",
-                        "description": "Date of the event in YYYY-MM-DD format"
-                    },
-                    "start_time": {
-                        "type": "string",
-                        "description": "Start time in HH:MM format (24-hour, e.g. '14:00')"
-                    },
-                    "end_time": {
-                        "type": "string",
-                        "description": "End time in HH:MM format (24-hour, e.g. '15:00')"
-                    },
-                    "description": {
-                        "type": "string",
-                        "description": "Optional description or notes for the event"
-                    }
-                },
-                "required": ["summary", "date", "start_time", "end_time"]
-            }
-        }
-
-    async def _trigger_initial_greeting(self):
-        """
-        Trigger the initial greeting by sending a call-connected message.
-
-        The model will respond with the greeting defined in instructions.
-        We use a user message to trigger the model's response since
-        conversation.item.create for assistant messages cannot generate audio.
-        """
-        try:
-            # Create a user message indicating call connection
-            greeting_trigger = {
-                "type": "conversation.item.create",
-                "item": {
-                    "type": "message",
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "input_text",
-                            "text": "[Call connected]"
-                        }
-                    ]
-                }
-            }
-            await self.send_event(greeting_trigger)
-
-            # Trigger response - model will say the greeting from instructions
-            await self.send_event({"type": "response.create"})
-            print(f"[RealtimeSession] Triggered initial greeting")
-
-        except Exception as e:
-            print(f"[RealtimeSession] Failed to trigger greeting: {e}")
+        return orjson.dumps(session_config).decode(), tool_names
 
     async def _wait_for_audio_completion(self, timeout: float = 5.0):
         """
         Wait for any ongoing audio to finish playing.
 
         This gives time for the goodbye message to be spoken before disconnecting.
+        Twilio echoes each mark once the audio sent before it has played, so
+        an empty mark queue means playback has caught up; timeout bounds the
+        wait if marks never come back.
         """
+        if not self.mark_queue:
+            return
+
+        self.goodbye_complete.clear()
+        self.waiting_for_goodbye = True
         try:
-            # Wait a reasonable time for audio to finish
-            # The model should have already said goodbye before calling end_call
-            await asyncio.sleep(timeout)
-            print(f"[RealtimeSession] Audio completion wait finished")
-        except Exception as e:
-            print(f"[RealtimeSession] Error waiting for audio completion: {e}")
+            await asyncio.wait_for(self.goodbye_complete.wait(), timeout)
+            logger.debug("[RealtimeSession] Audio completion wait finished")
+        except asyncio.TimeoutError:
+            logger.warning("[RealtimeSession] Audio completion wait timed out after %ss", timeout)
+        finally:
+            self.waiting_for_goodbye = False
+
+    def mark_played(self):
+        """Twilio played the audio up to our oldest outstanding mark."""
+        if self.mark_queue:
+            self.mark_queue.pop(0)
+        if not self.mark_queue:
+            self.goodbye_complete.set()
 
     async def send_audio(self, audio_base64: str):
         """
-        Send audio input to OpenAI.
+        Queue audio input for OpenAI. Returns without waiting on the upstream
+        socket, so a slow send never stalls the caller's media reads.
 
         Args:
-            audio_base64: Base64-encoded PCM16 audio (24kHz)
+            audio_base64: Base64-encoded μ-law audio (8kHz)
         """
         if not self.ws or not self.running:
             return
 
-        event = {
-            "type": "input_audio_buffer.append",
-            "audio": audio_base64
-        }
+        if self._pending_audio_size >= AUDIO_BACKLOG_MAX:
+            # Log the start of a stall once; _flush_audio reports the total
+            if not self._dropped_audio_frames:
+                logger.warning("[RealtimeSession] Upstream backlog full, dropping caller audio")
+            self._dropped_audio_frames += 1
+            return
 
-        await self.send_event(event)
+        self._pending_audio.append(audio_base64)
+        self._pending_audio_size += len(audio_base64) * 3 // 4
+        self._audio_ready.set()
+
+    async def _flush_audio(self):
+        """Send queued caller audio, one append per send with everything queued meanwhile."""
+        while self.running:
+            await self._audio_ready.wait()
+            self._audio_ready.clear()
+            if not self._pending_audio:
+                continue
+
+            audio = _concat_b64(self._pending_audio)
+            self._pending_audio = []
+            self._pending_audio_size = 0
+            if self._dropped_audio_frames:
+                logger.warning(
+                    "[RealtimeSession] Upstream caught up; dropped %s caller audio frames",
+                    self._dropped_audio_frames,
+                )
+                self._dropped_audio_frames = 0
+            await self.send_event({
+                "type": "input_audio_buffer.append",
+                "audio": audio
+            })
 
     async def send_event(self, event: Dict[str, Any]):
         """Send a client event to OpenAI Realtime API."""
+        # orjson encodes in C; decode so the event still goes out as a text frame
+        await self._send_text(orjson.dumps(event).decode())
+
+    async def send_events(self, events: List[Dict[str, Any]]):
+        """
+        Send several client events back to back. Everything is encoded before
+        the first send, and a failed send skips the rest, so e.g. a
+        response.create never goes out without the item it responds to.
+        """
+        await self._send_text(*(orjson.dumps(event).decode() for event in events))
+
+    async def _send_text(self, *texts: str):
+        """Send already-encoded client events, one frame each, in order."""
         if not self.ws:
             return
 
         try:
-            await self.ws.send(json.dumps(event))
+            for text in texts:
+                await self.ws.send(text)
         except Exception as e:
-            print(f"[RealtimeSession] Error sending event: {e}")
+            logger.error("[RealtimeSession] Error sending event: %s", e)
             if self.on_error:
                 await self.on_error(str(e))
 
@@ -516,14 +737,28 @@ Sample clarification phrases:
             return
 
         try:
-            async for message in self.ws:
-                event = json.loads(message)
+            while True:
+                # Frames stay bytes: orjson parses UTF-8 directly, so decoding
+                # the whole frame to str first would be a wasted pass
+                message = await self.ws.recv(decode=False)
+                # Audio deltas are most of the inbound traffic and only need two
+                # fields, so pull them out without parsing the whole event
+                if message.startswith(_AUDIO_DELTA_PREFIX):
+                    delta = _AUDIO_DELTA_RE.search(message)
+                    item_id = _ITEM_ID_RE.search(message)
+                    if delta and item_id:
+                        await self._on_audio_delta({
+                            "delta": delta.group(1).decode(),
+                            "item_id": item_id.group(1).decode(),
+                        })
+                        continue
+                event = orjson.loads(message)
                 await self._handle_event(event)
         except websockets.exceptions.ConnectionClosed:
-            print(f"[RealtimeSession] Connection closed for conversation {self.conversation_id}")
+            logger.info("[RealtimeSession] Connection closed for conversation %s", self.conversation_id)
             self.running = False
         except Exception as e:
-            print(f"[RealtimeSession] Error in event loop: {e}")
+            logger.error("[RealtimeSession] Error in event loop: %s", e)
             if self.on_error:
                 await self.on_error(str(e))
             self.running = False
@@ -532,91 +767,114 @@ Sample clarification phrases:
         """Handle server events from OpenAI."""
         event_type = event.get("type")
 
-        # Debug: log transcription-related events
-        if "transcription" in event_type.lower() if event_type else False:
-            print(f"[DEBUG] Transcription event: {event_type} - {event}")
-
-        # Audio output from AI
-        if event_type == "response.output_audio.delta":
-            audio_base64 = event.get("delta")
-            if audio_base64 and self.on_audio:
-                await self.on_audio(audio_base64)
-
-            # Track the assistant item for interrupt/truncation
-            item_id = event.get("item_id")
-            if item_id:
-                self.last_assistant_item = item_id
-                if self.response_start_timestamp is None:
-                    self.response_start_timestamp = self.latest_media_timestamp
-
-                # Send a mark to Twilio so we can track playback position
-                if self.on_mark:
-                    self.mark_queue.append("responsePart")
-                    await self.on_mark()
-
-        # User started speaking - handle interrupt
-        elif event_type == "input_audio_buffer.speech_started":
-            await self._handle_speech_started()
-
-        # User speech transcript
-        elif event_type == "conversation.item.input_audio_transcription.completed":
-            transcript = event.get("transcript", "")
-            if transcript:
-                print(f"[User]: {transcript}")
-                await self._save_message('user', transcript)
-
-        # Agent speech transcript (accumulate deltas)
-        elif event_type == "response.output_audio_transcript.delta":
-            delta = event.get("delta", "")
-            self.current_agent_transcript += delta
-
-        # Agent speech transcript completed
-        elif event_type == "response.output_audio_transcript.done":
-            transcript = event.get("transcript") or self.current_agent_transcript
-            if transcript:
-                print(f"[Agent]: {transcript}")
-                await self._save_message('agent', transcript)
-            self.current_agent_transcript = ""
-
-        # Function call requested
-        elif event_type == "response.output_item.done":
-            item = event.get("item", {})
-            if item.get("type") == "function_call":
-                await self._handle_function_call(item)
-
-        # Session created confirmation
-        elif event_type == "session.created":
-            print(f"[RealtimeSession] Session created: {event.get('session', {}).get('id')}")
-
-        # Session updated confirmation
-        elif event_type == "session.updated":
-            session = event.get("session", {})
-            tools = session.get("tools", [])
-            audio_cfg = session.get("audio", {})
-            turn_detection = audio_cfg.get("input", {}).get("turn_detection", {})
-            noise_reduction = audio_cfg.get("input", {}).get("noise_reduction", {})
-            print(f"[RealtimeSession] Session updated - tools: {[t.get('name') for t in tools]}, turn_detection: {turn_detection.get('type')}, noise_reduction: {noise_reduction.get('type') if noise_reduction else 'off'}")
-
-        # Error handling
-        elif event_type == "error":
-            error_obj = event.get("error", {})
-            error_msg = error_obj.get("message", "Unknown error")
-            error_code = error_obj.get("code", "unknown")
-            # Truncation overshoot is expected and harmless — suppress noise
-            if "already shorter than" in error_msg:
-                print(f"[RealtimeSession] Truncation overshoot (harmless): {error_msg}")
-                return
-
-            # (g711_ulaw fallback removed — GA API only supports audio/pcm)
-
-            print(f"[RealtimeSession] ERROR [{error_code}]: {error_msg}")
-            print(f"[RealtimeSession] Full error: {error_obj}")
-            if self.on_error:
-                await self.on_error(error_msg)
+        # Debug: log transcription-related events (formatted only when enabled)
+        if event_type and "transcription" in event_type:
+            logger.debug("Transcription event: %s - %s", event_type, event)
+
+        handler = self._EVENT_HANDLERS.get(event_type)
+        if handler:
+            await handler(self, event)
+
+    async def _on_audio_delta(self, event: Dict[str, Any]):
+        """Audio output from AI."""
+        audio_base64 = event.get("delta")
+        if audio_base64 and self.on_audio:
+            await self.on_audio(audio_base64)
+
+        # Track the assistant item for interrupt/truncation
+        item_id = event.get("item_id")
+        if item_id:
+            self.last_assistant_item = item_id
+            if self.response_start_timestamp is None:
+                self.response_start_timestamp = self.latest_media_timestamp
+
+            # Send a mark to Twilio so we can track playback position
+            if self.on_mark:
+                self.mark_queue.append("responsePart")
+                await self.on_mark()
+
+    async def _on_speech_started(self, event: Dict[str, Any]):
+        """User started speaking - handle interrupt."""
+        await self._handle_speech_started()
+
+    async def _on_user_transcript(self, event: Dict[str, Any]):
+        """User speech transcript."""
+        # Noise-only turns transcribe to whitespace; don't store those
+        transcript = (event.get("transcript") or "").strip()
+        if transcript:
+            logger.info("[User]: %s", transcript)
+            self._save_message('user', transcript)
+
+    async def _on_agent_transcript_delta(self, event: Dict[str, Any]):
+        """Agent speech transcript (accumulate deltas)."""
+        self.current_agent_transcript.append(event.get("delta", ""))
+
+    async def _on_agent_transcript_done(self, event: Dict[str, Any]):
+        """Agent speech transcript completed."""
+        transcript = (event.get("transcript") or "".join(self.current_agent_transcript)).strip()
+        if transcript:
+            logger.info("[Agent]: %s", transcript)
+            self._save_message('agent', transcript)
+        self.current_agent_transcript.clear()
+
+    async def _on_output_item_done(self, event: Dict[str, Any]):
+        """Function call requested."""
+        item = event.get("item", {})
+        if item.get("type") == "function_call":
+            await self._handle_function_call(item)
+
+    async def _on_session_created(self, event: Dict[str, Any]):
+        """Session created confirmation."""
+        logger.info("[RealtimeSession] Session created: %s", event.get("session", {}).get("id"))
+
+    async def _on_session_updated(self, event: Dict[str, Any]):
+        """Session updated confirmation."""
+        session = event.get("session", {})
+        tools = session.get("tools", [])
+        audio_cfg = session.get("audio", {})
+        turn_detection = audio_cfg.get("input", {}).get("turn_detection", {})
+        noise_reduction = audio_cfg.get("input", {}).get("noise_reduction", {})
+        logger.info(
+            "[RealtimeSession] Session updated - tools: %s, turn_detection: %s, noise_reduction: %s",
+            [t.get("name") for t in tools],
+            turn_detection.get("type"),
+            noise_reduction.get("type") if noise_reduction else "off",
+        )
+
+    async def _on_error(self, event: Dict[str, Any]):
+        """Error handling."""
+        error_obj = event.get("error", {})
+        error_msg = error_obj.get("message", "Unknown error")
+        error_code = error_obj.get("code", "unknown")
+        # Truncation overshoot is expected and harmless — suppress noise
+        if "already shorter than" in error_msg:
+            logger.debug("[RealtimeSession] Truncation overshoot (harmless): %s", error_msg)
+            return
+
+        # (g711_ulaw fallback removed — GA API only supports audio/pcm)
+
+        logger.error("[RealtimeSession] ERROR [%s]: %s", error_code, error_msg)
+        logger.debug("[RealtimeSession] Full error: %s", error_obj)
+        if self.on_error:
+            await self.on_error(error_msg)
+
+    # Realtime event type -> handler. Audio deltas are by far the most frequent
+    # event, so they come first; anything not listed is ignored.
+    _EVENT_HANDLERS = {
+        "response.output_audio.delta": _on_audio_delta,
+        "response.output_audio_transcript.delta": _on_agent_transcript_delta,
+        "input_audio_buffer.speech_started": _on_speech_started,
+        "conversation.item.input_audio_transcription.completed": _on_user_transcript,
+        "response.output_audio_transcript.done": _on_agent_transcript_done,
+        "response.output_item.done": _on_output_item_done,
+        "session.created": _on_session_created,
+        "session.updated": _on_session_updated,
+        "error": _on_error,
+    }
 
     async def _handle_speech_started(self):
         """Handle user speech interruption - truncate assistant audio and clear Twilio buffer."""
-        print(f"[RealtimeSession] User speech detected - interrupting")
+        logger.debug("[RealtimeSession] User speech detected - interrupting")
 
         if self.last_assistant_item and self.response_start_timestamp is not None:
             elapsed_ms = self.latest_media_timestamp - self.response_start_timestamp
@@ -634,7 +892,7 @@ Sample clarification phrases:
                 "audio_end_ms": elapsed_ms
             }
             await self.send_event(truncate_event)
-            print(f"[RealtimeSession] Sent truncate for item {self.last_assistant_item} at {elapsed_ms}ms")
+            logger.debug("[RealtimeSession] Sent truncate for item %s at %sms", self.last_assistant_item, elapsed_ms)
 
         # Clear Twilio's audio buffer so queued audio stops immediately
         if self.on_interrupt:
@@ -642,6 +900,7 @@ Sample clarification phrases:
 
         # Reset interrupt tracking state
         self.mark_queue.clear()
+        self.goodbye_complete.set()
         self.last_assistant_item = None
         self.response_start_timestamp = None
 
@@ -651,11 +910,11 @@ Sample clarification phrases:
         function_name = item.get("name")
         arguments_str = item.get("arguments", "{}")
 
-        print(f"[Function Call] {function_name} with args: {arguments_str}")
+        logger.info("[Function Call] %s with args: %s", function_name, arguments_str)
 
         try:
             # Parse arguments
-            args = json.loads(arguments_str)
+            args = orjson.loads(arguments_str)
 
             # Route to appropriate function handler
             if function_name == "search_knowledge_base":
@@ -665,7 +924,7 @@ Sample clarification phrases:
 
             elif function_name == "search_web":
                 query = args.get("query", "")
-                print(f"[RT Function] Web search: {query}", flush=True)
+                logger.info("[RT Function] Web search: %s", query)
                 result = await search_web(query, max_results=5, search_depth="basic")
 
             elif function_name == "end_call":
@@ -688,25 +947,25 @@ Sample clarification phrases:
                 "item": {
                     "type": "function_call_output",
                     "call_id": call_id,
-                    "output": json.dumps(result)
+                    "output": orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS).decode()
                 }
             }
 
-            await self.send_event(response_event)
-
-            # Trigger response generation (unless call ended)
+            # Trigger response generation right behind it (unless call ended)
             if function_name != "end_call":
-                await self.send_event({"type": "response.create"})
+                await self.send_events([response_event, {"type": "response.create"}])
+            else:
+                await self.send_event(response_event)
 
         except Exception as e:
-            print(f"[Function Call] Error: {e}")
+            logger.error("[Function Call] Error: %s", e)
             # Send error as function output
             error_event = {
                 "type": "conversation.item.create",
                 "item": {
                     "type": "function_call_output",
                     "call_id": call_id,
-                    "output": json.dumps({"error": str(e)})
+                    "output": orjson.dumps({"error": str(e)}).decode()
                 }
             }
             await self.send_event(error_event)
@@ -715,10 +974,12 @@ Sample clarification phrases:
         """Execute semantic search in RAG knowledge base."""
         try:
             db = get_service_client()
-            ai = OpenAI(api_key=self.api_key)
+            ai = _get_ai_client()
 
-            # Use existing semantic_search function
-            matches = semantic_search(
+            # Use existing semantic_search function; its embedding request and
+            # RPC are blocking, so run it in a worker thread
+            matches = await asyncio.to_thread(
+                semantic_search,
                 sb=db,
                 ai=ai,
                 agent_id=self.agent_id,
@@ -734,14 +995,15 @@ Sample clarification phrases:
                 }
 
             # Format results
-            results = []
-            for match in matches:
-                results.append({
+            results = [
+                {
                     "text": match.get("chunk_text", ""),
                     "similarity": match.get("score", 0.0),  # 'score' not 'similairty'
                     "filename": match.get("filename", ""),
                     "chunk_id": match.get("chunk_id"),
-                })
+                }
+                for match in matches
+            ]
 
             return {
                 "found": True,
@@ -750,7 +1012,7 @@ Sample clarification phrases:
             }
 
         except Exception as e:
-            print(f"[RAG Search] Error: {e}")
+            logger.error("[RAG Search] Error: %s", e)
             return {
                 "found": False,
                 "error": str(e)
@@ -759,7 +1021,7 @@ Sample clarification phrases:
     async def _execute_end_call(self, reason: str = "Conversation completed") -> Dict[str, Any]:
         """End the current phone call gracefully."""
         try:
-            print(f"[EndCall] Ending call. Reason: {reason}")
+            logger.info("[EndCall] Ending call. Reason: %s", reason)
 
             # The model should have already said goodbye before calling this function
             # Wait for any audio to finish playing
@@ -769,15 +1031,19 @@ Sample clarification phrases:
             if self.twilio_ws:
                 await self.twilio_ws.close(code=1000, reason="Call ended by agent")
 
-            # Update conversation status
+            # Update conversation status (in a worker thread, while the
+            # OpenAI Realtime session disconnects)
             db = get_service_client()
-            db.table('conversation').update({
-                'status': 'completed',
-                'ended_at': 'now()'
-            }).eq('id', self.conversation_id).execute()
+            status_update = asyncio.create_task(asyncio.to_thread(
+                db.table('conversation').update({
+                    'status': 'completed',
+                    'ended_at': 'now()'
+                }).eq('id', self.conversation_id).execute
+            ))
 
             # Disconnect OpenAI Realtime session
             await self.disconnect()
+            await status_update
 
             return {
                 "success": True,
@@ -785,7 +1051,7 @@ Sample clarification phrases:
             }
 
         except Exception as e:
-            print(f"[EndCall] Error: {e}")
+            logger.error("[EndCall] Error: %s", e)
             return {
                 "success": False,
                 "error": str(e)
@@ -808,11 +1074,11 @@ Sample clarification phrases:
                 from api.crud.integrations import check_availability
                 result = await check_availability(business_id, time_min, time_max)
 
-            print(f"[Calendar] check_calendar for {date_str}: {result.get('count', 0)} busy slots")
+            logger.info("[Calendar] check_calendar for %s: %s busy slots", date_str, result.get("count", 0))
             return result
 
         except Exception as e:
-            print(f"[Calendar] Error checking calendar: {e}")
+            logger.error("[Calendar] Error checking calendar: %s", e)
             return {"error": str(e)}
 
     async def _execute_create_calendar_event(self, args: Dict[str, Any]) -> Dict[str, Any]:
@@ -854,7 +1120,7 @@ Sample clarification phrases:
                     end_hour = end_total_min // 60
                     end_min = end_total_min % 60
                     end_time = f"{end_hour:02d}:{end_min:02d}"
-                    print(f"[Calendar] Applied default duration {default_duration}min: end_time={end_time}")
+                    logger.info("[Calendar] Applied default duration %smin: end_time=%s", default_duration, end_time)
 
             # Validate business hours
             if start_time < biz_start or end_time > biz_end:
@@ -897,31 +1163,45 @@ Sample clarification phrases:
                 end_datetime=end_dt,
                 description=description,
             )
-            print(f"[Calendar] create_calendar_event: {summary} on {date} {start_time}-{end_time}")
+            logger.info("[Calendar] create_calendar_event: %s on %s %s-%s", summary, date, start_time, end_time)
             return result
 
         except Exception as e:
-            print(f"[Calendar] Error creating event: {e}")
+            logger.error("[Calendar] Error creating event: %s", e)
             return {"error": str(e)}
 
-    async def _save_message(self, role: str, content: str):
-        """Save message to database."""
-        try:
-            db = get_service_client()
-            db.table('message').insert({
-                'conversation_id': self.conversation_id,
-                'role': role,
-                'content': content
-            }).execute()
-        except Exception as e:
-            print(f"[RealtimeSession] Error saving message: {e}")
+    def _save_message(self, role: str, content: str):
+        """Save message to database in the background so audio relay isn't held up."""
+        self._pending_rows.append({
+            'conversation_id': self.conversation_id,
+            'role': role,
+            'content': content
+        })
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._write_messages())
+
+    async def _write_messages(self):
+        # A single writer keeps rows in transcript order; rows queued while an
+        # insert is in flight go out together in the next one
+        while self._pending_rows:
+            rows, self._pending_rows = self._pending_rows, []
+            try:
+                db = get_service_client()
+                await asyncio.to_thread(db.table('message').insert(rows).execute)
+            except Exception as e:
+                logger.error("[RealtimeSession] Error saving messages: %s", e)
 
     async def disconnect(self):
         """Disconnect from OpenAI Realtime API."""
         self.running = False
+        if self._audio_task:
+            self._audio_task.cancel()
         if self.ws:
             await self.ws.close()
-            print(f"[RealtimeSession] Disconnected for conversation {self.conversation_id}")
+            logger.info("[RealtimeSession] Disconnected for conversation %s", self.conversation_id)
+        # Let queued transcript rows land before the session goes away
+        if self._save_task:
+            await asyncio.gather(self._save_task, return_exceptions=True)
 
     async def interrupt(self):
         """Manually interrupt the agent's response."""
@@ -932,7 +1212,7 @@ Sample clarification phrases:
             "type": "response.cancel"
         }
         await self.send_event(event)
-        print("[RealtimeSession] Response interrupted")
+        logger.info("[RealtimeSession] Response interrupted")
 
 if __name__ == "__main__":
     print("Success YAYYY! :D")
@@ -0,0 +1,62 @@
+# api/ttl_cache.py
+"""
+Small bounded in-process cache for the lookups the call path repeats.
+
+Entries expire ttl seconds after they are stored (never, when ttl is None).
+Once maxsize entries are held, storing a new key evicts the oldest one.
+Pass lock=True for caches that worker threads (asyncio.to_thread) touch.
+"""
+
+import time
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """Bounded FIFO cache with optional expiry and optional locking."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, lock: bool = False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (monotonic time stored, value); dicts keep insertion order,
+        # so the first key is always the oldest entry
+        self._data: dict = {}
+        self._lock = threading.Lock() if lock else nullcontext()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default on miss/expiry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if self.ttl is not None and time.monotonic() - entry[0] >= self.ttl:
+                del self._data[key]
+                return default
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            # Re-storing a key moves it to the back of the eviction order
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic(), value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key matches predicate."""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,40 @@
+# api/twilio_client.py
+"""
+Process-wide Twilio REST client.
+
+Building a Client per request also built a fresh requests session, so every
+provision / release / transfer paid a new TCP+TLS handshake to api.twilio.com.
+One shared client keeps those connections alive between requests.
+"""
+
+import os
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+
+TWILIO_SID = os.getenv("TWILIO_ACCOUNT_SID") or os.getenv("ACCOUNT_SID")
+TWILIO_TOKEN = os.getenv("TWILIO_AUTH_TOKEN") or os.getenv("AUTH_TOKEN")
+
+_twilio_client: Client = None
+# Twilio calls run in worker threads too; don't build two clients on a race
+_twilio_client_lock = threading.Lock()
+
+
+def get_twilio_client() -> Client:
+    """Return the shared Twilio client, creating it on first use."""
+    global _twilio_client
+    if _twilio_client is None:
+        with _twilio_client_lock:
+            if _twilio_client is None:
+                http_client = TwilioHttpClient(pool_connections=True)
+                # Keep enough sockets for concurrent worker-thread calls, and
+                # retry only connection failures / idempotent reads (urllib3
+                # never re-sends a POST that reached Twilio)
+                http_client.session.mount("https://", HTTPAdapter(
+                    pool_maxsize=50,
+                    max_retries=Retry(total=3, backoff_factor=0.2),
+                ))
+                _twilio_client = Client(TWILIO_SID, TWILIO_TOKEN, http_client=http_client)
+    return _twilio_client
@@ -9,6 +9,17 @@ import httpx
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "")
 TAVILY_SEARCH_URL = "https://api.tavily.com/search"
 
+# Shared keep-alive client: searches run mid-call, so skip a fresh TLS handshake each time
+_http = httpx.AsyncClient(
+    http2=True,
+    timeout=10.0,
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+)
+
+
+async def close_client():
+    await _http.aclose()
+
 
 async def search_web(query: str, max_results: int = 5, search_depth: str = "basic") -> dict:
     """
@@ -35,10 +46,9 @@ async def search_web(query: str, max_results: int = 5, search_depth: str = "basi
     }
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(TAVILY_SEARCH_URL, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await _http.post(TAVILY_SEARCH_URL, json=payload)
+        resp.raise_for_status()
+        data = resp.json()
 
         answer = data.get("answer", "")
         results = data.get("results", [])
@@ -0,0 +1,24 @@
+-- End-of-call write for SIP conversations.
+-- Inserts any transcript rows still buffered in the API and marks the
+-- conversation completed in one transaction, so call teardown is a single
+-- round-trip and the final messages never land after the completion marker.
+
+CREATE OR REPLACE FUNCTION public.finalize_conversation(
+    p_conv_id INT, -- conversation being closed
+    p_messages JSONB DEFAULT '[]'::jsonb -- array of {"role": ..., "content": ...} in conversation order
+)
+RETURNS VOID
+LANGUAGE plpgsql as
+$$
+BEGIN
+    INSERT INTO public.message (conversation_id, role, content)
+    SELECT p_conv_id, m.value->>'role', m.value->>'content'
+    FROM jsonb_array_elements(p_messages) WITH ORDINALITY AS m(value, ord)
+    ORDER BY m.ord;
+
+    UPDATE public.conversation
+    SET status = 'completed',
+        ended_at = now()
+    WHERE id = p_conv_id;
+END;
+$$;
@@ -0,0 +1,5 @@
+-- Transcript reads (conversation detail, messages list, call resolution) all
+-- filter message by conversation_id and order by created_at. A composite
+-- index serves both the filter and the sort without a separate sort step.
+
+CREATE INDEX IF NOT EXISTS ix_message_conversation_created ON public.message(conversation_id, created_at);
@@ -0,0 +1,27 @@
+-- Migration: Canonicalize stored phone numbers to E.164
+--
+-- Inbound SIP lookups now normalize the dialed number to E.164 and match it
+-- with a single equality probe, so stored numbers must be E.164 as well.
+-- Numbers bought through Twilio already are; this fixes up any legacy US rows
+-- saved as 10 bare digits, or 11 digits with the leading country code 1.
+-- Anything else is left as-is and listed by the query at the end.
+
+UPDATE public.phone_number
+SET phone_number = '+1' || RIGHT(REGEXP_REPLACE(phone_number, '\D', '', 'g'), 10)
+WHERE phone_number !~ '^\+'
+AND (
+    LENGTH(REGEXP_REPLACE(phone_number, '\D', '', 'g')) = 10
+    OR (
+        LENGTH(REGEXP_REPLACE(phone_number, '\D', '', 'g')) = 11
+        AND REGEXP_REPLACE(phone_number, '\D', '', 'g') LIKE '1%'
+    )
+);
+
+CREATE INDEX IF NOT EXISTS ix_phone_number_phone_number ON public.phone_number(phone_number);
+
+-- Rows still not in E.164 (e.g. non-US numbers stored without a '+'); these
+-- need fixing by hand, since guessing a country code could point an agent at
+-- someone else's number
+SELECT id, agent_id, phone_number
+FROM public.phone_number
+WHERE phone_number !~ '^\+';
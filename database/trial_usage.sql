@@ -0,0 +1,30 @@
+-- Trial usage check for inbound calls.
+-- Returns whether the agent's business has an active/trialing subscription and
+-- how many seconds of completed calls the agent has used, in one round-trip,
+-- so call setup doesn't have to pull every conversation row to sum in Python.
+
+CREATE INDEX IF NOT EXISTS ix_conversation_agent_ended ON public.conversation(agent_id) WHERE ended_at IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION public.agent_trial_usage(
+    p_agent_id INT, -- agent receiving the call
+    p_business_id INT -- business that owns the agent (subscriptions are per business)
+)
+RETURNS TABLE (
+    has_subscription BOOLEAN,
+    used_seconds DOUBLE PRECISION
+)
+LANGUAGE sql STABLE as
+$$
+    SELECT
+        EXISTS (
+            SELECT 1 FROM public.subscription s
+            WHERE s.business_id = p_business_id
+            AND s.status IN ('active', 'trialing')
+        ) AS has_subscription,
+        COALESCE((
+            SELECT SUM(EXTRACT(EPOCH FROM (c.ended_at - c.started_at)))
+            FROM public.conversation c
+            WHERE c.agent_id = p_agent_id
+            AND c.ended_at IS NOT NULL
+        ), 0)::DOUBLE PRECISION AS used_seconds
+$$;
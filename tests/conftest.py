@@ -87,6 +87,15 @@ class MockSupabaseClient:
         self._tables[name] = data
 
 
+@pytest.fixture(autouse=True)
+def _clear_agent_cache():
+    """Agent rows are cached in-process; keep them from leaking between tests."""
+    from api.agent_cache import clear_agent_cache
+    clear_agent_cache()
+    yield
+    clear_agent_cache()
+
+
 @pytest.fixture()
 def mock_db():
     """Return a fresh MockSupabaseClient and patch get_service_client."""
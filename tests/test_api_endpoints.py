@@ -19,6 +19,21 @@ class TestHealthCheck:
         assert "version" in resp.json()
 
 
+class TestDocsAccess:
+
+    def test_docs_blocked_on_production_host(self, client):
+        resp = client.get("/openapi.json", headers={"host": "api.helloml.app"})
+        assert resp.status_code == 404
+
+    def test_docs_allowed_on_dev_host(self, client):
+        resp = client.get("/openapi.json", headers={"host": "localhost:8000"})
+        assert resp.status_code == 200
+
+    def test_non_docs_path_passes_through(self, client):
+        resp = client.get("/", headers={"host": "api.helloml.app"})
+        assert resp.status_code == 200
+
+
 class TestAuthFlow:
 
     def test_missing_auth_returns_403(self, client):
@@ -178,3 +193,83 @@ class TestAgentCRUD:
         resp = client.put("/agent/42", json={},
                           headers={"Authorization": "Bearer fake-jwt-token"})
         assert resp.status_code == 400
+
+
+class TestAvailableNumberPool:
+
+    def _client(self, numbers):
+        client = MagicMock()
+        client.available_phone_numbers.return_value.local.list.return_value = [
+            MagicMock(phone_number=n) for n in numbers
+        ]
+        return client
+
+    def _provision(self, client, twilio):
+        from tests.conftest import MockSupabaseClient
+        with patch("api.crud.phone.get_twilio_client", return_value=twilio), \
+             patch("api.crud.phone.get_service_client", return_value=MockSupabaseClient()):
+            return client.post("/phone/provision", json={"agent_id": 42, "area_code": "555"},
+                               headers={"Authorization": "Bearer fake-jwt-token"})
+
+    def test_reuses_leftover_numbers_before_searching_again(self, client, mock_auth):
+        from api.crud import phone
+
+        user, db = mock_auth
+        db.set_table_data("agent", [{"id": 42, "status": "active"}])
+        phone._available_numbers.clear()
+        twilio = self._client(["+15550000001", "+15550000002"])
+        twilio.incoming_phone_numbers.create.side_effect = lambda phone_number, **kw: MagicMock(phone_number=phone_number)
+
+        first = self._provision(client, twilio)
+        second = self._provision(client, twilio)
+
+        assert first.json()["phone_number"] == "+15550000001"
+        assert second.json()["phone_number"] == "+15550000002"
+        assert twilio.available_phone_numbers.return_value.local.list.call_count == 1
+
+    def test_no_numbers_returns_404(self, client, mock_auth):
+        from api.crud import phone
+
+        user, db = mock_auth
+        db.set_table_data("agent", [{"id": 42, "status": "active"}])
+        phone._available_numbers.clear()
+        twilio = self._client([])
+
+        resp = self._provision(client, twilio)
+
+        assert resp.status_code == 404
+        twilio.incoming_phone_numbers.create.assert_not_called()
+
+    def test_taken_leftover_retries_with_fresh_search(self, client, mock_auth):
+        import time
+        from api.crud import phone
+
+        user, db = mock_auth
+        db.set_table_data("agent", [{"id": 42, "status": "active"}])
+        phone._available_numbers.clear()
+        phone._available_numbers["555"] = (time.monotonic(), ["+15550000002"])
+
+        twilio = self._client(["+15550000009"])
+        twilio.incoming_phone_numbers.create.side_effect = [
+            Exception("number no longer available"),
+            MagicMock(phone_number="+15550000009"),
+        ]
+
+        resp = self._provision(client, twilio)
+
+        assert resp.status_code == 200
+        assert resp.json()["phone_number"] == "+15550000009"
+        purchased = [c.kwargs["phone_number"] for c in twilio.incoming_phone_numbers.create.call_args_list]
+        assert purchased == ["+15550000002", "+15550000009"]
+
+
+class TestProvisionPhoneValidation:
+
+    def test_malformed_area_code_rejected_before_lookup(self, client, mock_auth):
+        user, db = mock_auth
+        db.table = MagicMock()
+
+        resp = client.post("/phone/provision", json={"agent_id": 42, "area_code": "41"},
+                           headers={"Authorization": "Bearer fake-jwt-token"})
+        assert resp.status_code == 422
+        db.table.assert_not_called()
@@ -58,7 +58,8 @@ class TestVoiceWebhook:
 
         mock_db.table = _table
 
-        with patch("api.crud.realtime_voice.get_service_client", return_value=mock_db):
+        with patch("api.crud.realtime_voice.get_service_client", return_value=mock_db), \
+             patch("api.crud.realtime_voice.prewarm_realtime_socket") as prewarm:
             resp = client.post(
                 "/conversation/1/voice",
                 data={"From": "+15551234567"},
@@ -67,6 +68,8 @@ class TestVoiceWebhook:
             assert "application/xml" in resp.headers["content-type"]
             assert "<Stream" in resp.text
             assert "media-stream" in resp.text
+            assert '<Parameter name="conversation_id" value="77" />' in resp.text
+            prewarm.assert_called_once_with("gpt-realtime-1.5")
 
     def test_agent_not_found_returns_hangup(self, client):
         mock_db = MagicMock()
@@ -122,6 +125,41 @@ class TestVoiceWebhook:
             resp = client.post("/conversation/1/voice", data={"From": "+15551234567"})
             assert "free trial has ended" in resp.text.lower() or "trial" in resp.text.lower()
 
+    def test_agent_row_cached_between_lookups(self):
+        import asyncio
+        from api.crud.realtime_voice import _get_agent_config
+        from api.agent_cache import bust_agent_cache
+
+        mock_db = MagicMock()
+        qb = MagicMock()
+        qb.select.return_value = qb; qb.eq.return_value = qb; qb.single.return_value = qb
+        r = MagicMock(); r.data = {"id": 5, "greeting": "Hi"}; qb.execute.return_value = r
+        mock_db.table.return_value = qb
+
+        assert asyncio.run(_get_agent_config(mock_db, 5)) == {"id": 5, "greeting": "Hi"}
+        assert asyncio.run(_get_agent_config(mock_db, 5)) == {"id": 5, "greeting": "Hi"}
+        assert qb.execute.call_count == 1
+
+        asyncio.run(bust_agent_cache(5))
+        asyncio.run(_get_agent_config(mock_db, 5))
+        assert qb.execute.call_count == 2
+
+    def test_concurrent_misses_share_one_query(self):
+        import asyncio
+        from api.crud.realtime_voice import _get_agent_config
+
+        mock_db = MagicMock()
+        qb = MagicMock()
+        qb.select.return_value = qb; qb.eq.return_value = qb; qb.single.return_value = qb
+        r = MagicMock(); r.data = {"id": 6, "greeting": "Hi"}; qb.execute.return_value = r
+        mock_db.table.return_value = qb
+
+        async def burst():
+            return await asyncio.gather(*(_get_agent_config(mock_db, 6) for _ in range(5)))
+
+        assert asyncio.run(burst()) == [{"id": 6, "greeting": "Hi"}] * 5
+        assert qb.execute.call_count == 1
+
 
 # ---------------------------------------------------------------------------
 # μ-law format handling (audio passthrough)
@@ -139,3 +177,60 @@ class TestAudioPassthrough:
 
         assert twilio_to_openai_passthrough(b64) == b64
         assert openai_to_twilio_passthrough(b64) == b64
+
+    def test_concat_b64_matches_decoded_concatenation(self):
+        """Coalesced frames must decode to the frames' bytes in order."""
+        from api.realtime_manager import _concat_b64
+        import base64
+
+        for sizes in ([160, 160, 160], [159, 162, 7], [160]):
+            frames = [bytes([i]) * n for i, n in enumerate(sizes)]
+            chunks = [base64.b64encode(f).decode() for f in frames]
+            assert base64.b64decode(_concat_b64(chunks)) == b"".join(frames)
+
+
+# ---------------------------------------------------------------------------
+# Knowledge-base search cache
+# ---------------------------------------------------------------------------
+
+class TestSemanticSearchCache:
+
+    def test_repeat_query_skips_embedding_and_rpc(self):
+        from api import rag
+
+        sb = MagicMock()
+        sb.rpc.return_value.execute.return_value.data = [{"chunk_text": "Open 9-5", "score": 0.9}]
+        with patch.object(rag, "_embed_query", return_value=[0.0] * 1536) as embed:
+            first = rag.semantic_search(sb, None, 42, "What are your hours?")
+            again = rag.semantic_search(sb, None, 42, "  what are  your hours? ")
+            assert first == again == [{"chunk_text": "Open 9-5", "score": 0.9}]
+            assert embed.call_count == 1
+            assert sb.rpc.call_count == 1
+
+            rag.forget_agent_searches(42)
+            rag.semantic_search(sb, None, 42, "What are your hours?")
+            assert sb.rpc.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# Ending the call
+# ---------------------------------------------------------------------------
+
+class TestEndCallPlayback:
+
+    def test_wait_ends_when_twilio_returns_last_mark(self):
+        import asyncio
+        from api.realtime_manager import RealtimeSession
+
+        async def scenario():
+            session = RealtimeSession(agent_id=1, conversation_id=1, agent_config={})
+            session.mark_queue = ["responsePart", "responsePart"]
+            waiter = asyncio.create_task(session._wait_for_audio_completion(timeout=5.0))
+            await asyncio.sleep(0)
+            session.mark_played()
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            session.mark_played()
+            await asyncio.wait_for(waiter, timeout=1.0)
+
+        asyncio.run(scenario())
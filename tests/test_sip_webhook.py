@@ -14,16 +14,17 @@ from fastapi.testclient import TestClient
 
 def _make_sip_event(call_id="call_abc123", from_header="sip:+15551234567@sip.twilio.com",
                     to_header="sip:+18005551212@sip.openai.com", event_type="realtime.call.incoming"):
-    """Build a mock webhook event object."""
-    ev = MagicMock()
-    ev.type = event_type
-    ev.data = MagicMock()
-    ev.data.call_id = call_id
-
-    from_h = MagicMock(); from_h.name = "From"; from_h.value = from_header
-    to_h = MagicMock(); to_h.name = "To"; to_h.value = to_header
-    ev.data.sip_headers = [from_h, to_h]
-    return ev
+    """Build a parsed webhook event payload."""
+    return {
+        "type": event_type,
+        "data": {
+            "call_id": call_id,
+            "sip_headers": [
+                {"name": "From", "value": from_header},
+                {"name": "To", "value": to_header},
+            ],
+        },
+    }
 
 
 AGENT_ROW = {
@@ -46,12 +47,10 @@ class TestWebhookSignature:
 
     def test_invalid_signature_returns_400(self, client, mock_db):
         """Invalid webhook signature should return 400."""
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get:
-            oc = MagicMock()
-            oc.webhooks.unwrap.side_effect = __import__(
+        with patch("api.crud.sip_voice._verify_webhook") as mock_verify:
+            mock_verify.side_effect = __import__(
                 "openai", fromlist=["InvalidWebhookSignatureError"]
             ).InvalidWebhookSignatureError("bad sig")
-            mock_get.return_value = oc
 
             resp = client.post("/conversation/sip/webhook", content=b'{}',
                                headers={"Content-Type": "application/json"})
@@ -62,12 +61,9 @@ class TestWebhookSignature:
         """Valid signature with no matching agent should still return 200 (rejected)."""
         ev = _make_sip_event()
 
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get, \
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
              patch("api.crud.sip_voice.get_service_client", return_value=mock_db), \
-             patch("api.crud.sip_voice.http_requests") as mock_http:
-            oc = MagicMock()
-            oc.webhooks.unwrap.return_value = ev
-            mock_get.return_value = oc
+             patch("api.crud.sip_voice._http", new_callable=AsyncMock) as mock_http:
 
             resp = client.post("/conversation/sip/webhook", content=b'{}',
                                headers={"Content-Type": "application/json"})
@@ -75,6 +71,51 @@ class TestWebhookSignature:
             assert resp.json()["status"] == "rejected"
 
 
+class TestVerifyWebhook:
+    """Signature check against real Standard Webhooks signatures."""
+
+    SECRET = "whsec_" + __import__("base64").b64encode(b"test-signing-key").decode()
+
+    @pytest.fixture(autouse=True)
+    def _secret(self, monkeypatch):
+        import api.crud.sip_voice as sip_voice
+        monkeypatch.setenv("OPENAI_WEBHOOK_SECRET", self.SECRET)
+        monkeypatch.setattr(sip_voice, "_webhook_secret", None)
+
+    def _headers(self, body, timestamp=None, key=b"test-signing-key"):
+        import base64, hashlib, hmac, time
+        ts = str(int(time.time()) if timestamp is None else timestamp)
+        sig = base64.b64encode(
+            hmac.new(key, b"evt_1." + ts.encode() + b"." + body, hashlib.sha256).digest()
+        ).decode()
+        return {"webhook-id": "evt_1", "webhook-timestamp": ts, "webhook-signature": f"v1,{sig}"}
+
+    def test_valid_signature_returns_event(self):
+        from api.crud.sip_voice import _verify_webhook
+        body = json.dumps(_make_sip_event()).encode()
+        event = _verify_webhook(body, self._headers(body))
+        assert event["data"]["call_id"] == "call_abc123"
+
+    def test_wrong_key_rejected(self):
+        from openai import InvalidWebhookSignatureError
+        from api.crud.sip_voice import _verify_webhook
+        body = b'{"type": "realtime.call.incoming"}'
+        with pytest.raises(InvalidWebhookSignatureError):
+            _verify_webhook(body, self._headers(body, key=b"other-key"))
+
+    def test_stale_timestamp_rejected(self):
+        import time
+        from openai import InvalidWebhookSignatureError
+        from api.crud.sip_voice import _verify_webhook
+        body = b'{"type": "realtime.call.incoming"}'
+        with pytest.raises(InvalidWebhookSignatureError):
+            _verify_webhook(body, self._headers(body, timestamp=int(time.time()) - 3600))
+
+    def test_missing_headers_return_400(self, client):
+        resp = client.post("/conversation/sip/webhook", content=b'{}')
+        assert resp.status_code == 400
+
+
 # ---------------------------------------------------------------------------
 # Phone number lookup
 # ---------------------------------------------------------------------------
@@ -104,52 +145,87 @@ class TestPhoneLookup:
         agent, phone = _lookup_agent_by_phone(db, "garbage")
         assert agent is None
 
-    def test_plus1_prefix_handling(self):
-        """Should try alternative formats when initial lookup fails."""
+    @pytest.mark.parametrize("to_header", [
+        "sip:+18005551212@sip.example.com",
+        "sip:18005551212@sip.example.com",
+        "sip:8005551212@sip.example.com",
+    ])
+    def test_plus1_prefix_handling(self, to_header):
+        """Any US format of the dialed number is matched as E.164 in a single query."""
         from api.crud.sip_voice import _lookup_agent_by_phone
 
         db = MagicMock()
-        call_count = {"n": 0}
+        qb = MagicMock()
+        qb.select.return_value = qb
+        qb.eq.return_value = qb
+        qb.limit.return_value = qb
+        resp = MagicMock()
+        resp.data = [{"agent_id": 42, "phone_number": "+18005551212", "agent": AGENT_ROW}]
+        qb.execute.return_value = resp
+        db.table.return_value = qb
+
+        agent, phone = _lookup_agent_by_phone(db, to_header)
+
+        assert agent == AGENT_ROW
+        assert phone == "+18005551212"
+        qb.execute.assert_called_once()
+        qb.eq.assert_called_once_with("phone_number", "+18005551212")
+
+
+# ---------------------------------------------------------------------------
+# Trial usage
+# ---------------------------------------------------------------------------
+
+class TestTrialCheck:
+
+    @pytest.fixture(autouse=True)
+    def _clear_sub_cache(self):
+        from api.crud.sip_voice import _sub_cache
+        _sub_cache.clear()
+        yield
+        _sub_cache.clear()
+
+    def _db_with_usage(self, row):
+        db = MagicMock()
+        resp = MagicMock(); resp.data = [row]
+        db.rpc.return_value.execute.return_value = resp
+        return db
 
-        def _mock_table(name):
-            qb = MagicMock()
-            qb.select.return_value = qb
-            qb.limit.return_value = qb
-            qb.single.return_value = qb
-
-            def _eq(col, val):
-                call_count["n"] += 1
-                qb2 = MagicMock()
-                qb2.select.return_value = qb2
-                qb2.limit.return_value = qb2
-                qb2.single.return_value = qb2
-                if call_count["n"] <= 1:
-                    # First lookup fails
-                    resp = MagicMock(); resp.data = []
-                    qb2.execute.return_value = resp
-                else:
-                    # Alt format succeeds
-                    resp = MagicMock(); resp.data = [{"agent_id": 42, "phone_number": "8005551212"}]
-                    qb2.execute.return_value = resp
-
-                    # Also set up agent lookup
-                    agent_qb = MagicMock()
-                    agent_qb.select.return_value = agent_qb
-                    agent_qb.eq.return_value = agent_qb
-                    agent_qb.single.return_value = agent_qb
-                    agent_resp = MagicMock(); agent_resp.data = AGENT_ROW
-                    agent_qb.execute.return_value = agent_resp
-
-                return qb2
-
-            qb.eq = _eq
-            return qb
+    def test_trial_exhausted_uses_single_rpc(self):
+        from api.crud.sip_voice import _check_trial_exhausted
+        db = self._db_with_usage({"has_subscription": False, "used_seconds": 360.0})
+
+        assert _check_trial_exhausted(db, AGENT_ROW) is True
+        db.rpc.assert_called_once_with(
+            "agent_trial_usage", {"p_agent_id": 42, "p_business_id": 10}
+        )
+        db.table.assert_not_called()
+
+    def test_subscription_skips_trial_limit(self):
+        from api.crud.sip_voice import _check_trial_exhausted
+        db = self._db_with_usage({"has_subscription": True, "used_seconds": 9999.0})
+        assert _check_trial_exhausted(db, AGENT_ROW) is False
+
+    def test_active_subscription_cached(self):
+        from api.crud.sip_voice import _check_trial_exhausted
+        db = self._db_with_usage({"has_subscription": True, "used_seconds": 0.0})
+
+        assert _check_trial_exhausted(db, AGENT_ROW) is False
+        assert _check_trial_exhausted(db, AGENT_ROW) is False
+        db.rpc.assert_called_once()
 
-        db.table = _mock_table
-        # This is hard to fully mock due to the chained queries; just verify it doesn't crash
-        # and calls table multiple times
-        _lookup_agent_by_phone(db, "sip:+18005551212@sip.example.com")
-        assert call_count["n"] >= 1
+    def test_trial_usage_not_cached(self):
+        from api.crud.sip_voice import _check_trial_exhausted
+        db = self._db_with_usage({"has_subscription": False, "used_seconds": 60.0})
+
+        _check_trial_exhausted(db, AGENT_ROW)
+        _check_trial_exhausted(db, AGENT_ROW)
+        assert db.rpc.call_count == 2
+
+    def test_under_trial_limit(self):
+        from api.crud.sip_voice import _check_trial_exhausted
+        db = self._db_with_usage({"has_subscription": False, "used_seconds": 120.0})
+        assert _check_trial_exhausted(db, AGENT_ROW) is False
 
 
 # ---------------------------------------------------------------------------
@@ -161,12 +237,9 @@ class TestCallAcceptReject:
     def test_no_agent_rejects_with_404(self, client, mock_db):
         ev = _make_sip_event()
 
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get, \
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
              patch("api.crud.sip_voice.get_service_client", return_value=mock_db), \
-             patch("api.crud.sip_voice.http_requests") as mock_http:
-            oc = MagicMock()
-            oc.webhooks.unwrap.return_value = ev
-            mock_get.return_value = oc
+             patch("api.crud.sip_voice._http", new_callable=AsyncMock) as mock_http:
 
             resp = client.post("/conversation/sip/webhook", content=b'{}')
             assert resp.json()["reason"] == "no agent"
@@ -178,14 +251,11 @@ class TestCallAcceptReject:
     def test_trial_exhausted_rejects_with_486(self, client):
         ev = _make_sip_event()
 
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get, \
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
              patch("api.crud.sip_voice._lookup_agent_by_phone", return_value=(AGENT_ROW, "+18005551212")), \
              patch("api.crud.sip_voice._check_trial_exhausted", return_value=True), \
              patch("api.crud.sip_voice.get_service_client") as mock_svc, \
-             patch("api.crud.sip_voice.http_requests") as mock_http:
-            oc = MagicMock()
-            oc.webhooks.unwrap.return_value = ev
-            mock_get.return_value = oc
+             patch("api.crud.sip_voice._http", new_callable=AsyncMock) as mock_http:
 
             resp = client.post("/conversation/sip/webhook", content=b'{}')
             assert resp.json()["reason"] == "trial exhausted"
@@ -214,25 +284,73 @@ class TestCallAcceptReject:
 
         mock_db_inst.table = _table
 
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get, \
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
              patch("api.crud.sip_voice._lookup_agent_by_phone", return_value=(AGENT_ROW, "+18005551212")), \
              patch("api.crud.sip_voice._check_trial_exhausted", return_value=False), \
              patch("api.crud.sip_voice.get_service_client", return_value=mock_db_inst), \
-             patch("api.crud.sip_voice.http_requests") as mock_http, \
-             patch("api.crud.sip_voice.threading"), \
+             patch("api.crud.sip_voice._http", new_callable=AsyncMock) as mock_http, \
+             patch("api.crud.sip_voice._websocket_monitor", new_callable=AsyncMock) as mock_monitor, \
              patch("api.crud.sip_voice._build_session_config", return_value={"model": "gpt-realtime-1.5"}):
-            oc = MagicMock()
-            oc.webhooks.unwrap.return_value = ev
-            mock_get.return_value = oc
-
             accept_resp = MagicMock()
             accept_resp.status_code = 200
             accept_resp.raise_for_status = MagicMock()
             mock_http.post.return_value = accept_resp
 
+            resp = client.post("/conversation/sip/webhook", content=b'{}')
+            assert resp.json()["status"] == "accepted"
+            # Monitor runs as a task on the server loop, not a separate thread
+            mock_monitor.assert_called_once()
+            assert mock_monitor.call_args[0][0] == "call_abc123"
+
+
+    def test_embedded_business_and_tools_used_for_session(self, client):
+        """Business info and tool connections come from the agent lookup embed."""
+        ev = _make_sip_event()
+        agent = {
+            **AGENT_ROW,
+            "business": {
+                "name": "Test Biz",
+                "tool_connection": [{"provider": "google-calendar", "settings": {"default_duration": 30}}],
+            },
+        }
+
+        mock_db_inst = MagicMock()
+        conv_resp = MagicMock(); conv_resp.data = [{"id": 99}]
+        mock_db_inst.table.return_value.insert.return_value.execute.return_value = conv_resp
+
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
+             patch("api.crud.sip_voice._lookup_agent_by_phone", return_value=(agent, "+18005551212")), \
+             patch("api.crud.sip_voice._check_trial_exhausted", return_value=False), \
+             patch("api.crud.sip_voice.get_service_client", return_value=mock_db_inst), \
+             patch("api.crud.sip_voice._http", new_callable=AsyncMock) as mock_http, \
+             patch("api.crud.sip_voice._websocket_monitor", new_callable=AsyncMock), \
+             patch("api.crud.sip_voice._build_session_config", return_value={}) as mock_build:
+            ar = MagicMock(); ar.status_code = 200; ar.raise_for_status = MagicMock()
+            mock_http.post.return_value = ar
+
             resp = client.post("/conversation/sip/webhook", content=b'{}')
             assert resp.json()["status"] == "accepted"
 
+            _, business_info, _, connected_tools, tool_settings = mock_build.call_args[0]
+            assert business_info == {"name": "Test Biz"}
+            assert connected_tools == ["google-calendar"]
+            assert tool_settings == {"google-calendar": {"default_duration": 30}}
+            mock_db_inst.table.assert_called_once_with("conversation")
+
+    def test_returns_503_when_accept_slots_exhausted(self, client):
+        import asyncio
+        ev = _make_sip_event()
+
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
+             patch("api.crud.sip_voice._ACCEPT_SEM", asyncio.Semaphore(0)), \
+             patch("api.crud.sip_voice.ACCEPT_QUEUE_TIMEOUT", 0.01), \
+             patch("api.crud.sip_voice._lookup_agent_by_phone") as mock_lookup:
+
+            resp = client.post("/conversation/sip/webhook", content=b'{}')
+            assert resp.status_code == 503
+            assert resp.json()["status"] == "busy"
+            mock_lookup.assert_not_called()
+
 
 # ---------------------------------------------------------------------------
 # Idempotency
@@ -261,16 +379,13 @@ class TestIdempotency:
 
         mock_db_inst.table = _table
 
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get, \
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
              patch("api.crud.sip_voice._lookup_agent_by_phone", return_value=(AGENT_ROW, "+18005551212")), \
              patch("api.crud.sip_voice._check_trial_exhausted", return_value=False), \
              patch("api.crud.sip_voice.get_service_client", return_value=mock_db_inst), \
-             patch("api.crud.sip_voice.http_requests") as mock_http, \
-             patch("api.crud.sip_voice.threading"), \
+             patch("api.crud.sip_voice._http", new_callable=AsyncMock) as mock_http, \
+             patch("api.crud.sip_voice._websocket_monitor", new_callable=AsyncMock), \
              patch("api.crud.sip_voice._build_session_config", return_value={"model": "gpt-realtime-1.5"}):
-            oc = MagicMock()
-            oc.webhooks.unwrap.return_value = ev
-            mock_get.return_value = oc
             ar = MagicMock(); ar.status_code = 200; ar.raise_for_status = MagicMock()
             mock_http.post.return_value = ar
 
@@ -320,6 +435,21 @@ class TestSessionConfig:
         assert "check_calendar" in tool_names
         assert "create_calendar_event" in tool_names
 
+    def test_encoded_session_config_matches_dict(self):
+        from api.crud.sip_voice import _build_session_config, _encode_session_config
+
+        config = _build_session_config(
+            agent_config={**AGENT_ROW, "forwarding_enabled": True, "forwarding_number": "+15550001111"},
+            business_info={"name": "Test Biz"},
+            agent_phone="+18005551212",
+            connected_tools=["google-calendar"],
+            tool_settings={},
+        )
+
+        decoded = json.loads(_encode_session_config(config))
+        assert decoded == config
+        assert [t["name"] for t in decoded["tools"]][-1] == "transfer_to_human"
+
 
 # ---------------------------------------------------------------------------
 # SIP header parsing
@@ -360,15 +490,12 @@ class TestSipHeaderParsing:
 
         mock_db_inst.table = _table
 
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get, \
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev), \
              patch("api.crud.sip_voice._lookup_agent_by_phone", return_value=(AGENT_ROW, "+18005551212")), \
              patch("api.crud.sip_voice._check_trial_exhausted", return_value=False), \
              patch("api.crud.sip_voice.get_service_client", return_value=mock_db_inst), \
-             patch("api.crud.sip_voice.http_requests") as mock_http, \
-             patch("api.crud.sip_voice.threading"):
-            oc = MagicMock()
-            oc.webhooks.unwrap.return_value = ev
-            mock_get.return_value = oc
+             patch("api.crud.sip_voice._http", new_callable=AsyncMock) as mock_http, \
+             patch("api.crud.sip_voice._websocket_monitor", new_callable=AsyncMock):
             ar = MagicMock(); ar.status_code = 200; ar.raise_for_status = MagicMock()
             mock_http.post.return_value = ar
 
@@ -378,10 +505,175 @@ class TestSipHeaderParsing:
     def test_non_incoming_event_ignored(self, client, mock_db):
         ev = _make_sip_event(event_type="realtime.call.ended")
 
-        with patch("api.crud.sip_voice._get_openai_client") as mock_get:
-            oc = MagicMock()
-            oc.webhooks.unwrap.return_value = ev
-            mock_get.return_value = oc
-
+        with patch("api.crud.sip_voice._verify_webhook", return_value=ev):
             resp = client.post("/conversation/sip/webhook", content=b'{}')
             assert resp.json()["status"] == "ignored"
+
+
+# ---------------------------------------------------------------------------
+# WebSocket monitor event handlers
+# ---------------------------------------------------------------------------
+
+class TestMonitorHandlers:
+
+    def _ctx(self, db):
+        from api.crud.sip_voice import _MonitorContext, _MessageBuffer
+        return _MonitorContext(
+            ws=AsyncMock(), db=db, call_id="call_abc123", conversation_id=99,
+            agent_id=42, business_id=10, connected_tools=[], tool_settings={},
+            agent_config=AGENT_ROW, business_info={}, agent_phone="+18005551212",
+            messages=_MessageBuffer(db, 99),
+        )
+
+    def test_transcript_deltas_saved_on_done(self):
+        import asyncio
+        from api.crud.sip_voice import _SIP_EVENT_HANDLERS
+
+        db = MagicMock()
+
+        async def _run():
+            ctx = self._ctx(db)
+            delta = _SIP_EVENT_HANDLERS["response.output_audio_transcript.delta"]
+            await delta(ctx, {"delta": "Hello "})
+            await delta(ctx, {"delta": "there"})
+            await _SIP_EVENT_HANDLERS["response.output_audio_transcript.done"](ctx, {})
+            await ctx.messages.close()
+            return ctx
+
+        ctx = asyncio.run(_run())
+
+        db.table.return_value.insert.assert_called_once_with(
+            [{"conversation_id": 99, "role": "agent", "content": "Hello there"}]
+        )
+        assert ctx.agent_transcript == []
+
+    def test_whitespace_transcript_not_saved(self):
+        import asyncio
+        from api.crud.sip_voice import _SIP_EVENT_HANDLERS
+
+        db = MagicMock()
+
+        async def _run():
+            ctx = self._ctx(db)
+            user = _SIP_EVENT_HANDLERS["conversation.item.input_audio_transcription.completed"]
+            await user(ctx, {"transcript": "  \n "})
+            return await ctx.messages.drain()
+
+        assert asyncio.run(_run()) == []
+        db.table.return_value.insert.assert_not_called()
+
+    def test_end_call_hangs_up_after_goodbye_plays(self):
+        import asyncio
+        from api.crud.sip_voice import _SIP_EVENT_HANDLERS, _hangup_when_played
+
+        db = MagicMock()
+        http = MagicMock()
+        http.post = AsyncMock()
+
+        async def _run():
+            ctx = self._ctx(db)
+            await _SIP_EVENT_HANDLERS["output_audio_buffer.started"](ctx, {})
+            hangup = asyncio.create_task(_hangup_when_played(ctx.call_id, ctx.playback_done))
+            await asyncio.sleep(0)
+            http.post.assert_not_called()
+            await _SIP_EVENT_HANDLERS["output_audio_buffer.stopped"](ctx, {})
+            await asyncio.wait_for(hangup, timeout=1.0)
+
+        with patch("api.crud.sip_voice._http", http):
+            asyncio.run(_run())
+
+        http.post.assert_awaited_once()
+        assert http.post.call_args[0][0] == "/v1/realtime/calls/call_abc123/hangup"
+
+    def test_transfer_redirects_call_to_dialed_number(self):
+        import asyncio
+        from api.crud.sip_voice import _SIP_EVENT_HANDLERS
+
+        db = MagicMock()
+        twilio = MagicMock()
+        twilio.calls.list.return_value = [MagicMock(sid="CA123")]
+        twilio.calls.return_value.update.return_value.status = "in-progress"
+        item = {
+            "type": "function_call",
+            "call_id": "fn_1",
+            "name": "transfer_to_human",
+            "arguments": '{"reason": "wants a person"}',
+        }
+
+        async def _run():
+            ctx = self._ctx(db)
+            ctx.agent_config = {**AGENT_ROW, "forwarding_number": "+15550001111"}
+            await _SIP_EVENT_HANDLERS["response.output_item.done"](ctx, {"item": item})
+            return ctx
+
+        with patch("api.crud.sip_voice.should_transfer", return_value=(True, "Transfer allowed")), \
+             patch("api.crud.sip_voice.get_twilio_client", return_value=twilio), \
+             patch("api.call_transfer.get_twilio_client", return_value=twilio):
+            ctx = asyncio.run(_run())
+
+        twilio.calls.list.assert_called_once_with(to="+18005551212", status="in-progress", limit=1)
+        twilio.calls.assert_called_once_with("CA123")
+        assert "<Dial>+15550001111</Dial>" in twilio.calls.return_value.update.call_args[1]["twiml"]
+        output = json.loads(json.loads(ctx.ws.send.call_args_list[0][0][0])["item"]["output"])
+        assert output["success"] is True
+
+    def test_message_buffer_batches_rows(self):
+        import asyncio
+        from api.crud.sip_voice import _MessageBuffer
+
+        db = MagicMock()
+
+        async def _run():
+            buf = _MessageBuffer(db, 99)
+            for i in range(_MessageBuffer.MAX_ROWS + 1):
+                await buf.add("user", f"line {i}")
+            # First MAX_ROWS rows flush together; the remainder waits for close()
+            assert db.table.return_value.insert.call_count == 1
+            await buf.close()
+
+        asyncio.run(_run())
+
+        batches = [c[0][0] for c in db.table.return_value.insert.call_args_list]
+        assert [len(b) for b in batches] == [_MessageBuffer.MAX_ROWS, 1]
+        assert batches[1][0]["content"] == f"line {_MessageBuffer.MAX_ROWS}"
+
+    def test_drain_returns_unwritten_rows(self):
+        import asyncio
+        from api.crud.sip_voice import _MessageBuffer
+
+        db = MagicMock()
+
+        async def _run():
+            buf = _MessageBuffer(db, 99)
+            await buf.add("user", "hi")
+            await buf.add("agent", "hello")
+            return await buf.drain()
+
+        pending = asyncio.run(_run())
+
+        assert pending == [{"role": "user", "content": "hi"}, {"role": "agent", "content": "hello"}]
+        db.table.return_value.insert.assert_not_called()
+
+    def test_unhandled_event_types_not_registered(self):
+        from api.crud.sip_voice import _SIP_EVENT_HANDLERS
+        assert "response.output_audio.delta" not in _SIP_EVENT_HANDLERS
+
+
+# ---------------------------------------------------------------------------
+# Calendar time handling
+# ---------------------------------------------------------------------------
+
+class TestMinuteOfDay:
+
+    def test_parses_single_digit_hours(self):
+        from api.crud.sip_voice import _minute_of_day
+        assert _minute_of_day("9:00") == 540
+        assert _minute_of_day("09:30") == 570
+        # String comparison would get this wrong ("9:00" > "10:00")
+        assert _minute_of_day("9:00") < _minute_of_day("10:00")
+
+    def test_malformed_returns_none(self):
+        from api.crud.sip_voice import _minute_of_day
+        assert _minute_of_day("") is None
+        assert _minute_of_day("noon") is None
+        assert _minute_of_day(None) is None
@@ -0,0 +1,48 @@
+"""
+Tests for the bounded in-process cache — api/ttl_cache.py
+"""
+
+from unittest.mock import patch
+
+from api.ttl_cache import TTLCache
+
+
+class TestTTLCache:
+
+    def test_oldest_entry_evicted_when_full(self):
+        cache = TTLCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        assert cache.get("a") is None
+        assert (cache.get("b"), cache.get("c")) == (2, 3)
+        assert len(cache) == 2
+
+    def test_restored_key_moves_to_back(self):
+        cache = TTLCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 10)
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 10
+
+    def test_entries_expire_after_ttl(self):
+        cache = TTLCache(4, ttl=60, lock=True)
+        with patch("api.ttl_cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("api.ttl_cache.time.monotonic", return_value=159.0):
+            assert cache.get("a") == 1
+        with patch("api.ttl_cache.time.monotonic", return_value=160.0):
+            assert cache.get("a", "miss") == "miss"
+        assert len(cache) == 0
+
+    def test_discard_where_and_pop(self):
+        cache = TTLCache(8)
+        cache.set((1, "hours"), "a")
+        cache.set((1, "price"), "b")
+        cache.set((2, "hours"), "c")
+        cache.discard_where(lambda key: key[0] == 1)
+        assert cache.get((1, "hours")) is None
+        assert cache.pop((2, "hours")) == "c"
+        assert cache.pop((2, "hours"), "gone") == "gone"